@@ -14,10 +14,19 @@ class Config:
 
     # Paths
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    VAULT_DIR = os.path.join(BASE_DIR, 'data', 'vault_files')
+    VAULT_DIR = os.environ.get('CALI_VAULT_DIR', os.path.join(BASE_DIR, 'data', 'vault_files'))
     DATABASE_PATH = os.path.join(BASE_DIR, 'legacy_vault.db')
     ETHICS_CONFIG_PATH = os.path.join(BASE_DIR, 'cali', 'config', 'ethics.yaml')
     LOG_FILE_PATH = os.path.join(BASE_DIR, 'logs', 'app.log') # New log file path
+    MIRROR_EVENTS_DB_PATH = os.path.join(BASE_DIR, 'data', 'mirror_events.db') # Indexed MirrorEvent audit trail
+
+    # Vault listing
+    VAULT_PAGE_SIZE = int(os.environ.get('VAULT_PAGE_SIZE', 100))
+    VAULT_MAX_PAGE_SIZE = 1000
+
+    # Request body limits (enforced while the body streams in)
+    MAX_REQUEST_BODY_BYTES = int(os.environ.get('MAX_REQUEST_BODY_BYTES', 1024 * 1024))
+    SANITIZED_BODY_PATHS = ('/prompt', '/helix/process', '/api/reflect', '/reflect', '/memory/add')
 
     # Logging Config
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper() # Default log level
@@ -41,13 +50,21 @@ import sqlite3
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, Request, Response, HTTPException, Depends
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # --- Imports: Custom Modules ---
-from routes.glyphfeed import glyphfeed_bp
+from routes.glyphfeed import router as glyphfeed_router
 from cali.sandbox import sanitize_input, SandboxError
-from cali.vault.storage.cali_vault_storage import load_memory_vault, save_memory_vault # VAULT_DIR is now from Config
+from cali.sandbox.json_stream import StreamingBodyGuard
+from cali.vault.storage.cali_vault_storage import (
+    save_memory_vault_batch, set_vault_dir, vault_cache_stats, vault_manifest
+)
+from cali.vault.outbox import VaultOutboxWorker, enqueue_vault_write, ensure_outbox_schema
+from cali.vault.download import VaultDownloadResponse
+from cali.vault.merkle import VaultReconciler, ensure_merkle_schema
+from cali.vault.search import VaultSearchIndex
+from cali.vault.storage.async_io import VaultIOBusy, aload_memory_vault, aopen_vault_download, vault_io_pool
 from core.trust_glyph_verifier import TrustGlyphVerifier
 from core.helix_echo_core import HelixEchoCore
 # For MemoryStore, we'll handle its import below more robustly
@@ -59,6 +76,13 @@ from core.helix_echo_core import HelixEchoCore
 
 app = FastAPI(title="Prometheus Prime Backend", version="0.7.2")
 
+# Reject oversized bodies (bytes, string/list limits, nesting) while they stream in (registered first so CORS wraps it)
+app.add_middleware(
+    StreamingBodyGuard,
+    max_body_size=Config.MAX_REQUEST_BODY_BYTES,
+    json_paths=Config.SANITIZED_BODY_PATHS,
+)
+
 # CORS setup
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +92,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(glyphfeed_router)
+
 
 
 # --- Advanced Logging Setup ---
@@ -110,11 +136,11 @@ cali_logger.info("Prometheus Prime Backend Starting...")
 
 ethics = {}
 try:
-    with open(app.config['ETHICS_CONFIG_PATH'], 'r', encoding='utf-8') as f:
+    with open(Config.ETHICS_CONFIG_PATH, 'r', encoding='utf-8') as f:
         ethics = yaml.safe_load(f)
         cali_logger.info("✅ Ethical framework loaded.")
 except FileNotFoundError:
-    cali_logger.error(f"❌ Ethics configuration file not found at {app.config['ETHICS_CONFIG_PATH']}. Using empty ethics.")
+    cali_logger.error(f"❌ Ethics configuration file not found at {Config.ETHICS_CONFIG_PATH}. Using empty ethics.")
 except Exception as e:
     cali_logger.error(f"❌ Failed to load ethics.yaml: {e}")
 
@@ -146,6 +172,8 @@ def init_db():
         category TEXT
     )''')
     conn.commit()
+    ensure_outbox_schema(conn)
+    ensure_merkle_schema(conn)
     conn.close()
     cali_logger.info("✅ Legacy Vault database schema checked/initialized.")
 
@@ -165,6 +193,33 @@ def index():
 
 from pydantic import BaseModel
 
+# File-based vault entries live in Config.VAULT_DIR. The manifest (and, for CALI_VAULT_BACKEND=segments,
+# the single-writer segment store) is opened in the startup hook, not at import: the reload
+# supervisor of `python app.py` imports this module too, and must not take the store's lock.
+set_vault_dir(Config.VAULT_DIR)
+
+# /prompt commits its DB row and an outbox record together; this worker writes the vault files
+vault_outbox = VaultOutboxWorker(Config.DATABASE_PATH, save_batch=save_memory_vault_batch)
+
+# Compares legacy_vault rows with the vault files by Merkle tree and rewrites the files that differ
+vault_reconciler = VaultReconciler(Config.DATABASE_PATH)
+
+# Full-text index of the vault files, kept current from every save (sidecar SQLite FTS5 file in the vault dir)
+vault_search = VaultSearchIndex()
+
+
+@app.on_event("startup")
+def start_vault_outbox():
+    cali_logger.info(f"📚 Vault manifest loaded: {len(vault_manifest())} entries.")
+    vault_outbox.start()  # also picks up records left over from a previous run
+    vault_search.start()  # also indexes vaults changed while the app was not running
+
+
+@app.on_event("shutdown")
+def stop_vault_outbox():
+    vault_outbox.stop(drain=True)
+    vault_search.stop()
+
 class PromptRequest(BaseModel):
     title: Optional[str] = 'User Prompt'
     description: Optional[str] = ''
@@ -180,6 +235,7 @@ def handle_prompt(prompt: PromptRequest, db=Depends(get_db)):
         keywords_str = ",".join(keywords)
         category = sanitize_input(prompt.category)
         vault_id = str(uuid.uuid4())
+        created_at = datetime.now().isoformat()
 
         db.execute('''
             INSERT INTO legacy_vault (
@@ -195,11 +251,16 @@ def handle_prompt(prompt: PromptRequest, db=Depends(get_db)):
             "manual",
             "none",
             1,
-            datetime.now().isoformat(),
+            created_at,
             category
         ))
+        enqueue_vault_write(db, vault_id, {
+            "vault_id": vault_id, "title": title,
+            "description": description, "keywords": keywords,
+            "category": category, "created_at": created_at
+        })
         db.commit()
-        cali_logger.info(f"💾 Vault entry {vault_id} added to SQLite DB.")
+        cali_logger.info(f"💾 Vault entry {vault_id} added to SQLite DB (file write queued).")
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for /prompt: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid input: {e}")
@@ -207,36 +268,48 @@ def handle_prompt(prompt: PromptRequest, db=Depends(get_db)):
         cali_logger.error(f"❌ DB error on /prompt: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Database error")
 
-    try:
-        save_memory_vault(vault_id, {
-            "vault_id": vault_id, "title": title,
-            "description": description, "keywords": keywords,
-            "category": category, "created_at": datetime.now().isoformat()
-        })
-        cali_logger.info(f"📁 Vault entry {vault_id} saved to file system.")
-    except Exception as e:
-        cali_logger.error(f"❌ File system vault save error for {vault_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="File system save error, DB may be updated.")
-
+    vault_outbox.notify()
     return {"status": "created", "vault_id": vault_id}
 
 
+def _vault_busy(e: VaultIOBusy):
+    cali_logger.warning(f"Vault I/O saturated: {e}")
+    return HTTPException(status_code=503, detail="Vault storage busy, retry shortly", headers={"Retry-After": "1"})
+
+
 @app.get('/vault-files')
-def list_vault_files():
+async def list_vault_files(cursor: Optional[str] = None, limit: int = Config.VAULT_PAGE_SIZE,
+                     category: Optional[str] = None, prefix: Optional[str] = None):
+    limit = max(1, min(limit, Config.VAULT_MAX_PAGE_SIZE))
     try:
-        files = [f.replace(".json", "") for f in os.listdir(Config.VAULT_DIR) if f.endswith(".json")]
-        return {"vault_files": files}
-    except FileNotFoundError:
-        cali_logger.warning(f"Vault directory not found: {Config.VAULT_DIR}")
-        return {"vault_files": []}
+        files, next_cursor = vault_manifest().page(cursor=cursor, limit=limit, category=category, prefix=prefix)
+        return {"vault_files": files, "next_cursor": next_cursor}
     except Exception as e:
         cali_logger.error(f"❌ Error listing vault files: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Server error listing files")
 
 
+@app.get('/vault-files/search')
+def search_vault_files(q: str, limit: int = 20, offset: int = 0, category: Optional[str] = None):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query")
+    limit = max(1, min(limit, Config.VAULT_MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    try:
+        results = vault_search.search(q, limit=limit, offset=offset, category=category)
+    except Exception as e:
+        cali_logger.error(f"❌ Vault search failed for {q!r}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Server error searching vault files")
+    return {"query": q, "results": results,
+            "next_offset": offset + limit if len(results) == limit else None}
+
+
 @app.get('/vault-files/{vault_id}')
-def view_vault_file(vault_id: str):
-    vault = load_memory_vault(vault_id)
+async def view_vault_file(vault_id: str):
+    try:
+        vault = await aload_memory_vault(vault_id, readonly=True)
+    except VaultIOBusy as e:
+        raise _vault_busy(e)
     if not vault:
         cali_logger.warning(f"Vault {vault_id} not found.")
         raise HTTPException(status_code=404, detail="Vault not found")
@@ -244,22 +317,38 @@ def view_vault_file(vault_id: str):
 
 
 @app.get('/vault-files/{vault_id}/download')
-def download_vault_file(vault_id: str):
-    path = os.path.join(Config.VAULT_DIR, f"{vault_id}.json")
-    if not os.path.exists(path):
-        cali_logger.warning(f"Vault file {vault_id}.json not found for download.")
-        raise HTTPException(status_code=404, detail="File not found")
+async def download_vault_file(vault_id: str):
+    # Always plain JSON (records may be stored compressed), with ETag/If-None-Match and Range support
     try:
-        return FileResponse(path, filename=f"{vault_id}.json", media_type="application/json")
+        download = await aopen_vault_download(vault_id)
+    except VaultIOBusy as e:
+        raise _vault_busy(e)
     except Exception as e:
         cali_logger.error(f"❌ Error downloading vault file {vault_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to download file")
+    if download is None:
+        cali_logger.warning(f"Vault file {vault_id}.json not found for download.")
+        raise HTTPException(status_code=404, detail="File not found")
+    return VaultDownloadResponse(download, filename=f"{vault_id}.json")
+
+
+@app.get('/vault/stats')
+def vault_stats():
+    return {"io": vault_io_pool().stats(), "cache": vault_cache_stats(), "manifest": vault_manifest().stats(),
+            "outbox": vault_outbox.stats(), "search": vault_search.stats()}
 
 
 @app.get('/reconcile')
-def reconcile_vault():
+def reconcile_vault(dry_run: bool = False):
     cali_logger.info("Initiating vault reconciliation.")
-    return {"status": "success", "message": "Reconciliation completed"}
+    try:
+        report = vault_reconciler.reconcile(dry_run=dry_run)
+    except Exception as e:
+        cali_logger.error(f"❌ Vault reconciliation failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Reconciliation failed")
+    cali_logger.info(f"Vault reconciliation compared {report['ranges_compared']} range(s), "
+                     f"repaired {report['repaired']} vault file(s).")
+    return {"status": "success", "message": "Reconciliation completed", **report}
 
 # ============================================================================
 # Helix Echo Integration
@@ -275,14 +364,13 @@ try:
 except Exception as e:
     cali_logger.warning(f"⚠️ HelixEchoCore unavailable: {e}", exc_info=True)
 
-@app.route("/helix/process", methods=["POST"])
-def helix_process():
+@app.post("/helix/process")
+async def helix_process(request: Request):
     if not HELIX_AVAILABLE:
         cali_logger.warning("Attempted Helix process, but Helix is unavailable.")
-    from fastapi.responses import JSONResponse
-    return JSONResponse(content={"error": "Helix unavailable"}, status_code=503)
+        return JSONResponse(content={"error": "Helix unavailable"}, status_code=503)
     try:
-        data = request.get_json()
+        data = await request.json()
         if not data or "input" not in data:
             cali_logger.warning("No input provided for Helix process.")
             return JSONResponse(content={"error": "Input required"}, status_code=400)
@@ -294,15 +382,15 @@ def helix_process():
             return JSONResponse(content={"error": "HelixEchoCore not initialized"}, status_code=503)
         result = helix_engine.echo(processed_input)
         cali_logger.info("Helix Echo processing successful.")
-    return JSONResponse(content={"status": "success", "helix_response": result})
+        return JSONResponse(content={"status": "success", "helix_response": result})
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for Helix process: {e}")
-    return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
+        return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Helix error during processing: {e}", exc_info=True)
-    return JSONResponse(content={"error": str(e)}, status_code=500)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
-@app.route("/helix/status")
+@app.get("/helix/status")
 def helix_status():
     status_msg = "ok" if HELIX_AVAILABLE else "not initialized"
     cali_logger.debug(f"Helix status requested: {status_msg}")
@@ -316,6 +404,7 @@ def helix_status():
 # ============================================================================
 
 from core.mirror.mirror import Caleon
+from core.mirror.singleflight import SingleFlight, reflect_key
 
 caleon = None # Initialize as None
 try:
@@ -324,49 +413,110 @@ try:
 except Exception as e:
     cali_logger.warning(f"⚠️ Caleon (Mirror + Codex) unavailable: {e}", exc_info=True)
 
-@app.route("/api/reflect", methods=["POST"])
-def reflect_input():
+# Identical concurrent reflections (client retries, duplicate tabs) share one handle_input call
+reflect_flight = SingleFlight()
+
+def _reflect_session(request: Request, data: Optional[dict] = None) -> Optional[str]:
+    """Session used to scope request coalescing: X-Session-ID header, else body 'session_id'."""
+    session_id = request.headers.get("X-Session-ID")
+    if not session_id and isinstance(data, dict):
+        session_id = data.get("session_id")
+    return session_id
+
+@app.get("/api/reflect/metrics")
+def reflect_metrics():
+    return reflect_flight.stats()
+
+@app.post("/api/reflect")
+async def reflect_input(request: Request):
     if not caleon:
         cali_logger.warning("Attempted Caleon reflection, but Caleon is unavailable.")
-    return JSONResponse(content={"error": "Caleon not ready"}, status_code=503)
+        return JSONResponse(content={"error": "Caleon not ready"}, status_code=503)
     try:
-        data = request.get_json()
+        data = await request.json()
         user_input = sanitize_input(data.get("input", ""))
         if not user_input:
             cali_logger.warning("No input provided for Caleon reflection.")
             return JSONResponse(content={"error": "Input required"}, status_code=400)
 
-        result = caleon.handle_input(user_input)
+        key = reflect_key(user_input, _reflect_session(request, data))
+        result = await reflect_flight.do(key, caleon.handle_input, user_input)
         cali_logger.info("Caleon reflection successful.")
-    return JSONResponse(content={"response": result})
+        return JSONResponse(content={"response": result})
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for Caleon reflection: {e}")
-    return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
+        return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Caleon reflection error: {e}", exc_info=True)
-    return JSONResponse(content={"error": str(e)}, status_code=500)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
-@app.route("/reflect", methods=["GET", "POST"])
-def reflect():
+@app.api_route("/reflect", methods=["GET", "POST"])
+async def reflect(request: Request):
     if not caleon:
         cali_logger.warning("Attempted Caleon reflection, but Caleon is unavailable.")
-    return JSONResponse(content={'error': 'Caleon not ready'}, status_code=503)
+        return JSONResponse(content={'error': 'Caleon not ready'}, status_code=503)
     try:
-        input_text = request.values.get("input")
+        data = None
+        input_text = request.query_params.get("input")
+        if not input_text and request.method == "POST":
+            data = await request.json()
+            input_text = data.get("input") if isinstance(data, dict) else None
         if not input_text:
             cali_logger.warning("No input provided for Caleon reflection (GET/POST).")
             return JSONResponse(content={'error': 'No input provided'}, status_code=400)
         
         sanitized_input_text = sanitize_input(input_text)
-        output = caleon.handle_input(sanitized_input_text)
+        key = reflect_key(sanitized_input_text, _reflect_session(request, data))
+        output = await reflect_flight.do(key, caleon.handle_input, sanitized_input_text)
         cali_logger.info("Caleon reflection (GET/POST) successful.")
-    return JSONResponse(content={'input': input_text, 'output': output})
+        return JSONResponse(content={'input': input_text, 'output': output})
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for Caleon reflection (GET/POST): {e}")
-    return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
+        return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Caleon reflection (GET/POST) error: {e}", exc_info=True)
-    return JSONResponse(content={"error": str(e)}, status_code=500)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+# --- Mirror Protocol Streaming (Invocation → Receive → Resonate → Threshold → reply) ---
+
+from core.mirror.event_store import MirrorEventStore
+from core.mirror.protocol import Caleon as MirrorProtocolCaleon
+from core.mirror.stream import stream_reflection, STREAM_MEDIA_TYPES
+
+mirror_caleon = None
+try:
+    mirror_caleon = MirrorProtocolCaleon(event_store=MirrorEventStore(Config.MIRROR_EVENTS_DB_PATH))
+    cali_logger.info("🪞 Mirror protocol streaming available.")
+except Exception as e:
+    cali_logger.warning(f"⚠️ Mirror protocol streaming unavailable: {e}", exc_info=True)
+
+@app.post("/api/reflect/stream")
+async def reflect_stream(request: Request):
+    """Streams each MirrorEvent as it is logged, as SSE (default) or NDJSON."""
+    if not mirror_caleon:
+        cali_logger.warning("Attempted Mirror stream, but the Mirror protocol is unavailable.")
+        return JSONResponse(content={"error": "Caleon not ready"}, status_code=503)
+    try:
+        data = await request.json()
+        user_input = sanitize_input(data.get("input", ""))
+        if not user_input:
+            cali_logger.warning("No input provided for Mirror stream.")
+            return JSONResponse(content={"error": "Input required"}, status_code=400)
+    except SandboxError as e:
+        cali_logger.error(f"Input sanitization error for Mirror stream: {e}")
+        return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
+    except Exception as e:
+        cali_logger.error(f"❌ Mirror stream error: {e}", exc_info=True)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+    wants_ndjson = (data.get("format") == "ndjson"
+                    or "application/x-ndjson" in request.headers.get("accept", ""))
+    fmt = "ndjson" if wants_ndjson else "sse"
+    return StreamingResponse(
+        stream_reflection(mirror_caleon, user_input, fmt=fmt),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ============================================================================
 # Memory Store API (SQLite)
@@ -392,15 +542,15 @@ except Exception as e:
     cali_logger.error(f"❌ Failed to initialize MemoryStore: {e}", exc_info=True)
 
 
-@app.route('/memory/add', methods=['POST'])
-def memory_add():
+@app.post('/memory/add')
+async def memory_add(request: Request):
     if not memory_store:
         cali_logger.warning("Attempted memory add, but MemoryStore is unavailable.")
-    return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
-    data = request.get_json() or {}
+        return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
+    data = await request.json() or {}
     if not data.get('text'):
         cali_logger.warning("No text provided for memory add.")
-    return JSONResponse(content={'error': 'No text provided'}, status_code=400)
+        return JSONResponse(content={'error': 'No text provided'}, status_code=400)
     try:
         # Sanitize all inputs
         text = sanitize_input(data['text'])
@@ -415,44 +565,43 @@ def memory_add():
             ",".join(tags), usage_score # Store tags as comma-separated string in DB
         )
         cali_logger.info(f"Memory entry {entry_id} added.")
-    return JSONResponse(content={'status': 'created', 'entry_id': entry_id})
+        return JSONResponse(content={'status': 'created', 'entry_id': entry_id})
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for memory add: {e}")
-    return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
+        return JSONResponse(content={"error": f"Invalid input: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Error adding memory entry: {e}", exc_info=True)
-    return JSONResponse(content={'error': 'Failed to add memory entry'}, status_code=500)
+        return JSONResponse(content={'error': 'Failed to add memory entry'}, status_code=500)
 
-@app.route('/memory/get/<int:entry_id>', methods=['GET'])
+@app.get('/memory/get/{entry_id}')
 def memory_get(entry_id: int):
     if not memory_store:
         cali_logger.warning("Attempted memory get, but MemoryStore is unavailable.")
-    return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
+        return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
     try:
         row = memory_store.get_entry(entry_id)
         if not row:
             cali_logger.warning(f"Memory entry {entry_id} not found.")
-            abort(404, description="Not found")
+            return JSONResponse(content={'error': 'Not found'}, status_code=404)
         keys = ['id', 'text', 'emotion', 'context', 'tags', 'created_at', 'usage_score']
         # Convert tags string back to list for frontend if needed, or keep as string
         result = dict(zip(keys, row))
         if 'tags' in result and result['tags'] is not None:
             result['tags'] = result['tags'].split(',') # Convert tags string to list
         cali_logger.info(f"Memory entry {entry_id} retrieved.")
-    return JSONResponse(content=result)
+        return JSONResponse(content=result)
     except Exception as e:
         cali_logger.error(f"❌ Error getting memory entry {entry_id}: {e}", exc_info=True)
-    return JSONResponse(content={'error': 'Failed to retrieve memory entry'}, status_code=500)
+        return JSONResponse(content={'error': 'Failed to retrieve memory entry'}, status_code=500)
 
-@app.route('/memory/search', methods=['GET'])
-def memory_search():
+@app.get('/memory/search')
+def memory_search(q: Optional[str] = None):
     if not memory_store:
         cali_logger.warning("Attempted memory search, but MemoryStore is unavailable.")
-    return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
-    q = request.args.get('q')
+        return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
     if not q:
         cali_logger.warning("No query provided for memory search.")
-    return JSONResponse(content={'error': 'No query provided'}, status_code=400)
+        return JSONResponse(content={'error': 'No query provided'}, status_code=400)
     try:
         sanitized_q = sanitize_input(q)
         rows = memory_store.search_text(sanitized_q)
@@ -464,19 +613,19 @@ def memory_search():
                 item['tags'] = item['tags'].split(',')
             results.append(item)
         cali_logger.info(f"Memory search for '{q}' returned {len(results)} results.")
-    return JSONResponse(content=results)
+        return JSONResponse(content=results)
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for memory search: {e}")
-    return JSONResponse(content={"error": f"Invalid query: {e}"}, status_code=400)
+        return JSONResponse(content={"error": f"Invalid query: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Error searching memory: {e}", exc_info=True)
-    return JSONResponse(content={'error': 'Failed to search memory'}, status_code=500)
+        return JSONResponse(content={'error': 'Failed to search memory'}, status_code=500)
 
-@app.route('/memory/tag/<tag>', methods=['GET'])
+@app.get('/memory/tag/{tag}')
 def memory_tag_search(tag: str):
     if not memory_store:
         cali_logger.warning("Attempted memory tag search, but MemoryStore is unavailable.")
-    return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
+        return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
     try:
         sanitized_tag = sanitize_input(tag)
         rows = memory_store.search_by_tag(sanitized_tag)
@@ -488,24 +637,24 @@ def memory_tag_search(tag: str):
                 item['tags'] = item['tags'].split(',')
             results.append(item)
         cali_logger.info(f"Memory tag search for '{tag}' returned {len(results)} results.")
-        return jsonify(results)
+        return JSONResponse(content=results)
     except SandboxError as e:
         cali_logger.error(f"Input sanitization error for memory tag search: {e}")
-        return jsonify({"error": f"Invalid tag: {e}"}), 400
+        return JSONResponse(content={"error": f"Invalid tag: {e}"}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Error searching memory by tag: {e}", exc_info=True)
-        return jsonify({'error': 'Failed to search memory by tag'}), 500
+        return JSONResponse(content={'error': 'Failed to search memory by tag'}, status_code=500)
 
-@app.route('/memory/recent', methods=['GET'])
-def memory_recent():
+@app.get('/memory/recent')
+def memory_recent(request: Request):
     if not memory_store:
         cali_logger.warning("Attempted memory recent, but MemoryStore is unavailable.")
-        return jsonify({'error': 'MemoryStore unavailable'}), 503
+        return JSONResponse(content={'error': 'MemoryStore unavailable'}, status_code=503)
     try:
-        n = int(request.args.get('n', 10))
+        n = int(request.query_params.get('n', 10))
         if n <= 0:
             cali_logger.warning(f"Invalid 'n' value for recent memories: {n}")
-        return JSONResponse(content={'error': 'Number of recent entries must be positive'}, status_code=400)
+            return JSONResponse(content={'error': 'Number of recent entries must be positive'}, status_code=400)
         rows = memory_store.search_recent(n)
         keys = ['id', 'text', 'emotion', 'context', 'tags', 'created_at', 'usage_score']
         results = []
@@ -515,13 +664,13 @@ def memory_recent():
                 item['tags'] = item['tags'].split(',')
             results.append(item)
         cali_logger.info(f"Retrieved {len(results)} recent memory entries.")
-    return JSONResponse(content=results)
+        return JSONResponse(content=results)
     except ValueError:
         cali_logger.error("Invalid 'n' parameter for recent memories (not an integer).")
-    return JSONResponse(content={'error': 'Invalid number of entries requested'}, status_code=400)
+        return JSONResponse(content={'error': 'Invalid number of entries requested'}, status_code=400)
     except Exception as e:
         cali_logger.error(f"❌ Error retrieving recent memories: {e}", exc_info=True)
-    return JSONResponse(content={'error': 'Failed to retrieve recent memory entries'}, status_code=500)
+        return JSONResponse(content={'error': 'Failed to retrieve recent memory entries'}, status_code=500)
 
 # ============================================================================
 # Security Headers (Improved)
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: legacy memory retrieval at scale with core/legacy_memory_index.py,
+against a linear scan that scores every memory on every query.
+
+Run from the repository root:
+    python -m benchmarks.bench_legacy_memory [memories]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from core.legacy_memory_index import LegacyMemoryIndex, tokenize
+
+QUERIES = [
+    "Define symbolic cognition",
+    "What is the meaning of resonance in the mirror protocol?",
+    "Explain the ethics of memory consolidation",
+    "Analyze the structure of recursive reflection",
+    "How does Caleon hold space for grief?",
+]
+
+
+def synthetic_corpus(count, seed=7):
+    rng = random.Random(seed)
+    topical = sorted({t for q in QUERIES for t in tokenize(q)})
+    filler = [f"w{i}" for i in range(20000)]
+    weights = [1.0 / (i + 1) for i in range(len(filler))]  # Zipf-like vocabulary
+    for i in range(count):
+        words = rng.choices(filler, weights=weights, k=rng.randint(12, 40))
+        words += rng.sample(topical, k=rng.randint(0, 3))
+        rng.shuffle(words)
+        yield " ".join(words), rng.uniform(0.2, 2.0), [rng.choice(["session", "vault", "mirror", "dream"])]
+
+
+def linear_scan(memories, query, top_k=5):
+    terms = set(tokenize(query))
+    scored = [(sum(t in terms for t in tokenize(content)) * importance, content)
+              for content, importance, _ in memories]
+    return sorted(scored, reverse=True)[:top_k]
+
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100)[q - 1]
+
+
+def main(count=100_000):
+    memories = list(synthetic_corpus(count))
+    index = LegacyMemoryIndex()
+    started = time.perf_counter()
+    for content, importance, tags in memories:
+        index.add(content, importance, tags)
+    print(f"indexed {count} memories in {time.perf_counter() - started:.2f}s ({index.stats()['terms']} terms)")
+
+    for label, kwargs in (("bm25", {}), ("bm25 + tag filter", {'tags': ['mirror']})):
+        samples = []
+        for _ in range(40):
+            for query in QUERIES:
+                t0 = time.perf_counter()
+                index.format_memories(index.search(query, top_k=5, **kwargs))
+                samples.append((time.perf_counter() - t0) * 1000.0)
+        print(f"{label:18s} p50 {percentile(samples, 50):6.2f} ms   p95 {percentile(samples, 95):6.2f} ms")
+
+    t0 = time.perf_counter()
+    linear_scan(memories, QUERIES[0])
+    print(f"{'linear scan':18s} one query {(time.perf_counter() - t0) * 1000.0:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,123 @@
+"""
+Prefix reuse harness: legacy symbolic prompt layout (query in the middle of the
+instructions) vs the prefix-stable layout in core/symbolic_prompt.py.
+
+A local stub of Ollama's /api/generate simulates a server-side prefix (KV) cache:
+it keeps the last few prompts per slot, reuses the longest common prefix and
+"prefills" only the remaining tokens at a fixed per-token cost before the first
+token is returned. The harness reports prefix reuse and time-to-first-token.
+
+Run from the repository root:
+    python -m benchmarks.bench_prompt_prefix
+"""
+
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.context_window import count_tokens
+from core.query_classifier import classify_query
+from core.symbolic_prompt import build_symbolic_prompt
+
+PREFILL_MS_PER_TOKEN = 0.2
+CACHE_SLOTS = 4
+
+QUERIES = [
+    "Define symbolic cognition",
+    "Define the meaning of a glyph",
+    "What is a syllogism and how does logic use it?",
+    "Explain the philosophy of memory",
+    "Analyze the structure of this argument",
+    "Define resonance in the mirror protocol",
+    "What is the relationship between ethics and values?",
+    "Explain the pattern behind recursive reflection",
+]
+
+
+def legacy_symbolic_prompt(query, categories):
+    """The layout enhance_prompt_for_symbolic used before: query between instructions and schema"""
+    instructions = {
+        'definition': "Provide a clear, structured definition with symbolic components:",
+        'logical': "Apply logical reasoning and symbolic logic principles:",
+        'symbolic': "Consider symbolic representations and cognitive patterns:",
+        'philosophical': "Analyze from philosophical and ethical perspectives:",
+        'analytical': "Break down into structural components and relationships:"
+    }
+    enhanced = "[SYMBOLIC PROCESSING MODE]\n\n"
+    for category in categories:
+        if category in instructions:
+            enhanced += f"{instructions[category]}\n"
+    enhanced += f"\nQuery: {query}\n\n"
+    enhanced += "Respond with structured symbolic analysis including:\n"
+    enhanced += "1. Core definition/concept\n"
+    enhanced += "2. Symbolic representations\n"
+    enhanced += "3. Logical relationships\n"
+    enhanced += "4. Contextual applications\n"
+    return enhanced
+
+
+class PrefixCacheStub(BaseHTTPRequestHandler):
+    """Ollama-shaped /api/generate that only pays prefill for the uncached suffix"""
+
+    slots = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['prompt']
+        with self.lock:
+            cached = max((os.path.commonprefix([prompt, p]) for p in self.slots), key=len, default="")
+            self.slots.append(prompt)
+            del self.slots[:-CACHE_SLOTS]
+        total_tokens = count_tokens(prompt)
+        reused_tokens = count_tokens(cached)
+        time.sleep((total_tokens - reused_tokens) * PREFILL_MS_PER_TOKEN / 1000.0)
+        payload = json.dumps({'response': 'ok', 'done': True,
+                              'prompt_tokens': total_tokens, 'prompt_cached_tokens': reused_tokens}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(url, build, rounds):
+    PrefixCacheStub.slots = []
+    ttft, total, reused = [], 0, 0
+    for _ in range(rounds):
+        for query in QUERIES:
+            # The preprocessor-enhanced query is the variable part of every prompt
+            prompt = build(f"{query}\n[memories and glyph frames for: {query}]", classify_query(query))
+            request = urllib.request.Request(url, data=json.dumps({'prompt': prompt}).encode(),
+                                             headers={'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                result = json.loads(response.read())
+            ttft.append((time.perf_counter() - started) * 1000.0)
+            total += result['prompt_tokens']
+            reused += result['prompt_cached_tokens']
+    return reused / total, statistics.mean(ttft), statistics.quantiles(ttft, n=20)[-1]
+
+
+def main(rounds=25):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PrefixCacheStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/generate"
+    try:
+        for name, build in (("legacy layout", legacy_symbolic_prompt),
+                            ("stable prefix", build_symbolic_prompt)):
+            reuse, mean_ms, p95_ms = run(url, build, rounds)
+            print(f"{name:15s} prefix reuse {reuse:6.1%}   ttft mean {mean_ms:6.2f} ms   p95 {p95_ms:6.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
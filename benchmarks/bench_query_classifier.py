@@ -0,0 +1,68 @@
+"""
+Micro-benchmark: legacy per-category regex classification vs the single-pass
+classifier in core/query_classifier.py (cold scan and warm cache).
+
+Run from the repository root:
+    python -m benchmarks.bench_query_classifier
+"""
+
+import re
+import timeit
+
+from core import query_classifier
+from core.query_classifier import SYMBOLIC_PATTERNS
+
+PROMPTS = [
+    "Define symbolic cognition",
+    "What is the relationship between logic and reasoning?",
+    "Explain the philosophical implications of AI consciousness",
+    "How do you calculate the area of a circle?",
+    "Tell me a joke",
+    "Analyze the symbolic meaning of memory in AI systems",
+    "Summarize yesterday's conversation about the garden and the weather forecast for the weekend",
+    "Can you break down the structure of this argument and show where the proof fails?",
+]
+
+LEGACY_PATTERNS = {category: f"(?i){pattern}" for category, pattern in SYMBOLIC_PATTERNS.items()}
+
+
+def legacy_classify(query):
+    categories = [c for c, p in LEGACY_PATTERNS.items() if re.search(p, query)]
+    return categories if categories else ['general']
+
+
+def legacy_route(query):
+    # run_llama used to classify, then classify again inside should_route_to_symbolic
+    categories = legacy_classify(query)
+    symbolic = any(c in query_classifier.SYMBOLIC_CATEGORIES for c in legacy_classify(query))
+    return categories, symbolic
+
+
+def single_pass_cold(query):
+    query_classifier.clear_cache()
+    categories = query_classifier.classify_query(query)
+    return categories, query_classifier.is_symbolic(categories)
+
+
+def single_pass_warm(query):
+    categories = query_classifier.classify_query(query)
+    return categories, query_classifier.is_symbolic(categories)
+
+
+def main(number=20000):
+    for prompt in PROMPTS:
+        assert legacy_route(prompt) == single_pass_cold(prompt), prompt
+
+    results = {}
+    for name, fn in (("legacy (2 classifications x 6 searches)", legacy_route),
+                     ("single pass, cold cache", single_pass_cold),
+                     ("single pass, warm cache", single_pass_warm)):
+        elapsed = timeit.timeit(lambda: [fn(p) for p in PROMPTS], number=number // len(PROMPTS))
+        results[name] = elapsed / number * 1e6
+    baseline = results["legacy (2 classifications x 6 searches)"]
+    for name, per_call in results.items():
+        print(f"{name:45s} {per_call:8.2f} µs/query   x{baseline / per_call:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: the original per-pattern DataSandbox.sanitize_string against the
+precompiled single-pass sanitizer in cali/sandbox, on realistic request payloads.
+
+Run from the repository root:
+    python -m benchmarks.bench_sanitizer
+"""
+
+import re
+import timeit
+
+from cali.sandbox import DANGEROUS_PATTERNS, DataSandbox, SandboxError
+
+PAYLOADS = [
+    {"title": "Morning reflection", "description": "Caleon held space while I talked through the week's grief.",
+     "keywords": ["grief", "mirror", "resonance"], "category": "session"},
+    {"input": "What is the meaning of the glyph that appeared in my dream last night?"},
+    {"input": "Tell me about <b>symbolic</b> cognition & how it relates to \"memory\" and the vault's echo."},
+    {"title": "Long entry", "description": " ".join(["The seed remembers the soil it grew from."] * 40),
+     "keywords": ["seed", "soil", "memory", "legacy", "harmonic", "codex"], "category": "legacy"},
+    {"input": "Can you summarise the reconciliation report from yesterday's session for the team?"},
+]
+
+
+class LegacySandbox(DataSandbox):
+    """Reference copy of the sanitizer before it was precompiled"""
+
+    def sanitize_string(self, value):
+        if not isinstance(value, str):
+            raise SandboxError("Expected string input")
+        if len(value) > self.max_string_length:
+            raise SandboxError(f"String too long: {len(value)} > {self.max_string_length}")
+        for pattern in DANGEROUS_PATTERNS:
+            if re.search(pattern, value, re.IGNORECASE):
+                raise SandboxError("String contains dangerous patterns")
+        dangerous_chars = ['<', '>', '"', "'", '&', 'javascript:', 'data:']
+        for char in dangerous_chars:
+            if char in value:
+                value = value.replace(char, '')
+        return value.strip()
+
+
+def main(number=20000):
+    legacy, current = LegacySandbox(), DataSandbox()
+    for payload in PAYLOADS:
+        assert legacy.sanitize_dict(payload) == current.sanitize_dict(payload)
+
+    for name, sandbox in (("legacy (14 searches + 7 replaces)", legacy), ("precompiled single pass", current)):
+        elapsed = timeit.timeit(lambda: [sandbox.sanitize_dict(p) for p in PAYLOADS], number=number // len(PAYLOADS))
+        print(f"{name:36s} {elapsed / number * 1e6:7.2f} us/payload")
+
+
+if __name__ == "__main__":
+    main()
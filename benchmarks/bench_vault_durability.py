@@ -0,0 +1,115 @@
+"""
+Benchmark: bursty concurrent vault saves under each durability mode, against the
+original open-and-json.dump writes (which are neither atomic nor flushed), and
+per-save against grouped fsyncs for the segment store. Every fsync call is
+counted, so the per-save cost of each mode is visible next to its throughput.
+
+Run from the repository root:
+    python -m benchmarks.bench_vault_durability
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from cali.vault.storage.durability import GroupCommit, GroupWriter, atomic_write, fsync_directory, stage_write
+from cali.vault.storage.segment_store import SegmentStore
+
+THREADS = 16
+SAVES_PER_THREAD = 100
+ENTRY = {"title": "Reflection", "description": "Caleon held space while I talked through the week.",
+         "keywords": ["mirror", "resonance"], "category": "tasks"}
+
+
+def legacy_save(directory, vault_id):
+    with open(directory / f"{vault_id}.json", "w", encoding="utf-8") as f:
+        json.dump(ENTRY, f, indent=2)
+
+
+def make_save(mode, directory):
+    writer = GroupWriter(lambda: directory)
+
+    def save(directory, vault_id):
+        path, payload = directory / f"{vault_id}.json", json.dumps(ENTRY, indent=2).encode("utf-8")
+        if mode == "group":
+            writer.commit([stage_write(path, payload)])
+            return
+        atomic_write(path, payload, fsync=mode == "fsync")
+        if mode == "fsync":
+            fsync_directory(directory)
+    return save, writer.group
+
+
+def make_segment_save(mode, store):
+    group = GroupCommit(store.sync)
+    payload = json.dumps(ENTRY, separators=(",", ":")).encode("utf-8")
+
+    def save(directory, vault_id):
+        store.put(vault_id, payload)
+        if mode == "fsync":
+            store.sync()
+        else:
+            group.commit()
+    return save, group
+
+
+class FsyncCounter:
+    """Counts os.fsync calls (file and directory) while installed"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._fsync = os.fsync
+
+    def __enter__(self):
+        def fsync(fd):
+            with self._lock:
+                self.calls += 1
+            self._fsync(fd)
+        os.fsync = fsync
+        return self
+
+    def __exit__(self, *exc):
+        os.fsync = self._fsync
+
+
+def run(save, directory):
+    def worker():
+        for _ in range(SAVES_PER_THREAD):
+            save(directory, uuid.uuid4().hex)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return THREADS * SAVES_PER_THREAD / (time.perf_counter() - start)
+
+
+def main():
+    saves = THREADS * SAVES_PER_THREAD
+    for mode in ("legacy", "none", "fsync", "group"):
+        with tempfile.TemporaryDirectory(dir=".") as tmp, FsyncCounter() as fsyncs:
+            directory = Path(tmp)
+            if mode == "legacy":
+                rate, detail = run(legacy_save, directory), ""
+            else:
+                save, group = make_save(mode, directory)
+                rate = run(save, directory)
+                detail = f", {group.syncs} directory syncs" if mode == "group" else ""
+            print(f"{mode:16s} {rate:9.0f} saves/s  ({fsyncs.calls / saves:.2f} fsyncs/save{detail})")
+
+    for mode in ("fsync", "group"):
+        with tempfile.TemporaryDirectory(dir=".") as tmp, SegmentStore(tmp) as store, FsyncCounter() as fsyncs:
+            save, group = make_segment_save(mode, store)
+            rate = run(save, Path(tmp))
+            print(f"{'segments ' + mode:16s} {rate:9.0f} saves/s  ({fsyncs.calls / saves:.2f} fsyncs/save)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: peak Python memory and time of reconciling a vault's entries in memory
+(load the vault, dedupe with a dict) versus streaming them from storage through
+the external-memory reconciler into a file.
+
+Run from the repository root:
+    python -m benchmarks.bench_vault_reconcile [entries]
+"""
+
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from cali.vault.reconciliation import VaultEntryReader, reconcile_to_file
+from cali.vault.storage import cali_vault_storage as storage
+
+
+def measure(label, fn):
+    started = time.perf_counter()
+    count = fn()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()                 # separate run: tracing slows allocation-heavy code down a lot
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:10s} {count:9d} entries  {seconds:7.2f} s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+def main(entries=300_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.set_vault_dir(tmp)
+
+        def body():
+            yield b'{"vault_id":"bench","category":"legacy","entries":['
+            for i in range(entries):
+                entry = {"id": (i * 7919) % (entries // 2), "text": "seed soil memory mirror " * 4}
+                yield (b"," if i else b"") + json.dumps(entry).encode()
+            yield b"]}"
+
+        storage.save_memory_vault_stream("bench", body(), category="legacy")
+
+        def in_memory():
+            vault = json.loads(storage.read_vault_json("bench"))
+            return len({entry["id"]: entry for entry in vault["entries"]})
+
+        def streaming():
+            reader = VaultEntryReader(storage.iter_vault_json("bench"))
+            return reconcile_to_file(reader, Path(tmp) / "reconciled.json", run_size=20_000)[0]
+
+        measure("in-memory", in_memory)
+        measure("streaming", streaming)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
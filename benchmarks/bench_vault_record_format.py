@@ -0,0 +1,44 @@
+"""
+Benchmark: stored size and decode latency of vault records per codec, for a small
+/prompt entry and a large reconciled vault.
+
+Run from the repository root:
+    python -m benchmarks.bench_vault_record_format
+"""
+
+import random
+import timeit
+
+from cali.vault.storage import record_format
+
+WORDS = "seed soil memory mirror resonance glyph echo harmonic reflection legacy codex vault".split()
+
+
+def large_vault(entries=2000, seed=3):
+    rng = random.Random(seed)
+    return {
+        "vault_id": "CALEON_VAULT_0001", "category": "legacy",
+        "entries": [{"id": i, "timestamp": f"2025-06-{1 + i % 28:02d}T10:{i % 60:02d}:00",
+                     "text": " ".join(rng.choice(WORDS) for _ in range(25)),
+                     "tags": rng.sample(WORDS, 3), "importance": round(rng.random(), 3)}
+                    for i in range(entries)]
+    }
+
+
+def main():
+    records = {
+        "prompt entry": {"vault_id": "8a183685", "title": "User Prompt", "description": "What does the glyph mean?",
+                         "keywords": ["glyph"], "category": "tasks", "created_at": "2025-06-01T10:00:00"},
+        "reconciled vault": large_vault(),
+    }
+    for name, record in records.items():
+        print(name)
+        for codec in record_format.CODECS:
+            payload = record_format.encode(record, codec)
+            number = 20 if len(payload) > 100_000 else 2000
+            seconds = timeit.timeit(lambda: record_format.decode(payload), number=number) / number
+            print(f"  {codec:7s} {len(payload):9d} bytes  decode {seconds * 1e6:9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
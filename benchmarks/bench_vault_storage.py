@@ -0,0 +1,63 @@
+"""
+Benchmark: one JSON file per vault id against the log-structured segment store,
+for writing and then reading back a batch of vault entries.
+
+Run from the repository root:
+    python -m benchmarks.bench_vault_storage
+"""
+
+import json
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from cali.vault.storage.segment_store import SegmentStore
+
+
+def entries(count):
+    for i in range(count):
+        vault_id = str(uuid.uuid4())
+        yield vault_id, {"vault_id": vault_id, "title": f"Reflection {i}",
+                         "description": "Caleon held space while I talked through the week.",
+                         "keywords": ["mirror", "resonance"], "category": "session"}
+
+
+def bench_files(directory, batch):
+    start = time.perf_counter()
+    for vault_id, data in batch:
+        with open(directory / f"{vault_id}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    written = time.perf_counter()
+    for vault_id, _ in batch:
+        with open(directory / f"{vault_id}.json", "r", encoding="utf-8") as f:
+            json.load(f)
+    return written - start, time.perf_counter() - written, len(os.listdir(directory))
+
+
+def bench_segments(directory, batch):
+    with SegmentStore(directory) as store:
+        start = time.perf_counter()
+        for vault_id, data in batch:
+            store.put(vault_id, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        written = time.perf_counter()
+        for vault_id, _ in batch:
+            json.loads(store.get(vault_id))
+        read = time.perf_counter() - written
+    start_open = time.perf_counter()
+    SegmentStore(directory).close()
+    print(f"{'segments: recovery scan':28s} {time.perf_counter() - start_open:7.3f} s")
+    return written - start, read, len(os.listdir(directory))
+
+
+def main(count=20000):
+    batch = list(entries(count))
+    for name, bench in (("files", bench_files), ("segments", bench_segments)):
+        with tempfile.TemporaryDirectory() as tmp:
+            write, read, files = bench(Path(tmp), batch)
+        print(f"{name:10s} write {write:6.3f} s  read {read:6.3f} s  files {files}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import logging
 import re
 import ast
 import types
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional, Union
 from functools import wraps
 
@@ -39,6 +42,23 @@ DANGEROUS_PATTERNS = [
     r'dir\s*\(',  # dir access to sensitive objects
 ]
 
+# All patterns compiled once into a single alternation, so a string is scanned in one pass.
+# Every pattern starts with a literal character; the leading lookahead on that set lets
+# the engine skip positions where no pattern can begin.
+_DANGEROUS_COMPILED = [re.compile(pattern, re.IGNORECASE) for pattern in DANGEROUS_PATTERNS]
+_DANGEROUS_FIRST_CHARS = ''.join(sorted({pattern[0] for pattern in DANGEROUS_PATTERNS}))
+_DANGEROUS_RE = re.compile(
+    f'(?=[{re.escape(_DANGEROUS_FIRST_CHARS)}])(?:'
+    + '|'.join(f'(?:{pattern})' for pattern in DANGEROUS_PATTERNS)
+    + ')',
+    re.IGNORECASE
+)
+
+# HTML/JS sanitization: single characters are deleted in one translate pass, then the
+# scheme substrings are removed (in this order, as the original sequential replaces did)
+_DANGEROUS_CHAR_TABLE = str.maketrans('', '', '<>"\'&')
+_DANGEROUS_SUBSTRINGS = ('javascript:', 'data:')
+
 
 class SandboxError(Exception):
     """Raised when sandbox security is violated"""
@@ -77,11 +97,14 @@ class CodeValidator:
     @staticmethod
     def validate_string(text: str) -> bool:
         """Check if string contains dangerous patterns"""
-        for pattern in DANGEROUS_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
+        if _DANGEROUS_RE.search(text) is None:
+            return True
+        # Rejections are rare; report the first listed pattern that matched
+        for pattern, compiled in zip(DANGEROUS_PATTERNS, _DANGEROUS_COMPILED):
+            if compiled.search(text):
                 logger.warning(f"Dangerous pattern detected: {pattern}")
-                return False
-        return True
+                break
+        return False
 
 
 class DataSandbox:
@@ -104,10 +127,9 @@ class DataSandbox:
             raise SandboxError("String contains dangerous patterns")
         
         # Basic HTML/JS sanitization
-        dangerous_chars = ['<', '>', '"', "'", '&', 'javascript:', 'data:']
-        for char in dangerous_chars:
-            if char in value:
-                value = value.replace(char, '')
+        value = value.translate(_DANGEROUS_CHAR_TABLE)
+        for substring in _DANGEROUS_SUBSTRINGS:
+            value = value.replace(substring, '')
         
         return value.strip()
     
@@ -160,39 +182,74 @@ class DataSandbox:
         return sanitized
 
 
+# Validated, compiled sandbox code keyed by source hash (failures are cached as messages)
+CODE_CACHE_SIZE = 1024
+_code_cache: "OrderedDict[str, Union[types.CodeType, str]]" = OrderedDict()
+_code_cache_lock = threading.Lock()
+_code_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def compile_validated(code: str) -> types.CodeType:
+    """Validate and compile sandbox code, reusing the result for previously seen sources"""
+    key = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+    with _code_cache_lock:
+        cached = _code_cache.get(key)
+        if cached is not None:
+            _code_cache.move_to_end(key)
+            _code_cache_stats['hits'] += 1
+        else:
+            _code_cache_stats['misses'] += 1
+    if cached is None:
+        try:
+            CodeValidator.validate_code(code)
+            try:
+                cached = compile(code, '<sandbox>', 'eval')
+            except Exception as e:
+                raise SandboxError(f"Execution error: {e}")
+        except SandboxError as e:
+            cached = str(e)
+        with _code_cache_lock:
+            _code_cache[key] = cached
+            while len(_code_cache) > CODE_CACHE_SIZE:
+                _code_cache.popitem(last=False)
+    if isinstance(cached, str):
+        raise SandboxError(cached)
+    return cached
+
+
+def code_cache_info() -> Dict[str, int]:
+    """Hit/miss statistics of the validated-code cache"""
+    with _code_cache_lock:
+        return {**_code_cache_stats, 'entries': len(_code_cache), 'max_entries': CODE_CACHE_SIZE}
+
+
 class ExecutionSandbox:
     """Sandbox for safe code execution"""
     
-    def __init__(self):
+    def __init__(self, pool=None):
+        """
+        Args:
+            pool: Optional SandboxWorkerPool; evaluation then runs in isolated
+                  worker processes with per-call timeouts and memory caps
+        """
         self.validator = CodeValidator()
+        self.pool = pool
         self.safe_globals = {
             '__builtins__': {name: __builtins__[name] for name in SAFE_BUILTINS if name in __builtins__}
         }
     
     def execute_safe(self, code: str, local_vars: Optional[Dict[str, Any]] = None) -> Any:
         """Execute code in a restricted environment"""
-        if not self.validator.validate_code(code):
-            raise SandboxError("Code validation failed")
+        # Validation and compilation are cached by source hash
+        compiled_code = compile_validated(code)
+        
+        if self.pool is not None:
+            return self.pool.submit(code, local_vars)
         
         try:
-            # Compile the code
-            compiled_code = compile(code, '<sandbox>', 'eval')
-            
-            # Execute in restricted environment
-            import ast
-            # Use ast.literal_eval for safe evaluation if possible
-            if isinstance(compiled_code, str):
-                try:
-                    result = ast.literal_eval(compiled_code)
-                except Exception:
-                    # Fallback to eval only if absolutely necessary (should be avoided)
-                    result = eval(compiled_code, self.safe_globals, local_vars or {})
-            else:
-                # If not a string, fallback to eval (should be avoided)
-                result = eval(compiled_code, self.safe_globals, local_vars or {})
-
-            return result
-
+            return eval(compiled_code, self.safe_globals, local_vars or {})
+        except MemoryError:
+            raise SandboxError("Execution error: memory limit exceeded")
         except Exception as e:
             raise SandboxError(f"Execution error: {e}")
 
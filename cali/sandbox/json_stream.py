@@ -0,0 +1,411 @@
+"""
+CALI Sandbox - streaming JSON guard
+Incremental, non-recursive JSON parsing with sandbox checks applied as the body
+arrives, and an ASGI middleware that rejects oversized request bodies (too many
+bytes, too long strings or lists, too deep nesting) at the first violating bytes
+instead of after the whole payload is parsed.
+"""
+
+import codecs
+import json
+import logging
+import re
+from typing import Any, Iterable, List, Optional
+
+from . import DataSandbox, SandboxError, default_sandbox
+
+logger = logging.getLogger("CALI.Sandbox")
+
+DEFAULT_MAX_BODY_SIZE = 1024 * 1024
+DEFAULT_MAX_DEPTH = 64
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]*')
+_NUMBER_CHARS = re.compile(r'[-+0-9.eE]*')
+_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+_HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_LITERALS = (('true', True), ('false', False), ('null', None))
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed body is not valid JSON"""
+    pass
+
+
+class _Frame:
+    __slots__ = ('is_map', 'count', 'expect', 'container', 'key')
+
+    def __init__(self, is_map: bool, container):
+        self.is_map = is_map
+        self.count = 0
+        self.expect = 'key' if is_map else 'value'   # 'key' | 'colon' | 'value' | 'comma'
+        self.container = container
+        self.key = None
+
+
+class StreamingJSONSanitizer:
+    """
+    Push parser for JSON bytes that sanitizes and limit-checks while parsing.
+
+    Feed chunks as they arrive; SandboxError is raised as soon as a string grows past
+    the sandbox's max_string_length, a list past max_list_size, nesting past max_depth,
+    or (with sanitize) a complete key/string value fails DataSandbox.sanitize_string.
+    Uses an explicit container stack, so deeply nested input cannot exhaust the Python stack.
+    """
+
+    def __init__(self, sandbox: Optional[DataSandbox] = None, max_depth: int = DEFAULT_MAX_DEPTH,
+                 build: bool = True, sanitize: bool = True):
+        """
+        Args:
+            sandbox: Sandbox whose limits and string sanitization apply
+            max_depth: Deepest allowed nesting of objects/arrays
+            build: Materialize the sanitized value (False only validates)
+            sanitize: Run sanitize_string on keys and strings (False checks limits only)
+        """
+        self.sandbox = sandbox or default_sandbox
+        self.max_depth = max_depth
+        self.build = build
+        self.sanitize = sanitize
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._string: Optional[List[str]] = None  # parts of the string being scanned
+        self._string_length = 0
+        self._string_is_key = False
+        self._root: Any = None
+        self._complete = False
+        self.bytes_seen = 0
+
+    def feed(self, data: bytes):
+        """Parse the next chunk of the body"""
+        self.bytes_seen += len(data)
+        try:
+            text = self._decoder.decode(data)
+        except UnicodeDecodeError as e:
+            raise JSONStreamError(f"Invalid UTF-8: {e}")
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        self._parse(final=False)
+
+    def close(self) -> Any:
+        """Finish parsing and return the sanitized value (None when not building)"""
+        self.feed(b'')
+        try:
+            self._decoder.decode(b'', final=True)
+        except UnicodeDecodeError as e:
+            raise JSONStreamError(f"Invalid UTF-8: {e}")
+        self._parse(final=True)
+        if not self._complete:
+            raise JSONStreamError("Unexpected end of JSON input")
+        return self._root
+
+    # --- Parsing ---
+
+    def _parse(self, final: bool):
+        buf = self._buf
+        end = len(buf)
+        while True:
+            if self._string is not None:
+                if not self._scan_string(final):
+                    return
+                continue
+
+            pos = _WHITESPACE.match(buf, self._pos).end()
+            self._pos = pos
+            if pos >= end:
+                return
+            if self._complete:
+                raise JSONStreamError(f"Extra data at offset {pos}")
+
+            char = buf[pos]
+            frame = self._stack[-1] if self._stack else None
+            expect = frame.expect if frame is not None else 'value'
+
+            if expect == 'comma':
+                if char == ',':
+                    frame.expect = 'key' if frame.is_map else 'value'
+                    self._pos = pos + 1
+                elif char == ('}' if frame.is_map else ']'):
+                    self._pos = pos + 1
+                    self._close_container()
+                else:
+                    raise JSONStreamError(f"Expected ',' at offset {pos}")
+            elif expect == 'colon':
+                if char != ':':
+                    raise JSONStreamError(f"Expected ':' at offset {pos}")
+                frame.expect = 'value'
+                self._pos = pos + 1
+            elif expect == 'key':
+                if char == '"':
+                    self._start_string(pos, is_key=True)
+                elif char == '}' and frame.count == 0:
+                    self._pos = pos + 1
+                    self._close_container()
+                else:
+                    raise JSONStreamError(f"Expected object key at offset {pos}")
+            elif char == '"':
+                self._start_string(pos, is_key=False)
+            elif char == '{' or char == '[':
+                if len(self._stack) >= self.max_depth:
+                    raise SandboxError(f"Nesting too deep: > {self.max_depth}")
+                is_map = char == '{'
+                container = ({} if is_map else []) if self.build else None
+                self._stack.append(_Frame(is_map, container))
+                self._pos = pos + 1
+            elif char == ']' and frame is not None and not frame.is_map and frame.count == 0:
+                self._pos = pos + 1
+                self._close_container()
+            elif char == '-' or '0' <= char <= '9':
+                token_end = _NUMBER_CHARS.match(buf, pos).end()
+                if token_end == end and not final:
+                    return  # the number may continue in the next chunk
+                if not _NUMBER.fullmatch(buf, pos, token_end):
+                    raise JSONStreamError(f"Invalid number at offset {pos}")
+                token = buf[pos:token_end]
+                self._pos = token_end
+                self._emit(float(token) if any(c in token for c in '.eE') else int(token))
+            else:
+                for literal, value in _LITERALS:
+                    if buf.startswith(literal, pos):
+                        self._pos = pos + len(literal)
+                        self._emit(value)
+                        break
+                    if not final and literal.startswith(buf[pos:end]):
+                        return  # partial literal at the end of the chunk
+                else:
+                    raise JSONStreamError(f"Unexpected character {char!r} at offset {pos}")
+
+    def _start_string(self, pos: int, is_key: bool):
+        self._string = []
+        self._string_length = 0
+        self._string_is_key = is_key
+        self._pos = pos + 1
+
+    def _scan_string(self, final: bool) -> bool:
+        """Consume string content; True once the closing quote has been processed"""
+        buf = self._buf
+        end = len(buf)
+        pos = self._pos
+        parts = self._string
+        limit = self.sandbox.max_string_length
+        while True:
+            run_end = _STRING_RUN.match(buf, pos).end()
+            if run_end > pos:
+                parts.append(buf[pos:run_end])
+                self._string_length += run_end - pos
+                pos = run_end
+            if self._string_length > limit:
+                raise SandboxError(f"String too long: {self._string_length} > {limit}")
+            if pos >= end:
+                break
+            char = buf[pos]
+            if char == '"':
+                self._pos = pos + 1
+                self._finish_string()
+                return True
+            if char != '\\':
+                raise JSONStreamError(f"Invalid control character at offset {pos}")
+            if pos + 1 >= end:
+                break
+            escape = buf[pos + 1]
+            if escape == 'u':
+                if pos + 6 > end:
+                    break
+                if not _HEX4.fullmatch(buf, pos + 2, pos + 6):
+                    raise JSONStreamError(f"Invalid \\u escape at offset {pos}")
+                code = int(buf[pos + 2:pos + 6], 16)
+                parts.append(chr(code))
+                # A high surrogate combines with the following low one into a single character
+                self._string_length += 0 if 0xD800 <= code <= 0xDBFF else 1
+                pos += 6
+            elif escape in _ESCAPES:
+                parts.append(_ESCAPES[escape])
+                self._string_length += 1
+                pos += 2
+            else:
+                raise JSONStreamError(f"Invalid escape at offset {pos}")
+        self._pos = pos
+        if final:
+            raise JSONStreamError("Unterminated string")
+        return False
+
+    def _finish_string(self):
+        value = ''.join(self._string)
+        self._string = None
+        if any('\ud800' <= c <= '\udfff' for c in value):
+            value = value.encode('utf-16', 'surrogatepass').decode('utf-16', 'surrogatepass')
+        clean = self.sandbox.sanitize_string(value) if self.sanitize else value
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = clean
+            frame.expect = 'colon'
+        else:
+            self._emit(clean)
+
+    def _close_container(self):
+        frame = self._stack.pop()
+        self._emit(frame.container)
+
+    def _emit(self, value: Any):
+        if not self._stack:
+            self._root = value
+            self._complete = True
+            return
+        frame = self._stack[-1]
+        frame.count += 1
+        if frame.is_map:
+            if self.build:
+                frame.container[frame.key] = value
+        else:
+            if frame.count > self.sandbox.max_list_size:
+                raise SandboxError(f"List too long: {frame.count} > {self.sandbox.max_list_size}")
+            if self.build:
+                frame.container.append(value)
+        frame.expect = 'comma'
+
+
+def sanitize_json_stream(chunks: Iterable[bytes], sandbox: Optional[DataSandbox] = None) -> Any:
+    """Parse and sanitize a JSON document from an iterable of byte chunks"""
+    parser = StreamingJSONSanitizer(sandbox)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+class StreamingBodyGuard:
+    """
+    ASGI middleware enforcing a maximum request body size while the body streams in.
+
+    JSON bodies on guarded paths are parsed incrementally and checked chunk by chunk
+    against the sandbox's string and list limits and max_depth. String contents are
+    not sanitized here; the handlers do that for the fields they use. Violations are
+    answered with 413 (size) or 400 (limits) as soon as they are seen. Accepted
+    bodies are replayed unchanged to the application, and malformed JSON is passed
+    through so the application reports it as before. Other requests are not buffered:
+    they stream through, and only their byte count is checked.
+    """
+
+    def __init__(self, app, max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+                 json_paths: Optional[Iterable[str]] = None, sandbox: Optional[DataSandbox] = None,
+                 max_depth: int = DEFAULT_MAX_DEPTH):
+        """
+        Args:
+            app: Downstream ASGI application
+            max_body_size: Largest accepted body in bytes
+            json_paths: Path prefixes whose JSON bodies are limit-checked (None = all)
+            sandbox: Sandbox providing the string/list limits
+            max_depth: Deepest allowed JSON nesting
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+        self.json_paths = tuple(json_paths) if json_paths is not None else None
+        self.sandbox = sandbox or default_sandbox
+        self.max_depth = max_depth
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        content_length = headers.get(b'content-length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            await self._reject(send, 413, f"Request body too large: > {self.max_body_size} bytes")
+            return
+
+        if b'json' not in headers.get(b'content-type', b'') or not self._guards(scope.get('path', '')):
+            await self._stream_limited(scope, receive, send)
+            return
+        parser = StreamingJSONSanitizer(self.sandbox, self.max_depth, build=False, sanitize=False)
+
+        chunks = []
+        received = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body = message.get('body', b'')
+            received += len(body)
+            if received > self.max_body_size:
+                await self._reject(send, 413, f"Request body too large: > {self.max_body_size} bytes")
+                return
+            if parser is not None and body:
+                try:
+                    parser.feed(body)
+                except SandboxError as e:
+                    logger.warning(f"Request body rejected for {scope.get('path')}: {e}")
+                    await self._reject(send, 400, f"Invalid input: {e}")
+                    return
+                except JSONStreamError:
+                    parser = None  # let the application report malformed JSON
+            chunks.append(body)
+            if not message.get('more_body', False):
+                break
+
+        if parser is not None and received:
+            try:
+                parser.close()
+            except SandboxError as e:
+                await self._reject(send, 400, f"Invalid input: {e}")
+                return
+            except JSONStreamError:
+                pass
+
+        body = b''.join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    async def _stream_limited(self, scope, receive, send):
+        """Pass the request through unbuffered, answering 413 once it exceeds max_body_size"""
+        received = 0
+        exceeded = rejected = started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded, rejected
+            if exceeded:
+                return {'type': 'http.disconnect'}
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_body_size:
+                    exceeded = True
+                    if not started:
+                        rejected = True
+                        await self._reject(send, 413, f"Request body too large: > {self.max_body_size} bytes")
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if rejected:
+                return          # the client already has its 413
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracked_send)
+
+    def _guards(self, path: str) -> bool:
+        return self.json_paths is None or any(path == p or path.startswith(p.rstrip('/') + '/') for p in self.json_paths)
+
+    @staticmethod
+    async def _reject(send, status: int, error: str):
+        payload = json.dumps({'error': error}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(payload)).encode()),
+                        (b'connection', b'close')]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
@@ -0,0 +1,252 @@
+"""
+CALI Sandbox - isolated worker pool
+Evaluates sandboxed code in pre-started worker processes so slow or memory-hungry
+expressions cannot stall the API process. Each call has a timeout (the worker is
+killed and replaced when it expires), each worker runs under an address-space
+cap, and batches are spread across workers with one round trip per worker.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import ExecutionSandbox, SandboxError, compile_validated
+
+logger = logging.getLogger("CALI.Sandbox")
+
+DEFAULT_TIMEOUT = float(os.environ.get('CALI_SANDBOX_TIMEOUT', 2.0))
+DEFAULT_MEMORY_LIMIT_MB = int(os.environ.get('CALI_SANDBOX_MEMORY_MB', 256))
+
+# (ok, result or error message)
+Outcome = Tuple[bool, Any]
+
+
+def _apply_memory_limit(memory_limit_mb: Optional[int]):
+    """Cap the worker's address space at its current size plus memory_limit_mb"""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    try:
+        with open('/proc/self/statm') as f:
+            baseline = int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        baseline = 0
+    limit = baseline + memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Sandbox worker memory limit not applied: {e}")
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]):
+    _apply_memory_limit(memory_limit_mb)
+    sandbox = ExecutionSandbox()
+    while True:
+        try:
+            batch = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if batch is None:
+            return
+        for code, local_vars in batch:
+            try:
+                outcome = (True, sandbox.execute_safe(code, local_vars))
+            except SandboxError as e:
+                outcome = (False, str(e))
+            try:
+                conn.send(outcome)
+            except Exception as e:
+                conn.send((False, f"Execution error: result cannot be returned: {e}"))
+
+
+class _Worker:
+    __slots__ = ('process', 'conn')
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+
+class SandboxWorkerPool:
+    """Pool of sandbox worker processes with per-call timeouts and memory caps"""
+
+    def __init__(self, size: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT,
+                 memory_limit_mb: Optional[int] = DEFAULT_MEMORY_LIMIT_MB, start_method: Optional[str] = None):
+        """
+        Args:
+            size: Number of worker processes (defaults to the CPU count)
+            timeout: Default per-call timeout in seconds
+            memory_limit_mb: Address space each worker may add beyond its start-up size
+            start_method: multiprocessing start method (forkserver where available)
+        """
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._metrics = {'calls': 0, 'failures': 0, 'timeouts': 0, 'crashes': 0, 'respawns': 0, 'batches': 0}
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sandbox-dispatch')
+
+    # --- Public API ---
+
+    def submit(self, code: str, local_vars: Optional[Dict[str, Any]] = None,
+               timeout: Optional[float] = None) -> Any:
+        """Evaluate one expression in a worker; raises SandboxError on failure or timeout"""
+        compile_validated(code)  # reject invalid code without a round trip
+        ok, value = self._run_chunk([(code, local_vars)], timeout)[0]
+        if not ok:
+            raise SandboxError(value)
+        return value
+
+    def map(self, codes: Sequence[str], local_vars: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+            timeout: Optional[float] = None, return_exceptions: bool = False) -> List[Any]:
+        """
+        Evaluate a batch of expressions across the pool.
+
+        Args:
+            codes: Expressions to evaluate
+            local_vars: Per-expression local variables (same length as codes)
+            timeout: Per-call timeout in seconds
+            return_exceptions: Return SandboxError instances in place of failed results
+
+        Returns:
+            Results in input order
+        """
+        items = list(zip(codes, local_vars if local_vars is not None else [None] * len(codes)))
+        if not items:
+            return []
+        with self._lock:
+            self._metrics['batches'] += 1
+        chunk_size = -(-len(items) // self.size)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        if len(chunks) == 1:
+            outcomes = self._run_chunk(chunks[0], timeout)
+        else:
+            futures = [self._dispatch.submit(self._run_chunk, chunk, timeout) for chunk in chunks]
+            outcomes = [outcome for future in futures for outcome in future.result()]
+
+        results = []
+        for ok, value in outcomes:
+            if ok:
+                results.append(value)
+            elif return_exceptions:
+                results.append(SandboxError(value))
+            else:
+                raise SandboxError(value)
+        return results
+
+    async def asubmit(self, code: str, local_vars: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Any:
+        """submit() without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._dispatch, self.submit, code, local_vars, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._metrics, 'size': self.size, 'idle': self._idle.qsize()}
+
+    def close(self):
+        """Stop all workers"""
+        if self._closed:
+            return
+        self._closed = True
+        self._dispatch.shutdown(wait=True)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(timeout=1.0)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Workers ---
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.memory_limit_mb),
+                                        name='cali-sandbox-worker', daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.process.kill()
+        worker.process.join(timeout=1.0)
+        worker.conn.close()
+        with self._lock:
+            self._metrics['respawns'] += 1
+        return self._spawn()
+
+    def _run_chunk(self, items: List[Tuple[str, Optional[Dict[str, Any]]]],
+                   timeout: Optional[float]) -> List[Outcome]:
+        """Run items on one worker, replacing it (and continuing on the new one) after a timeout or crash"""
+        if self._closed:
+            raise SandboxError("Sandbox worker pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        outcomes: List[Outcome] = []
+        pending = items
+        while pending:
+            worker = self._idle.get()
+            try:
+                try:
+                    worker.conn.send(pending)
+                except (OSError, ValueError):
+                    worker = self._replace(worker)
+                    continue
+                except Exception as e:
+                    raise SandboxError(f"Execution error: arguments cannot be sent to the sandbox: {e}")
+                done = 0
+                for _ in pending:
+                    if not worker.conn.poll(timeout):
+                        outcomes.append((False, f"Execution timed out after {timeout}s"))
+                        self._count('timeouts')
+                        worker = self._replace(worker)
+                        done += 1
+                        break
+                    try:
+                        outcomes.append(worker.conn.recv())
+                    except (EOFError, OSError):
+                        outcomes.append((False, "Execution error: sandbox worker exited"))
+                        self._count('crashes')
+                        worker = self._replace(worker)
+                        done += 1
+                        break
+                    done += 1
+                pending = pending[done:]
+            finally:
+                self._idle.put(worker)
+
+        with self._lock:
+            self._metrics['calls'] += len(outcomes)
+            self._metrics['failures'] += sum(1 for ok, _ in outcomes if not ok)
+        return outcomes
+
+    def _count(self, metric: str):
+        with self._lock:
+            self._metrics[metric] += 1
@@ -0,0 +1,200 @@
+"""
+CALI Vault - conditional and ranged vault downloads
+VaultDownloadResponse serves a record opened with open_vault_download(). It sends
+the record's content hash as a strong ETag, answers a matching If-None-Match with
+304 without reading the record, and serves a single byte range (Range, honouring
+If-Range) as 206, or 416 when the range lies past the end.
+
+Plain JSON records are sent from their file descriptor in chunks read on the
+vault I/O pool. uvicorn, which serves the app, implements no zero-copy ASGI
+extension, so that is how every download goes out there; only a server offering
+http.response.zerocopysend gets the descriptor handed over for sendfile. The
+ETag is kept with the record by storage (see open_vault_download). Compressed records are decompressed and
+sliced in memory; the decoded bytes are kept in a small LRU keyed by ETag, so
+ranged and resumed downloads of the same record decompress it once.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage.async_io import vault_io_pool
+from cali.vault.storage.cali_vault_storage import VaultDownload
+
+CHUNK_SIZE = 256 * 1024
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+DECODED_CACHE_BYTES = int(os.environ.get("CALI_VAULT_DOWNLOAD_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised for a byte range starting at or past the end of the record"""
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The (start, end) of a single-range 'bytes=' Range header, end exclusive.
+
+    Returns None when the header should be ignored and the whole record sent
+    (other units, multiple ranges, malformed ranges).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        suffix = int(last)
+        if not suffix or not size:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - suffix), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(int(last) + 1, size) if last else size
+
+
+class DecodedDownloadCache:
+    """Byte-bounded LRU of decompressed records keyed by ETag (a content hash, so never stale)"""
+
+    def __init__(self, max_bytes: int = DECODED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._entries.get(etag)
+            if content is not None:
+                self._entries.move_to_end(etag)
+            return content
+
+    def put(self, etag: str, content: bytes):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if etag in self._entries:
+                return
+            self._entries[etag] = content
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+decoded_downloads = DecodedDownloadCache()
+
+
+async def read_decoded(download: VaultDownload) -> bytes:
+    """JSON bytes of a compressed download, decompressed at most once per content hash while cached"""
+    content = decoded_downloads.get(download.etag)
+    if content is None:
+        content = await vault_io_pool().run(storage.read_download_json, download)
+        decoded_downloads.put(download.etag, content)
+    return content
+
+
+def etag_listed(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists etag (weak comparison)"""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class VaultDownloadResponse(Response):
+    """Response for an opened vault record; closes the record's descriptor once sent"""
+
+    media_type = "application/json"
+
+    def __init__(self, download: VaultDownload, filename: str):
+        self.download = download
+        self.status_code = 200
+        self.background = None
+        self.etag = f'"{download.etag}"'
+        self.last_modified = formatdate(download.mtime, usegmt=True)
+        self.base_headers = {
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "cache-control": "no-cache",
+            "accept-ranges": "bytes",
+            "content-disposition": f'attachment; filename="{filename}"',
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self._respond(scope, send)
+        finally:
+            os.close(self.download.fd)
+        if self.background is not None:
+            await self.background()
+
+    async def _respond(self, scope: Scope, send: Send):
+        request = Headers(scope=scope)
+        if_none_match = request.get("if-none-match")
+        if if_none_match is not None and etag_listed(if_none_match, self.etag):
+            await self._start(send, 304, {})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        download = self.download
+        content = None
+        if download.compressed:
+            content = await read_decoded(download)
+            size = len(content)
+        else:
+            size = download.length
+
+        byte_range = None
+        range_header = request.get("range")
+        if range_header is not None and request.get("if-range", self.etag) in (self.etag, self.last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                await self._start(send, 416, {"content-range": f"bytes */{size}", "content-length": "0"})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        start, end = byte_range or (0, size)
+        headers = {"content-type": self.media_type, "content-length": str(end - start)}
+        if byte_range is not None:
+            headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+        await self._start(send, 206 if byte_range is not None else 200, headers)
+
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif content is not None:
+            await send({"type": "http.response.body", "body": content[start:end]})
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(download.fd, "rb", closefd=False) as f:
+                await send({"type": ZEROCOPY_EXTENSION, "file": f, "offset": download.offset + start,
+                            "count": end - start, "more_body": False})
+        else:
+            pool = vault_io_pool()
+            position = start
+            while True:
+                count = min(CHUNK_SIZE, end - position)
+                chunk = await pool.run(os.pread, download.fd, count, download.offset + position) if count else b""
+                position += len(chunk)
+                more = bool(chunk) and position < end
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+                if not more:
+                    break
+
+    async def _start(self, send: Send, status: int, headers: dict):
+        self.status_code = status
+        raw = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in {**self.base_headers, **headers}.items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw})
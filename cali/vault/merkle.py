@@ -0,0 +1,405 @@
+"""
+CALI Vault - Merkle reconciliation between legacy_vault rows and vault files
+Both sides keep a hash per vault id in SQLite (vault_merkle_entries) and one leaf
+per range of the hashed id space (vault_merkle_leaves, 2**LEAF_BITS leaves). A
+leaf is the XOR of its entries' hashes, so a changed entry updates its leaf in
+O(1). Reconciliation builds a Merkle tree over each side's leaves, descends only
+into subtrees whose hashes differ, and compares and repairs just the entries of
+the differing leaves.
+
+Hashes are kept current without rescanning either side:
+  - legacy_vault triggers mark every inserted, updated or deleted row, from any
+    connection, in vault_merkle_dirty;
+  - a storage save listener marks vault files saved or deleted in this process.
+Files changed while the app was not running are found once per process by
+comparing the manifest's etags with the etags the file hashes were computed for.
+
+Entries are compared on the fields a legacy_vault row and the vault file /prompt
+writes for it share. The database is authoritative: missing or differing files
+are rewritten from their rows. Files without a row (vaults written by other
+subsystems, such as helix events) are hashed into a separate side that is left
+out of the tree, so they never keep the roots apart; they are only counted. A
+file moves between the two sides when its row is inserted or deleted.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cali.vault.storage import cali_vault_storage as storage
+
+logger = logging.getLogger("CALI.Vault")
+
+LEAF_BITS = 12
+LEAVES = 1 << LEAF_BITS
+SIDE_DB = 'db'
+SIDE_FILES = 'files'
+SIDE_ORPHANS = 'orphans'    # vault files without a legacy_vault row; not part of any tree
+VAULT_FIELDS = ("vault_id", "title", "description", "keywords", "category", "created_at")
+ROW_COLUMNS = "vault_id, title, description, trigger_keywords, category, created_at"
+_EMPTY = bytes(16)
+
+MERKLE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS vault_merkle_entries (
+        side TEXT NOT NULL,
+        vault_id TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        digest BLOB NOT NULL,
+        etag TEXT,
+        PRIMARY KEY (side, vault_id)
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_vault_merkle_bucket ON vault_merkle_entries (side, bucket)',
+    '''CREATE TABLE IF NOT EXISTS vault_merkle_leaves (
+        side TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        digest BLOB NOT NULL,
+        PRIMARY KEY (side, bucket)
+    )''',
+    'CREATE TABLE IF NOT EXISTS vault_merkle_dirty (vault_id TEXT PRIMARY KEY)',
+)
+MERKLE_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS legacy_vault_merkle_insert AFTER INSERT ON legacy_vault BEGIN
+        INSERT OR IGNORE INTO vault_merkle_dirty VALUES (NEW.vault_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS legacy_vault_merkle_update AFTER UPDATE ON legacy_vault BEGIN
+        INSERT OR IGNORE INTO vault_merkle_dirty VALUES (OLD.vault_id);
+        INSERT OR IGNORE INTO vault_merkle_dirty VALUES (NEW.vault_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS legacy_vault_merkle_delete AFTER DELETE ON legacy_vault BEGIN
+        INSERT OR IGNORE INTO vault_merkle_dirty VALUES (OLD.vault_id);
+    END''',
+)
+
+
+def ensure_merkle_schema(conn: sqlite3.Connection):
+    """Create the hash tables and legacy_vault triggers; rows that predate the triggers get hashed"""
+    installed = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'legacy_vault_merkle_%'"
+    ).fetchone()[0]
+    for statement in MERKLE_SCHEMA + MERKLE_TRIGGERS:
+        conn.execute(statement)
+    if installed < len(MERKLE_TRIGGERS):
+        conn.execute('INSERT OR IGNORE INTO vault_merkle_dirty SELECT vault_id FROM legacy_vault')
+    conn.commit()
+
+
+# --- Hashing ---
+
+def row_to_vault(row: Sequence[Any]) -> Dict[str, Any]:
+    """The vault file /prompt writes for a legacy_vault row (columns as in ROW_COLUMNS)"""
+    vault_id, title, description, trigger_keywords, category, created_at = row
+    return {
+        "vault_id": vault_id, "title": title, "description": description,
+        "keywords": trigger_keywords.split(",") if trigger_keywords else [],
+        "category": category, "created_at": created_at
+    }
+
+
+def vault_digest(vault: Any) -> bytes:
+    """Hash of the fields a legacy_vault row and its vault file share"""
+    if isinstance(vault, dict):
+        fields = {field: vault.get(field) for field in VAULT_FIELDS}
+        if isinstance(fields["keywords"], list):
+            # The database stores keywords comma-joined
+            fields["keywords"] = ",".join(str(k) for k in fields["keywords"])
+        vault = fields
+    canonical = json.dumps(vault, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+
+def bucket_of(vault_id: str) -> int:
+    digest = hashlib.blake2b(vault_id.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') >> (32 - LEAF_BITS)
+
+
+def _leaf_term(vault_id: str, digest: bytes) -> int:
+    """An entry's contribution to its leaf (keyed by id, so equal contents never cancel out)"""
+    return int.from_bytes(hashlib.blake2b(vault_id.encode('utf-8') + digest, digest_size=16).digest(), 'big')
+
+
+def merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """Tree levels from the leaves (levels[0]) up to the root (levels[-1][0])"""
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        levels.append([hashlib.blake2b(below[i] + below[i + 1], digest_size=16).digest()
+                       for i in range(0, len(below), 2)])
+    return levels
+
+
+def differing_leaves(a: List[List[bytes]], b: List[List[bytes]]) -> Tuple[List[int], int]:
+    """Leaves where two trees differ, visiting only differing subtrees; also returns nodes compared"""
+    candidates, compared = [0], 0
+    for level in range(len(a) - 1, -1, -1):
+        compared += len(candidates)
+        differing = [i for i in candidates if a[level][i] != b[level][i]]
+        if not level:
+            return differing, compared
+        candidates = [child for i in differing for child in (2 * i, 2 * i + 1)]
+    return [], compared
+
+
+# --- Reconciler ---
+
+class VaultReconciler:
+    """Keeps both sides' hashes current and rewrites vault files that differ from legacy_vault"""
+
+    def __init__(self, database_path: str, batch_size: int = 500):
+        """
+        Args:
+            database_path: SQLite database holding legacy_vault
+            batch_size: Entries rehashed or repaired per transaction
+        """
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._dirty_lock = threading.Lock()
+        self._dirty_files = set()
+        self._checked_dir: Optional[str] = None   # vault dir whose etags have been compared this process
+        storage.add_save_listener(self._file_changed)
+
+    def close(self):
+        storage.remove_save_listener(self._file_changed)
+
+    def reconcile(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Bring the hashes up to date, then compare and repair the differing ranges.
+
+        Args:
+            dry_run: Only report what differs
+
+        Returns:
+            Counts of rehashed, compared, missing, mismatched and repaired entries, both
+            Merkle roots after the run, and the number of vault files without a row
+        """
+        started = time.monotonic()
+        with self._lock:
+            conn = sqlite3.connect(self.database_path, timeout=30)
+            try:
+                ensure_merkle_schema(conn)
+                report = {
+                    "rehashed_rows": self._refresh_rows(conn),
+                    "rehashed_files": self._refresh_files(conn),
+                    "ranges_compared": 0, "entries_compared": 0, "missing": 0, "mismatched": 0,
+                    "pending": 0, "repaired": 0, "failed": 0
+                }
+                leaves, nodes = differing_leaves(*(merkle_levels(self._leaves(conn, side))
+                                                   for side in (SIDE_DB, SIDE_FILES)))
+                report["nodes_compared"] = nodes
+                report["ranges_compared"] = len(leaves)
+
+                stale = []
+                for bucket in leaves:
+                    rows, files = (dict(conn.execute(
+                        'SELECT vault_id, digest FROM vault_merkle_entries WHERE side = ? AND bucket = ?',
+                        (side, bucket))) for side in (SIDE_DB, SIDE_FILES))
+                    report["entries_compared"] += len(rows) + len(files)
+                    for vault_id, digest in rows.items():
+                        if vault_id not in files:
+                            report["missing"] += 1
+                            stale.append(vault_id)
+                        elif files[vault_id] != digest:
+                            report["mismatched"] += 1
+                            stale.append(vault_id)
+
+                # Vaults still queued in the outbox are about to be written anyway
+                pending = self._outbox_pending(conn, stale)
+                report["pending"] = len(pending)
+                stale = [vault_id for vault_id in stale if vault_id not in pending]
+                if stale and not dry_run:
+                    report["repaired"], report["failed"] = self._repair(conn, stale)
+                    self._refresh_files(conn)
+
+                db_root, files_root = (merkle_levels(self._leaves(conn, side))[-1][0]
+                                       for side in (SIDE_DB, SIDE_FILES))
+                orphans = conn.execute('SELECT COUNT(*) FROM vault_merkle_entries WHERE side = ?',
+                                       (SIDE_ORPHANS,)).fetchone()[0]
+                report.update(db_root=db_root.hex(), files_root=files_root.hex(), in_sync=db_root == files_root,
+                              orphan_files=orphans, seconds=round(time.monotonic() - started, 3))
+                return report
+            finally:
+                conn.close()
+
+    # --- Keeping hashes current ---
+
+    def _file_changed(self, vault_id: str, data: Optional[dict]):
+        with self._dirty_lock:
+            self._dirty_files.add(vault_id)
+
+    def _refresh_rows(self, conn: sqlite3.Connection) -> int:
+        """Rehash the legacy_vault rows marked by the triggers"""
+        total = 0
+        while True:
+            # IMMEDIATE so a row written between reading it and clearing its mark is not lost
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                ids = [r[0] for r in conn.execute('SELECT vault_id FROM vault_merkle_dirty LIMIT ?',
+                                                  (self.batch_size,))]
+                if not ids:
+                    conn.commit()
+                    return total
+                rows = {row[0]: row for row in self._select_rows(conn, ids)}
+                self._apply(conn, SIDE_DB, {
+                    vault_id: (vault_digest(row_to_vault(rows[vault_id])), None) if vault_id in rows else None
+                    for vault_id in ids
+                })
+                self._move_files(conn, ids, rows)
+                conn.executemany('DELETE FROM vault_merkle_dirty WHERE vault_id = ?', [(i,) for i in ids])
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            total += len(ids)
+
+    def _refresh_files(self, conn: sqlite3.Connection) -> int:
+        """Rehash vault files saved or deleted since the last run (all changed files on the first run)"""
+        with self._dirty_lock:
+            changed = self._dirty_files
+            self._dirty_files = set()
+        vault_dir = f"{storage.VAULT_BACKEND}:{storage.VAULT_DIR}"
+        if self._checked_dir != vault_dir:
+            changed.update(self._changed_since_last_process(conn))
+            # Files hashed before orphans had a side of their own
+            changed.update(r[0] for r in conn.execute(
+                'SELECT vault_id FROM vault_merkle_entries WHERE side = ? '
+                'AND vault_id NOT IN (SELECT vault_id FROM legacy_vault)', (SIDE_FILES,)))
+            self._checked_dir = vault_dir
+
+        manifest = storage.vault_manifest()
+        changed = sorted(changed)
+        for start in range(0, len(changed), self.batch_size):
+            batch = changed[start:start + self.batch_size]
+            with_rows = {row[0] for row in self._select_rows(conn, batch)}
+            files, orphans = {}, {}
+            for vault_id in batch:
+                entry = manifest.get(vault_id)
+                # Raw JSON rather than load_memory_vault, so hashing does not churn the read cache
+                raw = None if entry is None else storage.read_vault_json(vault_id)
+                update = None if raw is None else (vault_digest(json.loads(raw)), entry.etag)
+                files[vault_id] = update if vault_id in with_rows else None
+                orphans[vault_id] = None if vault_id in with_rows else update
+            with conn:
+                self._apply(conn, SIDE_FILES, files)
+                self._apply(conn, SIDE_ORPHANS, orphans)
+        return len(changed)
+
+    def _move_files(self, conn: sqlite3.Connection, ids: List[str], rows: Dict[str, tuple]):
+        """Move file hashes between the files and orphans sides for rows that appeared or went away"""
+        moves = {SIDE_FILES: {}, SIDE_ORPHANS: {}}
+        for chunk in _chunks(ids, 500):
+            for side, vault_id, digest, etag in conn.execute(
+                    f'SELECT side, vault_id, digest, etag FROM vault_merkle_entries '
+                    f'WHERE side IN (?, ?) AND vault_id IN ({",".join("?" * len(chunk))})',
+                    (SIDE_FILES, SIDE_ORPHANS, *chunk)):
+                target = SIDE_FILES if vault_id in rows else SIDE_ORPHANS
+                if side != target:
+                    moves[side][vault_id] = None
+                    moves[target][vault_id] = (digest, etag)
+        for side, updates in moves.items():
+            if updates:
+                self._apply(conn, side, updates)
+
+    def _changed_since_last_process(self, conn: sqlite3.Connection) -> List[str]:
+        """Ids whose manifest etag differs from the stored one, merging the two sorted id lists"""
+        manifest = storage.vault_manifest()
+        # Each id is hashed on at most one of the two sides
+        stored = conn.execute('SELECT vault_id, etag FROM vault_merkle_entries WHERE side IN (?, ?) '
+                              'ORDER BY vault_id', (SIDE_FILES, SIDE_ORPHANS))
+        changed = []
+        known = next(stored, None)
+        for vault_id in manifest.ids():
+            while known is not None and known[0] < vault_id:
+                changed.append(known[0])            # no longer stored
+                known = next(stored, None)
+            if known is not None and known[0] == vault_id:
+                entry = manifest.get(vault_id)
+                if entry is None or entry.etag is None or entry.etag != known[1]:
+                    changed.append(vault_id)
+                known = next(stored, None)
+            else:
+                changed.append(vault_id)
+        while known is not None:
+            changed.append(known[0])
+            known = next(stored, None)
+        return changed
+
+    def _apply(self, conn: sqlite3.Connection, side: str, updates: Dict[str, Optional[Tuple[bytes, Optional[str]]]]):
+        """Store new (digest, etag) pairs (None removes the entry) and fold the changes into the leaves"""
+        ids = list(updates)
+        previous = {}
+        for chunk in _chunks(ids, 500):
+            previous.update((vault_id, (bucket, digest)) for vault_id, bucket, digest in conn.execute(
+                f'SELECT vault_id, bucket, digest FROM vault_merkle_entries '
+                f'WHERE side = ? AND vault_id IN ({",".join("?" * len(chunk))})', (side, *chunk)))
+
+        deltas: Dict[int, int] = {}
+        upserts, deletes = [], []
+        for vault_id, update in updates.items():
+            if vault_id in previous:
+                bucket, digest = previous[vault_id]
+                deltas[bucket] = deltas.get(bucket, 0) ^ _leaf_term(vault_id, digest)
+            if update is None:
+                deletes.append((side, vault_id))
+                continue
+            bucket = bucket_of(vault_id)
+            deltas[bucket] = deltas.get(bucket, 0) ^ _leaf_term(vault_id, update[0])
+            upserts.append((side, vault_id, bucket, update[0], update[1]))
+        conn.executemany('DELETE FROM vault_merkle_entries WHERE side = ? AND vault_id = ?', deletes)
+        conn.executemany('INSERT OR REPLACE INTO vault_merkle_entries (side, vault_id, bucket, digest, etag) '
+                         'VALUES (?, ?, ?, ?, ?)', upserts)
+
+        for bucket, delta in deltas.items():
+            if not delta:
+                continue
+            row = conn.execute('SELECT digest FROM vault_merkle_leaves WHERE side = ? AND bucket = ?',
+                               (side, bucket)).fetchone()
+            leaf = int.from_bytes(row[0], 'big') ^ delta if row else delta
+            conn.execute('INSERT OR REPLACE INTO vault_merkle_leaves (side, bucket, digest) VALUES (?, ?, ?)',
+                         (side, bucket, leaf.to_bytes(16, 'big')))
+
+    def _leaves(self, conn: sqlite3.Connection, side: str) -> List[bytes]:
+        leaves = [_EMPTY] * LEAVES
+        for bucket, digest in conn.execute('SELECT bucket, digest FROM vault_merkle_leaves WHERE side = ?', (side,)):
+            leaves[bucket] = digest
+        return leaves
+
+    # --- Repair ---
+
+    def _select_rows(self, conn: sqlite3.Connection, ids: List[str]) -> List[tuple]:
+        rows = []
+        for chunk in _chunks(ids, 500):
+            rows.extend(conn.execute(f'SELECT {ROW_COLUMNS} FROM legacy_vault '
+                                     f'WHERE vault_id IN ({",".join("?" * len(chunk))})', chunk))
+        return rows
+
+    def _outbox_pending(self, conn: sqlite3.Connection, ids: List[str]) -> set:
+        pending = set()
+        try:
+            for chunk in _chunks(ids, 500):
+                pending.update(r[0] for r in conn.execute(
+                    f'SELECT DISTINCT vault_id FROM vault_outbox WHERE vault_id IN ({",".join("?" * len(chunk))})',
+                    chunk))
+        except sqlite3.OperationalError:
+            pass  # no outbox table in this database
+        return pending
+
+    def _repair(self, conn: sqlite3.Connection, ids: List[str]) -> Tuple[int, int]:
+        """Rewrite the vault files of the given rows; returns (repaired, failed)"""
+        repaired = failed = 0
+        for chunk in _chunks(ids, self.batch_size):
+            items = [(row[0], row_to_vault(row)) for row in self._select_rows(conn, chunk)]
+            results = storage.save_memory_vault_batch(items)
+            repaired += sum(1 for ok in results.values() if ok)
+            failed += sum(1 for ok in results.values() if not ok)
+        if failed:
+            logger.warning(f"Vault reconciliation: {failed} vault file(s) could not be repaired")
+        return repaired, failed
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,232 @@
+"""
+CALI Vault - transactional outbox for vault file materialization
+Request handlers insert their database row and an outbox record in the same
+SQLite transaction and return; a background worker later writes the vault
+entries to storage in batches (one durability sync per batch) and deletes the
+outbox records it materialized. Because saves are keyed by vault id and replay
+the stored payload, processing a record twice (e.g. after a crash between the
+save and the delete) is harmless. Failed saves are retried with capped
+exponential backoff, so the database and the vault storage always converge.
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("CALI.Vault")
+
+OUTBOX_SCHEMA = '''CREATE TABLE IF NOT EXISTS vault_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vault_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+)'''
+OUTBOX_INDEX = 'CREATE INDEX IF NOT EXISTS idx_vault_outbox_due ON vault_outbox (next_attempt_at, id)'
+
+
+def ensure_outbox_schema(conn: sqlite3.Connection):
+    conn.execute(OUTBOX_SCHEMA)
+    conn.execute(OUTBOX_INDEX)
+    conn.commit()
+
+
+def enqueue_vault_write(conn: sqlite3.Connection, vault_id: str, data: Dict[str, Any]):
+    """Add an outbox record inside the caller's open transaction (the caller commits)"""
+    conn.execute(
+        'INSERT INTO vault_outbox (vault_id, payload, created_at) VALUES (?, ?, ?)',
+        (vault_id, json.dumps(data, ensure_ascii=False), time.time())
+    )
+
+
+class VaultOutboxWorker:
+    """Background thread that materializes outbox records into vault storage"""
+
+    def __init__(self, database_path: str,
+                 save_batch: Callable[[Iterable[Tuple[str, Dict[str, Any]]]], Dict[str, bool]],
+                 batch_size: int = 200, poll_interval: float = 1.0,
+                 retry_base: float = 0.5, retry_max: float = 300.0):
+        """
+        Args:
+            database_path: SQLite database holding the vault_outbox table
+            save_batch: Saves (vault_id, data) pairs, returning vault_id -> success
+            batch_size: Outbox records claimed per batch
+            poll_interval: Seconds between polls when not notified
+            retry_base: Backoff after the first failed attempt (doubles per attempt)
+            retry_max: Cap on the backoff
+        """
+        self.database_path = database_path
+        self.save_batch = save_batch
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats_conn: Optional[sqlite3.Connection] = None
+        self._stats_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {'materialized': 0, 'coalesced': 0, 'failures': 0, 'batches': 0}
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='vault-outbox', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Wake the worker after committing new outbox records"""
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+
+    def stop(self, drain: bool = True, timeout: float = 10.0):
+        """Stop the worker, first materializing everything that is due if drain is set"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if drain:
+            self.drain()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._stats_lock:
+            if self._stats_conn is not None:
+                self._stats_conn.close()
+                self._stats_conn = None
+
+    # --- Processing ---
+
+    def drain(self, max_batches: int = 1000) -> int:
+        """Process due records until none are left; returns how many were materialized"""
+        total = 0
+        for _ in range(max_batches):
+            done = self.process_batch()
+            if not done:
+                break
+            total += done
+        return total
+
+    def process_batch(self) -> int:
+        """Materialize one batch of due records; returns how many records were completed"""
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            rows = conn.execute(
+                'SELECT id, vault_id, payload, attempts FROM vault_outbox '
+                'WHERE next_attempt_at <= ? ORDER BY id LIMIT ?', (now, self.batch_size)
+            ).fetchall()
+            if not rows:
+                return 0
+
+            # Only the newest record per vault id needs writing; older ones complete with it
+            latest: Dict[str, Tuple[int, str, int]] = {}
+            ids_by_vault: Dict[str, List[int]] = {}
+            for row_id, vault_id, payload, attempts in rows:
+                latest[vault_id] = (row_id, payload, attempts)
+                ids_by_vault.setdefault(vault_id, []).append(row_id)
+
+            # A newer record that is not due yet (backing off after a failure) supersedes
+            # these: writing them now would only be overwritten, or outlive it on replay
+            superseded = []
+            for chunk in _chunks(list(latest), 500):
+                for vault_id, newest in conn.execute(
+                        f'SELECT vault_id, MAX(id) FROM vault_outbox '
+                        f'WHERE vault_id IN ({",".join("?" * len(chunk))}) GROUP BY vault_id', chunk):
+                    if newest > latest[vault_id][0]:
+                        superseded.extend(ids_by_vault.pop(vault_id))
+                        del latest[vault_id]
+
+            items, undecodable = [], {}
+            for vault_id, (_, payload, _) in latest.items():
+                try:
+                    items.append((vault_id, json.loads(payload)))
+                except ValueError as e:
+                    undecodable[vault_id] = f"Corrupt outbox payload: {e}"
+            try:
+                results = self.save_batch(items) if items else {}
+            except Exception as e:
+                logger.error(f"Vault outbox batch failed: {e}", exc_info=True)
+                results = {vault_id: False for vault_id, _ in items}
+
+            completed, written, failed = list(superseded), [], []
+            for vault_id, (row_id, _, attempts) in latest.items():
+                if results.get(vault_id):
+                    completed.extend(ids_by_vault[vault_id])
+                    written.append((vault_id, row_id))
+                else:
+                    error = undecodable.get(vault_id, "Vault save failed")
+                    delay = min(self.retry_max, self.retry_base * 2 ** attempts) * random.uniform(0.8, 1.2)
+                    failed.append((now + delay, error, row_id))
+                    completed.extend(i for i in ids_by_vault[vault_id] if i != row_id)
+
+            with conn:
+                conn.executemany('DELETE FROM vault_outbox WHERE id = ?', [(i,) for i in completed])
+                # Older records for a written id, including ones still backing off, must never replay
+                conn.executemany('DELETE FROM vault_outbox WHERE vault_id = ? AND id < ?', written)
+                conn.executemany(
+                    'UPDATE vault_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? '
+                    'WHERE id = ?', failed
+                )
+
+            self._metrics['batches'] += 1
+            self._metrics['materialized'] += len(latest) - len(failed)
+            self._metrics['coalesced'] += len(rows) - len(latest)     # includes superseded records
+            self._metrics['failures'] += len(failed)
+            if failed:
+                logger.warning(f"Vault outbox: {len(failed)} record(s) failed, will retry")
+            return len(completed)
+
+    def stats(self) -> Dict[str, Any]:
+        # Own connection and lock, so stats never wait for a batch's save_batch call
+        with self._stats_lock:
+            if self._stats_conn is None:
+                self._stats_conn = sqlite3.connect(self.database_path, timeout=30, check_same_thread=False)
+                ensure_outbox_schema(self._stats_conn)
+            pending, oldest = self._stats_conn.execute(
+                'SELECT COUNT(*), MIN(created_at) FROM vault_outbox').fetchone()
+        return {
+            **self._metrics,
+            'pending': pending,
+            'oldest_pending_seconds': time.time() - oldest if oldest is not None else 0.0,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
+
+    # --- Internals ---
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.database_path, timeout=30, check_same_thread=False)
+            ensure_outbox_schema(self._conn)
+        return self._conn
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.process_batch():
+                    pass
+            except Exception as e:
+                logger.error(f"Vault outbox worker error: {e}", exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
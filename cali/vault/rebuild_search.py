@@ -0,0 +1,39 @@
+"""
+Rebuild the full-text search index over the vault JSON from scratch.
+
+Safe to run beside the app: the index is replaced in one transaction, so
+searches keep seeing the old index until the rebuild commits, and a segment
+store is opened read-only (the app holds its writer lock).
+
+    python -m cali.vault.rebuild_search --vault-dir data/vault_files
+"""
+
+import argparse
+
+from cali.vault.search import VaultSearchIndex
+from cali.vault.storage import cali_vault_storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild the CALI vault full-text search index')
+    parser.add_argument('--vault-dir', default=None, help='Vault directory (default: CALI_VAULT_DIR)')
+    parser.add_argument('--index', default=None, help='Index file (default: .vault-search.sqlite in the vault directory)')
+    args = parser.parse_args(argv)
+
+    read_only = cali_vault_storage.VAULT_READ_ONLY
+    cali_vault_storage.set_read_only()
+    if args.vault_dir:
+        cali_vault_storage.set_vault_dir(args.vault_dir)
+    index = VaultSearchIndex(args.index)
+    try:
+        report = index.rebuild()
+    finally:
+        index.close()
+        cali_vault_storage.set_read_only(read_only)
+
+    print(f"Indexed {report['indexed']} vault records, failed {report['failed']}, in {report['seconds']}s.")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,288 @@
-# cali/vault/reconciliation.py
+"""
+CALI Vault - entry reconciliation
+Deduplicates vault entries by id with a last-writer-wins policy: an entry that
+comes later in the input replaces earlier ones with the same id. The
+reconciler is an external merge sort. It reads entries as an iterator, spills
+sorted runs of at most run_size entries to temporary files, and merges the runs.
+Memory therefore stays bounded however large the vault is. Output is in id order.
+
+VaultEntryReader streams the "entries" array of a vault's JSON (for example from
+iter_vault_json) and can copy the document as it reads it, so consolidating a
+vault never needs the whole vault in memory.
+"""
+
+import codecs
+import heapq
+import json
+import os
+import pickle
+import re
+import tempfile
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from cali.vault.storage.durability import atomic_write
+
+DEFAULT_RUN_SIZE = 100_000
+_SPILL_BATCH = 1000
+_BY_ID = itemgetter(0)
+_NOTHING = object()
+RECONCILED_DIR = Path(os.environ.get("CALI_RECONCILED_DIR", "vault/reconciled"))
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_ARRAY_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])')
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_DECODER = json.JSONDecoder()
+
+
+def _sort_key(entry_id: Any) -> Tuple[int, Any]:
+    """Orderable key for an entry id (numbers, then strings, then anything else as JSON)"""
+    if type(entry_id) is str:
+        return 1, entry_id
+    if isinstance(entry_id, (int, float)) and not isinstance(entry_id, bool):
+        return 0, entry_id
+    return 2, json.dumps(entry_id, sort_keys=True)
+
+
+def _spill(run: List[tuple], tmp_dir: Optional[str]) -> BinaryIO:
+    """Sort a run of (id, seq, entry) and write it to an anonymous temporary file as pickled batches"""
+    run.sort(key=_BY_ID)
+    spill = tempfile.TemporaryFile(dir=tmp_dir)
+    for start in range(0, len(run), _SPILL_BATCH):
+        pickle.dump(run[start:start + _SPILL_BATCH], spill, protocol=pickle.HIGHEST_PROTOCOL)
+    spill.seek(0)
+    return spill
+
+
+def _read_run(spill: BinaryIO) -> Iterator[tuple]:
+    while True:
+        try:
+            batch = pickle.load(spill)
+        except EOFError:
+            return
+        yield from batch
+
+
+def iter_reconciled_entries(entries: Iterable[Dict[str, Any]], run_size: int = DEFAULT_RUN_SIZE,
+                            tmp_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Deduplicate entries by their 'id', keeping the last one seen for each id.
+
+    Args:
+        entries: Entries in write order (any iterable; read once)
+        run_size: Entries held in memory before a sorted run is spilled to disk
+        tmp_dir: Directory for the spilled runs (defaults to the system temp dir)
+
+    Yields:
+        One entry per id, in id order
+    """
+    # Runs are kept per kind of id (numbers, strings, other), so every sort and merge
+    # compares ids of one type; (id, seq, entry) items never compare entries, as seq is unique
+    runs = ([], [], [])
+    run = ([], [], [])
+    size = 0
+    try:
+        for seq, entry in enumerate(entries):
+            kind, entry_id = _sort_key(entry['id'])
+            run[kind].append((entry_id, seq, entry))
+            size += 1
+            if size >= run_size:
+                for kind_runs, items in zip(runs, run):
+                    if items:
+                        kind_runs.append(_spill(items, tmp_dir))
+                run, size = ([], [], []), 0
+
+        for kind_runs, items in zip(runs, run):
+            # A stable sort by id keeps equal ids in write order
+            items.sort(key=_BY_ID)
+            merged = heapq.merge(*(_read_run(spill) for spill in kind_runs), items) if kind_runs else items
+            previous_id, previous = _NOTHING, None
+            for entry_id, _, entry in merged:
+                if previous_id is not _NOTHING and entry_id != previous_id:
+                    yield previous
+                previous_id, previous = entry_id, entry
+            if previous_id is not _NOTHING:
+                yield previous
+    finally:
+        for kind_runs in runs:
+            for spill in kind_runs:
+                spill.close()
+
 
 def reconcile_entries(entries):
-    # Dummy logic for reconciliation
-    reconciled = list({entry['id']: entry for entry in entries}.values())
-    return reconciled
+    """Deduplicated entries as a list (see iter_reconciled_entries)"""
+    return list(iter_reconciled_entries(entries))
+
+
+def reconcile_to_file(entries: Iterable[Dict[str, Any]], filepath, sample: int = 0,
+                      run_size: int = DEFAULT_RUN_SIZE) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Write the reconciled entries to filepath as a JSON array, one entry at a time.
+
+    Returns:
+        (number of entries written, the first `sample` of them)
+    """
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    count, head = 0, []
+
+    def chunks():
+        nonlocal count
+        yield b"["
+        for entry in iter_reconciled_entries(entries, run_size=run_size, tmp_dir=str(filepath.parent)):
+            yield ((",\n" if count else "\n") + _ENCODER.encode(entry)).encode("utf-8")
+            if count < sample:
+                head.append(entry)
+            count += 1
+        yield b"\n]\n"
+
+    atomic_write(filepath, chunks(), fsync=False)
+    return count, head
+
 
 def save_reconciled_summary(summary, filepath="vault/reconciled_summary.json"):
-    import json
     with open(filepath, "w") as f:
         json.dump(summary, f, indent=4)
+
+
+class VaultEntryReader:
+    """
+    Streams one array member of a vault's top-level JSON object.
+
+    Iterating yields the elements of the `key` array one at a time. The other
+    top-level members are parsed whole into `members`, so they should be small.
+    With `copy`, the document is rewritten to that text file as it is read. Members
+    named in `drop` are left out. The closing brace is not written, so the caller
+    can append members: `copied` says how many members were written.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], key: str = "entries", copy: Optional[TextIO] = None,
+                 drop: Iterable[str] = ()):
+        self.key = key
+        self.copy = copy
+        self.drop = set(drop)
+        self.members: Dict[str, Any] = {}
+        self.copied = 0
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._text = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self.copy is not None:
+            self.copy.write("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name, _ = self._value()
+            if not isinstance(name, str):
+                raise ValueError("Vault JSON member name is not a string")
+            self._expect(":")
+            keep = self.copy is not None and name not in self.drop
+            if keep:
+                self.copy.write(("," if self.copied else "") + _ENCODER.encode(name) + ":")
+                self.copied += 1
+            if name == self.key and self._peek() == "[":
+                yield from self._array(keep)
+            else:
+                value, raw = self._value()
+                self.members[name] = value
+                if keep:
+                    self.copy.write(raw)
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' in vault JSON, found {separator!r}")
+
+    def _array(self, keep: bool) -> Iterator[Any]:
+        self._expect("[")
+        if keep:
+            self.copy.write("[")
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            first = True
+            while True:
+                # Fast path: the element and the separator after it are already buffered
+                text = self._text
+                start = _WHITESPACE.match(text, self._pos).end()
+                try:
+                    value, end = _DECODER.raw_decode(text, start)
+                    separator = _ARRAY_SEPARATOR.match(text, end)
+                except json.JSONDecodeError:
+                    separator = None
+                if separator is not None:
+                    raw = text[start:end]
+                    self._pos = separator.end()
+                    closing = separator.group(1) == "]"
+                else:
+                    value, raw = self._value()
+                    found = self._peek()
+                    self._pos += 1
+                    if found not in ",]":
+                        raise ValueError(f"Expected ',' or ']' in vault JSON, found {found!r}")
+                    closing = found == "]"
+                if keep:
+                    self.copy.write(raw if first else "," + raw)
+                first = False
+                yield value
+                if closing:
+                    break
+        if keep:
+            self.copy.write("]")
+
+    # --- Buffering ---
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, dropping what has been consumed"""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(chunk)
+        self._text = self._text[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text) or not self._fill():
+                return
+
+    def _peek(self) -> str:
+        self._skip_whitespace()
+        if self._pos >= len(self._text):
+            raise ValueError("Unexpected end of vault JSON")
+        return self._text[self._pos]
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in vault JSON, found {found!r}")
+        self._pos += 1
+
+    def _value(self) -> Tuple[Any, str]:
+        """Parse the next value, returning it and its source text"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._text, self._pos)
+                # A value running to the end of the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self._text) or self._eof:
+                    raw = self._text[self._pos:end]
+                    self._pos = end
+                    return value, raw
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
@@ -0,0 +1,412 @@
+"""
+CALI Vault - full-text search over vault JSON
+A sidecar SQLite FTS5 index of every stored vault. Each vault is indexed as a
+title and a body, where the body is its other string values in document order.
+Searches are ranked by bm25 and come with a highlighted snippet.
+
+The index is maintained incrementally:
+  - a storage save listener queues every saved or deleted vault, and a background
+    thread applies the queue in batches (a search also applies it, but only when
+    no update holds the writer);
+  - vaults changed while the app was not running are found once per process by
+    comparing the manifest's etags with the etags they were indexed at, and are
+    indexed by flush() one batch at a time.
+Searches read through their own WAL connections, so they never wait for an update.
+The index only holds derived data, so rebuild() (python -m cali.vault.rebuild_search)
+can always recreate it from storage.
+"""
+
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from cali.vault.storage import cali_vault_storage as storage
+
+logger = logging.getLogger("CALI.Vault")
+
+SEARCH_INDEX_NAME = ".vault-search.sqlite"
+MAX_INDEXED_CHARS = int(os.environ.get("CALI_VAULT_SEARCH_MAX_CHARS", 256 * 1024))
+FLUSH_INTERVAL = float(os.environ.get("CALI_VAULT_SEARCH_FLUSH_MS", 500)) / 1000
+TITLE_WEIGHT = 5.0
+METADATA_FIELDS = ("title", "vault_id", "category", "created_at")   # top-level fields kept out of the body
+_DELETED = object()
+
+SEARCH_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS vault_search_docs (
+        doc INTEGER PRIMARY KEY,
+        vault_id TEXT NOT NULL UNIQUE,
+        category TEXT,
+        etag TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_vault_search_category ON vault_search_docs (category)',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS vault_search_text USING fts5(
+        title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '3'
+    )''',
+)
+_TERM = re.compile(r'(\w+)(\*?)', re.UNICODE)
+MIN_PREFIX = 3
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"')
+
+
+def vault_text(vault: Any) -> Tuple[str, str]:
+    """The (title, body) indexed for a vault; the body is capped at MAX_INDEXED_CHARS"""
+    title, stack = "", [vault]
+    if isinstance(vault, dict):
+        if isinstance(vault.get("title"), str):
+            title = vault["title"]
+        stack = [value for key, value in reversed(vault.items()) if key not in METADATA_FIELDS]
+    parts, size = [], 0
+    while stack and size < MAX_INDEXED_CHARS:
+        value = stack.pop()
+        if isinstance(value, str):
+            parts.append(value)
+            size += len(value) + 1
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return title, "\n".join(parts)[:MAX_INDEXED_CHARS]
+
+
+def _stored_text(vault_id: str, size: int) -> Optional[Tuple[str, str]]:
+    """Index text for a stored vault, reading only a prefix of vaults too large to load"""
+    if size <= 4 * MAX_INDEXED_CHARS:
+        # Raw JSON rather than load_memory_vault, so indexing does not churn the read cache
+        raw = storage.read_vault_json(vault_id)
+        return None if raw is None else vault_text(json.loads(raw))
+    chunks = storage.iter_vault_json(vault_id)
+    if chunks is None:
+        return None
+    head = bytearray()
+    try:
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= 4 * MAX_INDEXED_CHARS:
+                break
+    finally:
+        chunks.close()
+    parts = []
+    for literal in _STRING_LITERAL.findall(head.decode("utf-8", errors="ignore")):
+        try:
+            parts.append(json.loads(literal))
+        except ValueError:
+            continue
+    return "", "\n".join(parts)[:MAX_INDEXED_CHARS]
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    An FTS5 MATCH expression requiring every word of a free-text query.
+
+    Anything but words is dropped, so queries cannot use (or break on) FTS5 syntax. A
+    word ending in '*' matches as a prefix once it has MIN_PREFIX characters.
+    """
+    terms = [f'"{word}"*' if star and len(word) >= MIN_PREFIX else f'"{word}"'
+             for word, star in _TERM.findall(query)]
+    return " ".join(terms) if terms else None
+
+
+class VaultSearchIndex:
+    """Sidecar FTS5 index kept current from the storage save listener"""
+
+    def __init__(self, index_path: Optional[str] = None, batch_size: int = 2000,
+                 flush_interval: float = FLUSH_INTERVAL):
+        """
+        Args:
+            index_path: SQLite file for the index (default: SEARCH_INDEX_NAME in the vault directory)
+            batch_size: Vaults indexed per transaction when catching up or rebuilding
+            flush_interval: Seconds the background thread waits before applying queued saves
+        """
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()               # serializes writes and the writer connection
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._backlog: List[str] = []               # changed while not running; applied after _pending
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_path: Optional[Path] = None
+        self._readers = threading.local()
+        self._checked_dir: Optional[str] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {'indexed': 0, 'removed': 0, 'flushes': 0, 'searches': 0}
+        storage.add_save_listener(self._vault_saved)
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the thread that applies queued saves (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='vault-search', daemon=True)
+            self._thread.start()
+        self._wake.set()                        # catch up on vaults changed while not running
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the thread and apply whatever is still queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def close(self):
+        self.stop()
+        storage.remove_save_listener(self._vault_saved)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        reader = getattr(self._readers, 'conn', None)
+        if reader is not None:
+            reader.close()
+            self._readers.conn = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.wait(self.flush_interval):
+                break
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Vault search index update failed: {e}", exc_info=True)
+
+    # --- Searching ---
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Vaults matching every word of query, best first.
+
+        Returns:
+            One dict per hit with vault_id, category, score (bm25; lower is better) and snippet
+        """
+        if self._lock.acquire(blocking=False):      # read your own saves, unless an update is running
+            try:
+                self._apply_batch(self._take_pending())
+            finally:
+                self._lock.release()
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        sql = ('SELECT d.vault_id, d.category, bm25(vault_search_text, ?, 1.0) AS score, '
+               "snippet(vault_search_text, -1, '[', ']', '…', 16) "
+               'FROM vault_search_text JOIN vault_search_docs d ON d.doc = vault_search_text.rowid '
+               'WHERE vault_search_text MATCH ?')
+        params: List[Any] = [TITLE_WEIGHT, expression]
+        if category is not None:
+            sql += ' AND d.category = ?'
+            params.append(category)
+        sql += ' ORDER BY score LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        rows = self._reader().execute(sql, params).fetchall()
+        self._metrics['searches'] += 1
+        return [{"vault_id": vault_id, "category": category, "score": round(score, 4), "snippet": snippet}
+                for vault_id, category, score, snippet in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            pending = len(self._pending)
+        documents = self._reader().execute('SELECT COUNT(*) FROM vault_search_docs').fetchone()[0]
+        return {**self._metrics, 'documents': documents, 'pending': pending,
+                'running': self._thread is not None and self._thread.is_alive()}
+
+    # --- Keeping the index current ---
+
+    def _vault_saved(self, vault_id: str, data: Optional[dict]):
+        # None (deleted or streamed) is looked up when the queue is applied
+        text = vault_text(data) if data is not None else None
+        with self._pending_lock:
+            self._pending[vault_id] = text
+        if self._thread is not None:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Apply queued saves (and, once per process, changes made while not running); returns vaults applied.
+
+        The writer lock is taken per batch, so a long catch-up lets searches apply their own saves in between.
+        """
+        with self._lock:
+            vault_dir = f"{storage.VAULT_BACKEND}:{storage.VAULT_DIR}"
+            if self._checked_dir != vault_dir:
+                self._backlog = self._changed_since_last_process(self._writer())
+                self._checked_dir = vault_dir
+        applied = 0
+        while True:
+            with self._lock:
+                batch = self._take_pending()
+                if not batch and self._backlog:
+                    batch = dict.fromkeys(self._backlog[-self.batch_size:])
+                    del self._backlog[-self.batch_size:]
+                if not batch:
+                    break
+                self._apply_batch(batch)
+            applied += len(batch)
+        if applied:
+            self._metrics['flushes'] += 1
+        return applied
+
+    def _take_pending(self) -> Dict[str, Any]:
+        """Remove up to batch_size queued saves from the queue"""
+        with self._pending_lock:
+            ids = list(itertools.islice(self._pending, self.batch_size))
+            return {vault_id: self._pending.pop(vault_id) for vault_id in ids}
+
+    def _apply_batch(self, batch: Dict[str, Any]):
+        """Index a batch of vault id -> queued text (None: read it) in one transaction (call with self._lock held)"""
+        if not batch:
+            return
+        manifest = storage.vault_manifest()
+        updates = {}
+        for vault_id, text in batch.items():
+            entry = manifest.get(vault_id)
+            if entry is None:
+                updates[vault_id] = _DELETED
+                continue
+            text = text or self._read_text(vault_id, entry)
+            if text is None:
+                continue                            # unreadable: keeps its previous text
+            updates[vault_id] = (text[0], text[1], entry.category, entry.etag)
+        conn = self._writer()
+        with conn:
+            self._apply(conn, updates)
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reindex every stored vault from scratch; searches keep seeing the old index until it commits"""
+        started = time.monotonic()
+        with self._lock:
+            conn = self._writer()
+            with self._pending_lock:
+                self._pending = {}
+            self._backlog = []
+            manifest = storage.vault_manifest()
+            indexed = failed = 0
+            with conn:
+                # sqlite3 would run the DDL below in autocommit; an explicit transaction makes the
+                # whole rebuild atomic, so a failed rebuild rolls back to the previous index.
+                # Dropping the FTS table is much cheaper than deleting its rows one by one
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DROP TABLE vault_search_text')
+                conn.execute('DELETE FROM vault_search_docs')
+                for statement in SEARCH_SCHEMA:
+                    conn.execute(statement)
+                ids = manifest.ids()
+                for start in range(0, len(ids), self.batch_size):
+                    docs, texts = [], []
+                    for vault_id in ids[start:start + self.batch_size]:
+                        entry = manifest.get(vault_id)
+                        text = self._read_text(vault_id, entry) if entry is not None else None
+                        if text is None:
+                            failed += 1
+                            continue
+                        indexed += 1
+                        docs.append((indexed, vault_id, entry.category, entry.etag))
+                        texts.append((indexed, *text))
+                    conn.executemany('INSERT INTO vault_search_docs (doc, vault_id, category, etag) '
+                                     'VALUES (?, ?, ?, ?)', docs)
+                    conn.executemany('INSERT INTO vault_search_text (rowid, title, body) VALUES (?, ?, ?)', texts)
+                self._metrics['indexed'] += indexed
+            conn.execute("INSERT INTO vault_search_text (vault_search_text) VALUES ('optimize')")
+            conn.commit()
+            self._checked_dir = f"{storage.VAULT_BACKEND}:{storage.VAULT_DIR}"
+        return {"indexed": indexed, "failed": failed, "seconds": round(time.monotonic() - started, 3)}
+
+    def _read_text(self, vault_id: str, entry) -> Optional[Tuple[str, str]]:
+        try:
+            return _stored_text(vault_id, entry.size)
+        except Exception as e:
+            logger.warning(f"Vault {vault_id} could not be indexed: {e}")
+            return None
+
+    def _changed_since_last_process(self, conn: sqlite3.Connection) -> List[str]:
+        """Ids whose manifest etag differs from the indexed one, merging the two sorted id lists"""
+        indexed = conn.execute('SELECT vault_id, etag FROM vault_search_docs ORDER BY vault_id')
+        changed = []
+        known = next(indexed, None)
+        for vault_id, etag in storage.vault_manifest().etags():
+            while known is not None and known[0] < vault_id:
+                changed.append(known[0])            # no longer stored
+                known = next(indexed, None)
+            if known is not None and known[0] == vault_id:
+                if etag is None or etag != known[1]:
+                    changed.append(vault_id)
+                known = next(indexed, None)
+            else:
+                changed.append(vault_id)
+        while known is not None:
+            changed.append(known[0])
+            known = next(indexed, None)
+        return changed
+
+    def _apply(self, conn: sqlite3.Connection, updates: Dict[str, Any]):
+        """Replace the indexed text of each vault; _DELETED removes it"""
+        for vault_id, update in updates.items():
+            row = conn.execute('SELECT doc FROM vault_search_docs WHERE vault_id = ?', (vault_id,)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM vault_search_text WHERE rowid = ?', row)
+            if update is _DELETED:
+                if row is not None:
+                    conn.execute('DELETE FROM vault_search_docs WHERE doc = ?', row)
+                    self._metrics['removed'] += 1
+                continue
+            title, body, category, etag = update
+            if row is None:
+                doc = conn.execute('INSERT INTO vault_search_docs (vault_id, category, etag) VALUES (?, ?, ?)',
+                                   (vault_id, category, etag)).lastrowid
+            else:
+                doc = row[0]
+                conn.execute('UPDATE vault_search_docs SET category = ?, etag = ? WHERE doc = ?',
+                             (category, etag, doc))
+            conn.execute('INSERT INTO vault_search_text (rowid, title, body) VALUES (?, ?, ?)', (doc, title, body))
+            self._metrics['indexed'] += 1
+
+    # --- Connections ---
+
+    def _path(self) -> Path:
+        return Path(self.index_path) if self.index_path else storage.VAULT_DIR / SEARCH_INDEX_NAME
+
+    def _writer(self) -> sqlite3.Connection:
+        """The connection used for updates (call with self._lock held); reopened if the vault dir moved"""
+        path = self._path()
+        if self._conn is not None and self._conn_path != path:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+            # Derived data: WAL lets searches run during updates, and a lost commit is caught up on restart
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SEARCH_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn, self._conn_path = conn, path
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """A per-thread read connection, so searches do not wait for each other or for updates"""
+        path = self._path()
+        reader = getattr(self._readers, 'conn', None)
+        if reader is None or self._readers.path != path:
+            if reader is not None:
+                reader.close()
+            if self._conn_path != path:
+                with self._lock:
+                    self._writer()              # creates the schema
+            reader = sqlite3.connect(str(path), timeout=30)
+            self._readers.conn, self._readers.path = reader, path
+        return reader
@@ -0,0 +1,145 @@
+"""
+CALI Vault - non-blocking storage API for async request handlers
+Runs the blocking vault storage calls on a dedicated, bounded thread pool so a
+slow disk neither blocks the event loop nor exhausts the server's shared thread
+pool. The pool sheds load once max_pending calls are queued or running
+(VaultIOBusy) and reports queue depth and queue wait times.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from cali.vault.storage import cali_vault_storage as storage
+
+IO_THREADS = int(os.environ.get("CALI_VAULT_IO_THREADS", 8))
+IO_MAX_PENDING = int(os.environ.get("CALI_VAULT_IO_MAX_PENDING", 256))
+
+
+class VaultIOBusy(Exception):
+    """Raised when too many vault operations are already queued"""
+    pass
+
+
+class VaultIOPool:
+    """Bounded thread pool for vault I/O with queue-depth metrics"""
+
+    def __init__(self, max_workers: int = IO_THREADS, max_pending: int = IO_MAX_PENDING):
+        """
+        Args:
+            max_workers: Threads performing vault I/O
+            max_pending: Calls allowed to be queued or running before new ones are rejected
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vault-io')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._metrics = {'completed': 0, 'failed': 0, 'rejected': 0, 'max_queue_depth': 0,
+                         'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._metrics['rejected'] += 1
+                raise VaultIOBusy(f"Vault I/O queue is full ({self._pending} pending)")
+            self._pending += 1
+            queued = self._pending - self._running
+            if queued > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = queued
+        submitted = time.monotonic()
+
+        def call():
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self._running += 1
+                self._metrics['wait_seconds_total'] += waited
+                if waited > self._metrics['wait_seconds_max']:
+                    self._metrics['wait_seconds_max'] = waited
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._metrics['failed' if failed else 'completed'] += 1
+
+        future = self._executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel():
+                # Never started, so call() will not release its slot
+                with self._lock:
+                    self._pending -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._metrics['completed'] + self._metrics['failed']
+            return {
+                **self._metrics,
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'running': self._running,
+                'queue_depth': self._pending - self._running,
+                'wait_ms_avg': 1000 * self._metrics['wait_seconds_total'] / done if done else 0.0
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool: Optional[VaultIOPool] = None
+_pool_lock = threading.Lock()
+
+
+def vault_io_pool() -> VaultIOPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = VaultIOPool()
+    return _pool
+
+
+def _run(fn: Callable, *args, **kwargs):
+    return vault_io_pool().run(partial(fn, *args, **kwargs))
+
+
+async def aload_memory_vault(vault_id: str, readonly: bool = False) -> Optional[dict]:
+    return await _run(storage.load_memory_vault, vault_id, readonly=readonly)
+
+
+async def asave_memory_vault(vault_id: str, data: dict) -> bool:
+    return await _run(storage.save_memory_vault, vault_id, data)
+
+
+async def adelete_memory_vault(vault_id: str) -> bool:
+    return await _run(storage.delete_memory_vault, vault_id)
+
+
+async def aread_vault_json(vault_id: str) -> Optional[bytes]:
+    return await _run(storage.read_vault_json, vault_id)
+
+
+async def alist_memory_vaults() -> List[str]:
+    return await _run(storage.list_memory_vaults)
+
+
+async def avault_manifest():
+    """The vault manifest, building it on the pool if this is the first use"""
+    return await _run(storage.vault_manifest)
+
+
+async def aopen_vault_download(vault_id: str) -> Optional[storage.VaultDownload]:
+    return await _run(storage.open_vault_download, vault_id)
@@ -1,31 +1,674 @@
+# Cali Vault Storage Module
+# Facade over the vault storage backends, selected with CALI_VAULT_BACKEND:
+#   files    - one JSON file per vault id (default), minified or compressed per CALI_VAULT_CODEC
+#   segments - log-structured segment store (see segment_store.py); one process writes it,
+#              tools running beside it call set_read_only() first
+# Every save and delete also updates the in-memory VaultManifest, so listing and
+# lookups of unknown ids never touch the storage directory.
+# Files are replaced atomically (temp file + rename); CALI_VAULT_DURABILITY picks
+# how much is fsynced: none, fsync, or group (one leader fsyncs and renames the temp
+# files of concurrent saves, then fsyncs the directory once).
+# Parsed vaults are kept in a byte-bounded LRU (VaultReadCache), validated against
+# the stored record on each load and invalidated by our own writes.
+# Records are encoded per CALI_VAULT_CODEC (see record_format.py); loads detect the
+# encoding, and migrate_vault_format() rewrites stored records into the current one.
+# The manifest also keeps each record's content hash, the strong ETag for downloads
+# (see open_vault_download). The file backend also stores (category, etag) with
+# each file in an extended attribute, so a restart without a current snapshot
+# need not re-read the files; segment records never change in place, so their
+# snapshot entries, keyed by record location, stay exact. Save listeners hear about every save and delete made
+# through this module (see add_save_listener). Vaults too large to hold in memory
+# can be read and saved as JSON chunk streams (iter_vault_json, save_memory_vault_stream).
 import os
 import json
+import time
+import atexit
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
-VAULT_DIR = Path("cali/vault/storage")
+from cali.vault.storage import record_format
+from cali.vault.storage.durability import (
+    DURABILITY_MODES, GroupCommit, GroupWriter, StagedWrite, fsync_directory, is_temp_file, stage_write
+)
+from cali.vault.storage.manifest import ManifestEntry, VaultManifest
+from cali.vault.storage.read_cache import VaultReadCache
+from cali.vault.storage.segment_store import SegmentStore
+
+VAULT_DIR = Path(os.environ.get("CALI_VAULT_DIR", "cali/vault/storage"))
 VAULT_DIR.mkdir(parents=True, exist_ok=True)
 
+VAULT_BACKEND = os.environ.get("CALI_VAULT_BACKEND", "files").lower()
+SEGMENT_DIR = Path(os.environ.get("CALI_VAULT_SEGMENT_DIR", VAULT_DIR / "segments"))
+SEGMENT_BYTES = int(os.environ.get("CALI_VAULT_SEGMENT_BYTES", 64 * 1024 * 1024))
+COMPACTION_INTERVAL = float(os.environ.get("CALI_VAULT_COMPACTION_INTERVAL", 300))
+# Tools that only read (rebuild_search) open the segment store without its single-writer lock
+VAULT_READ_ONLY = False
+MANIFEST_SNAPSHOT = ".vault-manifest"
+DESCRIPTION_XATTR = "user.cali.vault"
+
+VAULT_DURABILITY = os.environ.get("CALI_VAULT_DURABILITY", "group").lower()
+if VAULT_DURABILITY not in DURABILITY_MODES:
+    print(f"⚠️ Unknown CALI_VAULT_DURABILITY '{VAULT_DURABILITY}', using 'group'.")
+    VAULT_DURABILITY = "group"
+GROUP_COMMIT_WINDOW = float(os.environ.get("CALI_VAULT_GROUP_COMMIT_MS", 0)) / 1000
+
+VAULT_CODEC = os.environ.get("CALI_VAULT_CODEC", record_format.CODEC_JSON).lower()
+if VAULT_CODEC not in record_format.CODECS:
+    print(f"⚠️ Unknown CALI_VAULT_CODEC '{VAULT_CODEC}', using 'json'.")
+    VAULT_CODEC = record_format.CODEC_JSON
+COMPRESS_MIN_BYTES = int(os.environ.get("CALI_VAULT_COMPRESS_MIN_BYTES", record_format.DEFAULT_MIN_COMPRESS_BYTES))
+
+# Read cache budget (in decoded JSON bytes, whatever the codec) and how cached files are validated:
+#   stat   - compare (mtime_ns, size) on every load; catches edits made outside this process
+#   writes - trust that only saves through this module change vault files (no syscall on a hit)
+CACHE_BYTES = int(float(os.environ.get("CALI_VAULT_CACHE_MB", 64)) * 1024 * 1024)
+CACHE_VALIDATE = os.environ.get("CALI_VAULT_CACHE_VALIDATE", "stat").lower()
+_read_cache = VaultReadCache(CACHE_BYTES)
+
+_segment_store: Optional[SegmentStore] = None
+_manifest: Optional[VaultManifest] = None
+_init_lock = threading.RLock()
+_save_listeners: List[Callable[[str, Optional[dict]], None]] = []
+
+
+def set_vault_dir(path) -> None:
+    """Point the file backend (and, unless configured separately, the segment store) at path"""
+    global VAULT_DIR, SEGMENT_DIR, _manifest
+    with _init_lock:
+        VAULT_DIR = Path(path)
+        VAULT_DIR.mkdir(parents=True, exist_ok=True)
+        if "CALI_VAULT_SEGMENT_DIR" not in os.environ and _segment_store is None:
+            SEGMENT_DIR = VAULT_DIR / "segments"
+        _manifest = None
+        _read_cache.clear()
+
+
+def set_read_only(read_only: bool = True) -> None:
+    """Open the segment store read-only (call before first use), so this process can run beside the app"""
+    global VAULT_READ_ONLY
+    with _init_lock:
+        VAULT_READ_ONLY = read_only
+
+
+def _segments() -> SegmentStore:
+    """Open the segment store on first use and start its background compaction"""
+    global _segment_store
+    if _segment_store is None:
+        with _init_lock:
+            if _segment_store is None:
+                store = SegmentStore(SEGMENT_DIR, segment_bytes=SEGMENT_BYTES, read_only=VAULT_READ_ONLY)
+                if COMPACTION_INTERVAL > 0 and not VAULT_READ_ONLY:
+                    store.start_background_compaction(COMPACTION_INTERVAL)
+                _segment_store = store
+    return _segment_store
+
+
+_file_commit = GroupWriter(lambda: VAULT_DIR, GROUP_COMMIT_WINDOW)
+_segment_commit = GroupCommit(lambda: _segments().sync(), GROUP_COMMIT_WINDOW)
+
+
+def _sync_files() -> None:
+    """Make completed renames/unlinks in VAULT_DIR durable according to VAULT_DURABILITY"""
+    if VAULT_DURABILITY == "fsync":
+        fsync_directory(VAULT_DIR)
+    elif VAULT_DURABILITY == "group":
+        _file_commit.commit()
+
+
+def _publish_files(staged: List[StagedWrite]) -> None:
+    """Rename staged vault files into place, fsyncing them and VAULT_DIR according to VAULT_DURABILITY"""
+    if VAULT_DURABILITY == "group":
+        _file_commit.commit(staged)             # the group leader fsyncs and renames them
+        return
+    try:
+        for write in staged:
+            write.publish(fsync=VAULT_DURABILITY == "fsync")
+    finally:
+        for write in staged:
+            if not write.published:
+                write.discard()
+    _sync_files()
+
+
+def _sync_segments() -> None:
+    if VAULT_DURABILITY == "fsync":
+        _segments().sync()
+    elif VAULT_DURABILITY == "group":
+        _segment_commit.commit()
+
+
 def _vault_path(vault_id: str) -> Path:
     return VAULT_DIR / f"{vault_id}.json"
-def load_memory_vault(vault_id: str) -> Optional[dict]:
-    path = _vault_path(vault_id)
-    if not path.exists():
+
+
+def _copy_json(value):
+    """Copy of a parsed JSON value (much cheaper than copy.deepcopy)"""
+    kind = type(value)
+    if kind is dict:
+        return {k: _copy_json(v) for k, v in value.items()}
+    if kind is list:
+        return [_copy_json(v) for v in value]
+    return value
+
+
+def _encode(data) -> bytes:
+    return record_format.encode(data, VAULT_CODEC, COMPRESS_MIN_BYTES)
+
+
+def _describe(payload) -> Tuple[Optional[str], Optional[str]]:
+    """(category, etag) of a stored record"""
+    try:
+        content = record_format.decode_bytes(payload)
+    except ValueError:
+        return None, None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+    return (data.get("category") if isinstance(data, dict) else None), record_format.content_hash(content)
+
+
+def _store_description(target, stat: os.stat_result, category: Optional[str], etag: str) -> None:
+    """Keep a vault file's (category, etag) with the file, valid for the size and mtime given"""
+    if VAULT_READ_ONLY or not hasattr(os, "setxattr"):
+        return
+    value = json.dumps([stat.st_size, stat.st_mtime_ns, category, etag]).encode("utf-8")
+    try:
+        os.setxattr(target, DESCRIPTION_XATTR, value)
+    except OSError:
+        pass  # filesystem without user extended attributes
+
+
+def _stored_description(target, stat: os.stat_result) -> Optional[Tuple[Optional[str], str]]:
+    """The (category, etag) kept with a vault file, if computed for the file as it is now"""
+    if not hasattr(os, "getxattr"):
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print(f"⚠️ Vault {vault_id} could not be parsed.")
+        size, mtime_ns, category, etag = json.loads(os.getxattr(target, DESCRIPTION_XATTR))
+    except (OSError, ValueError, TypeError):
+        return None
+    return (category, etag) if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns) else None
+
+
+def _snapshot_path() -> Path:
+    return (SEGMENT_DIR if VAULT_BACKEND == "segments" else VAULT_DIR) / MANIFEST_SNAPSHOT
+
+
+def vault_manifest() -> VaultManifest:
+    """The manifest of stored vault ids, built on first use from the backend and the last snapshot"""
+    global _manifest
+    if _manifest is None:
+        with _init_lock:
+            if _manifest is None:
+                snapshot = VaultManifest.load_snapshot(_snapshot_path())
+                manifest = VaultManifest()
+                manifest.replace_all(_scan_segments(snapshot) if VAULT_BACKEND == "segments"
+                                     else _scan_files(snapshot))
+                _manifest = manifest
+    return _manifest
+
+
+def _scan_files(snapshot):
+    """Manifest entries for the file backend, parsing only files changed since the snapshot"""
+    with os.scandir(VAULT_DIR) as it:
+        for entry in it:
+            if is_temp_file(entry.name):
+                # Left behind by a save interrupted before its rename
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+                continue
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            vault_id = entry.name[:-len(".json")]
+            stat = entry.stat()
+            known = snapshot.get(vault_id)
+            if known is not None and known.size == stat.st_size and known.mtime == stat.st_mtime:
+                yield vault_id, known
+                continue
+            described = _stored_description(entry.path, stat)
+            if described is not None:
+                yield vault_id, ManifestEntry(stat.st_size, stat.st_mtime, *described)
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    category, etag = _describe(f.read())
+                    if etag is not None:
+                        _store_description(f.fileno(), stat, category, etag)
+            except OSError:
+                category, etag = None, None
+            yield vault_id, ManifestEntry(stat.st_size, stat.st_mtime, category, etag)
+
+
+def _scan_segments(snapshot):
+    """Manifest entries for the segment backend, parsing only records changed since the snapshot"""
+    store = _segments()
+    now = time.time()
+    for vault_id in store.ids():
+        size = store.payload_size(vault_id)
+        known = snapshot.get(vault_id)
+        if known is not None and known.size == size:
+            # An etag is only trusted for the exact record it was computed from
+            location = store.location(vault_id)
+            yield vault_id, known if known.version == location else known._replace(etag=None, version=None)
+        else:
+            payload, location = store.get_with_location(vault_id)
+            if payload is None:
+                continue
+            category, etag = _describe(payload)
+            yield vault_id, ManifestEntry(size, now, category, etag, location)
+
+
+def save_manifest_snapshot() -> None:
+    """Persist the manifest so the next start only re-reads changed entries"""
+    if _manifest is not None and not VAULT_READ_ONLY:     # the snapshot belongs to the writing process
+        try:
+            _manifest.save_snapshot(_snapshot_path())
+        except OSError as e:
+            print(f"⚠️ Vault manifest snapshot could not be saved: {e}")
+
+
+atexit.register(save_manifest_snapshot)
+
+
+def add_save_listener(listener: Callable[[str, Optional[dict]], None]) -> None:
+    """
+    Call listener(vault_id, data) after every save and delete.
+
+    data is the saved vault, or None when it was deleted or saved from a stream
+    (vault_exists() tells the two apart).
+    """
+    _save_listeners.append(listener)
+
+
+def remove_save_listener(listener: Callable[[str, Optional[dict]], None]) -> None:
+    if listener in _save_listeners:
+        _save_listeners.remove(listener)
+
+
+def _notify_listeners(vault_id: str, data: Optional[dict]) -> None:
+    for listener in list(_save_listeners):
+        try:
+            listener(vault_id, data)
+        except Exception as e:
+            print(f"⚠️ Vault save listener failed for {vault_id}: {e}")
+
+
+def vault_exists(vault_id: str) -> bool:
+    return vault_id in vault_manifest()
+
+
+def vault_cache_stats() -> dict:
+    return _read_cache.stats()
+
+
+def load_memory_vault(vault_id: str, readonly: bool = False) -> Optional[dict]:
+    # readonly=True returns the cached object itself, which callers must not modify;
+    # otherwise the caller gets a private copy.
+    if _manifest is not None and vault_id not in _manifest:
         return None
+
+    if VAULT_BACKEND == "segments":
+        store = _segments()
+        cached = _read_cache.get(vault_id, store.location(vault_id))
+    else:
+        path = _vault_path(vault_id)
+        validator = None
+        if CACHE_VALIDATE == "stat":
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                _read_cache.invalidate(vault_id)
+                return None
+            validator = (stat.st_mtime_ns, stat.st_size)
+        cached = _read_cache.get(vault_id, validator, validate=CACHE_VALIDATE == "stat")
+    if cached is not None:
+        return cached if readonly else _copy_json(cached)
+
+    token = _read_cache.begin()
+    if VAULT_BACKEND == "segments":
+        payload, validator = store.get_with_location(vault_id)
+        if payload is None:
+            return None
+    else:
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        validator = (stat.st_mtime_ns, stat.st_size)
+    try:
+        json_bytes = record_format.decode_bytes(payload)
+        vault = json.loads(json_bytes)
+    except ValueError:
+        print(f"⚠️ Vault {vault_id} could not be parsed.")
         return None
+    # Charged by decoded size: a compressed record parses into far more memory than it stores
+    _read_cache.put(vault_id, vault, validator, len(json_bytes), token)
+    return vault if readonly else _copy_json(vault)
+
+class _PendingSave(NamedTuple):
+    """A record written by _write_record() that _commit_saves() has yet to make durable and announce"""
+    vault_id: str
+    data: Optional[dict]            # None for streamed saves
+    category: Optional[str]
+    etag: str
+    size: int
+    mtime: float
+    version: Optional[tuple]        # segment location
+    staged: Optional[StagedWrite]   # files backend: not renamed into place yet
+
+def _write_record(vault_id: str, payload: Union[bytes, Iterable[bytes]], data: Optional[dict],
+                  category: Optional[str], etag: Callable[[], str]) -> _PendingSave:
+    """Store one encoded record (the file backend only stages it) without the durability sync"""
+    version = staged = None
+    if VAULT_BACKEND == "segments":
+        payload = payload if isinstance(payload, bytes) else b"".join(payload)
+        version = _segments().put(vault_id, payload)
+        size, mtime = len(payload), time.time()
+    else:
+        staged = stage_write(_vault_path(vault_id), payload)
+        size, mtime = staged.stat.st_size, staged.stat.st_mtime
+    content_etag = etag()
+    if staged is not None:
+        _store_description(staged.fd, staged.stat, category, content_etag)
+    return _PendingSave(vault_id, data, category, content_etag, size, mtime, version, staged)
+
+def _write_vault(vault_id: str, data: dict) -> _PendingSave:
+    category = data.get("category") if isinstance(data, dict) else None
+    payload, content = record_format.encode_with_json(data, VAULT_CODEC, COMPRESS_MIN_BYTES)
+    return _write_record(vault_id, payload, data, category, lambda: record_format.content_hash(content))
+
+def _commit_saves(saves: List[_PendingSave]) -> None:
+    """Make written records durable (and staged files visible), then update the cache, manifest and listeners"""
+    try:
+        if VAULT_BACKEND == "segments":
+            _sync_segments()
+        else:
+            _publish_files([save.staged for save in saves])
+    finally:
+        for save in saves:
+            if save.staged is not None and not save.staged.published:
+                continue                        # never reached the disk
+            # Invalidated only now: a load before the rename would have cached the old file
+            _read_cache.invalidate(save.vault_id)
+            if _manifest is not None:
+                _manifest.record(save.vault_id, save.size, save.mtime, save.category, save.etag, save.version)
+            _notify_listeners(save.vault_id, save.data)
 
 def save_memory_vault(vault_id: str, data: dict) -> bool:
-    path = _vault_path(vault_id)
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        _commit_saves([_write_vault(vault_id, data)])
         return True
     except Exception as e:
         print(f"❌ Failed to save vault {vault_id}: {e}")
         return False
+
+def save_memory_vault_stream(vault_id: str, chunks: Iterable[bytes], category: Optional[str] = None) -> bool:
+    """
+    save_memory_vault() for a vault given as JSON byte chunks, which is never held in
+    memory as a whole by the file backend (the segment store keeps records whole).
+
+    Args:
+        vault_id: Vault to replace
+        chunks: The vault's JSON; stored as given, or compressed as it streams
+        category: The vault's category, for the manifest
+    """
+    hasher = record_format.content_hasher()
+
+    def hashed():
+        for chunk in chunks:
+            hasher.update(chunk)
+            yield chunk
+
+    try:
+        payload = record_format.iter_encode_json(hashed(), VAULT_CODEC)
+        _commit_saves([_write_record(vault_id, payload, None, category, hasher.hexdigest)])
+    except Exception as e:
+        print(f"❌ Failed to save vault {vault_id}: {e}")
+        return False
+    return True
+
+def save_memory_vault_batch(items) -> Dict[str, bool]:
+    """
+    Save several (vault_id, data) pairs, paying for one durability sync.
+
+    Returns:
+        vault_id -> whether it was saved and synced
+    """
+    results: Dict[str, bool] = {}
+    saves = []
+    for vault_id, data in items:
+        try:
+            saves.append(_write_vault(vault_id, data))
+            results[vault_id] = True
+        except Exception as e:
+            print(f"❌ Failed to save vault {vault_id}: {e}")
+            results[vault_id] = False
+    if saves:
+        try:
+            _commit_saves(saves)
+        except Exception as e:
+            print(f"❌ Failed to sync vault batch: {e}")
+            results = dict.fromkeys(results, False)
+    return results
+
+def delete_memory_vault(vault_id: str) -> bool:
+    if _manifest is not None and vault_id not in _manifest:
+        return False
+    if VAULT_BACKEND == "segments":
+        deleted = _segments().delete(vault_id)
+        _read_cache.invalidate(vault_id)
+        if deleted:
+            _sync_segments()
+    else:
+        try:
+            _vault_path(vault_id).unlink()
+            _read_cache.invalidate(vault_id)
+            deleted = True
+            _sync_files()
+        except FileNotFoundError:
+            deleted = False
+    if _manifest is not None:
+        _manifest.discard(vault_id)
+    if deleted:
+        _notify_listeners(vault_id, None)
+    return deleted
+
+def list_memory_vaults() -> List[str]:
+    return vault_manifest().ids()
+
+def _read_stored(vault_id: str) -> Optional[bytes]:
+    if VAULT_BACKEND == "segments":
+        return _segments().get(vault_id)
+    try:
+        with open(_vault_path(vault_id), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def read_vault_json(vault_id: str) -> Optional[bytes]:
+    """A vault entry as JSON bytes, whatever encoding it is stored in (for downloads)"""
+    if _manifest is not None and vault_id not in _manifest:
+        return None
+    payload = _read_stored(vault_id)
+    return None if payload is None else record_format.decode_bytes(payload)
+
+class VaultDownload(NamedTuple):
+    """A stored record opened for serving; whoever holds it must close fd"""
+    fd: int
+    offset: int         # where the stored record starts in fd
+    length: int         # stored record size
+    compressed: bool    # stored bytes need read_download_json() to become JSON
+    etag: str           # content hash of the record's JSON
+    mtime: float
+
+def _open_stored(vault_id: str) -> Optional[Tuple[int, int, int, Optional[tuple], os.stat_result]]:
+    """(fd, offset, length, segment location, stat) of a stored record; the caller closes fd"""
+    if VAULT_BACKEND == "segments":
+        opened = _segments().open_record(vault_id)
+        if opened is None:
+            return None
+        fd, location = opened
+        return fd, location[1], location[2], location, None
+    try:
+        fd = os.open(_vault_path(vault_id), os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    stat = os.fstat(fd)
+    return fd, 0, stat.st_size, None, stat
+
+def _iter_fd(fd: int, offset: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """Read length bytes from offset in chunks, closing fd when done"""
+    try:
+        while length > 0:
+            chunk = os.pread(fd, min(chunk_size, length), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            length -= len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+def iter_vault_json(vault_id: str, chunk_size: int = record_format.STREAM_CHUNK_SIZE) -> Optional[Iterator[bytes]]:
+    """A vault's JSON as an iterator of byte chunks (decompressed as it is read), or None if not stored"""
+    if _manifest is not None and vault_id not in _manifest:
+        return None
+    opened = _open_stored(vault_id)
+    if opened is None:
+        return None
+    fd, offset, length, _, _ = opened
+    return record_format.iter_decode_bytes(_iter_fd(fd, offset, length, chunk_size), chunk_size)
+
+def _pread_all(fd: int, length: int, offset: int) -> bytes:
+    chunks = []
+    while length > 0:
+        chunk = os.pread(fd, length, offset)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        offset += len(chunk)
+        length -= len(chunk)
+    return b"".join(chunks)
+
+def open_vault_download(vault_id: str) -> Optional[VaultDownload]:
+    """
+    Open a vault record for a download without reading it.
+
+    The etag comes from the manifest when it was computed for the record now on
+    disk (same size and mtime, or same segment location), then from the file's
+    extended attribute; otherwise the record is hashed once and both updated, so
+    edits made outside this module still get a correct etag.
+    """
+    manifest = vault_manifest()
+    entry = manifest.get(vault_id)
+    if entry is None:
+        return None
+    opened = _open_stored(vault_id)
+    if opened is None:
+        return None
+    fd, offset, length, version, stat = opened
+    if version is not None:
+        mtime = entry.mtime
+        trusted = entry.version == version
+    else:
+        mtime = stat.st_mtime
+        trusted = (entry.size, entry.mtime) == (stat.st_size, stat.st_mtime)
+    try:
+        etag = entry.etag if trusted else None
+        if etag is None:
+            category, etag = (_stored_description(fd, stat) if stat is not None else None) or (None, None)
+            if etag is None:
+                category, etag = _describe(_pread_all(fd, length, offset))
+                if etag is None:
+                    raise record_format.RecordFormatError(f"Vault {vault_id} could not be decoded")
+                if stat is not None:
+                    _store_description(fd, stat, category, etag)
+            manifest.record(vault_id, length, mtime, category, etag, version)
+        compressed = record_format.is_compressed(os.pread(fd, record_format.HEADER_SIZE, offset))
+    except BaseException:
+        os.close(fd)
+        raise
+    return VaultDownload(fd, offset, length, compressed, etag, mtime)
+
+def read_download_json(download: VaultDownload) -> bytes:
+    """The JSON bytes of an opened download (decompressing the stored record if needed)"""
+    return record_format.decode_bytes(_pread_all(download.fd, download.length, download.offset))
+
+def migrate_vault_format(codec: Optional[str] = None, pause: float = 0.0, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Rewrite stored vault records whose encoding differs from codec.
+
+    Args:
+        codec: Target codec (defaults to CALI_VAULT_CODEC)
+        pause: Seconds to sleep after each rewrite, to throttle a migration running beside the app
+            (files backend only: a segment store admits a single writing process)
+        dry_run: Only report what would change
+
+    Returns:
+        Counts of scanned/rewritten/failed records and total bytes before and after
+    """
+    codec = codec or VAULT_CODEC
+    report = {"scanned": 0, "rewritten": 0, "skipped": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+    for vault_id in list_memory_vaults():
+        if VAULT_BACKEND == "segments":
+            payload, version = _segments().get_with_location(vault_id)
+        else:
+            try:
+                with open(_vault_path(vault_id), "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    payload = f.read()
+            except FileNotFoundError:
+                continue
+            version = (stat.st_mtime_ns, stat.st_size)
+        if payload is None:
+            continue
+        report["scanned"] += 1
+        report["bytes_before"] += len(payload)
+        try:
+            data = record_format.decode(payload)
+        except ValueError as e:
+            print(f"⚠️ Vault {vault_id} could not be parsed: {e}")
+            report["failed"] += 1
+            report["bytes_after"] += len(payload)
+            continue
+        encoded = record_format.encode(data, codec, COMPRESS_MIN_BYTES)
+        report["bytes_after"] += len(encoded)
+        if encoded == payload:
+            continue
+        if dry_run:
+            report["rewritten"] += 1
+            continue
+        category, etag = _describe(encoded)
+        # Skip records saved by someone else since we read them
+        if VAULT_BACKEND == "segments":
+            if not _segments().replace(vault_id, encoded, version):
+                report["skipped"] += 1
+                continue
+            _read_cache.invalidate(vault_id)
+            _sync_segments()
+            stat_size, stat_mtime = len(encoded), time.time()
+        else:
+            try:
+                current = os.stat(_vault_path(vault_id))
+            except FileNotFoundError:
+                current = None
+            if current is None or (current.st_mtime_ns, current.st_size) != version:
+                report["skipped"] += 1
+                continue
+            staged = stage_write(_vault_path(vault_id), encoded)
+            _store_description(staged.fd, staged.stat, category, etag)
+            _publish_files([staged])
+            _read_cache.invalidate(vault_id)
+            stat_size, stat_mtime = staged.stat.st_size, staged.stat.st_mtime
+        report["rewritten"] += 1
+        if _manifest is not None:
+            location = _segments().location(vault_id) if VAULT_BACKEND == "segments" else None
+            _manifest.record(vault_id, stat_size, stat_mtime, category, etag, location)
+        if pause:
+            time.sleep(pause)
+    return report
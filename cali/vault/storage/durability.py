@@ -0,0 +1,229 @@
+"""
+CALI Vault - crash-safe writes and group commit
+Vault entries are written to a temporary file in the target directory and
+renamed over the destination, so readers and crashes only ever see a complete
+old or new entry. How much is flushed to stable storage is a policy:
+
+    none  - atomic rename only (survives a process crash, not a power loss)
+    fsync - fsync the file before the rename and the directory after it
+    group - like fsync, but concurrent saves share the work: each save only
+            writes its temp file (stage_write), and one leader fsyncs every
+            staged file, renames them and fsyncs the directory once
+            (GroupWriter); for the segment store, saves share one segment
+            fsync. A save that arrives while a sync is running waits for the
+            next one, which covers every save queued in the meantime
+
+GroupCommit implements the batching with a leader/follower handoff, so no
+background thread is needed.
+"""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+DURABILITY_MODES = ('none', 'fsync', 'group')
+TEMP_SUFFIX = '.tmp'
+
+
+def fsync_directory(directory) -> None:
+    """Flush a directory's entries (renames, creates, unlinks) to stable storage"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class StagedWrite:
+    """New contents for path, written to a temporary file that publish() renames into place"""
+
+    __slots__ = ('path', 'tmp', 'fd', 'stat', 'published')
+
+    def __init__(self, path: Path, tmp: Path, fd: int, stat: os.stat_result):
+        self.path = path
+        self.tmp = tmp
+        self.fd = fd
+        self.stat = stat            # of the written file (a rename keeps size and mtime)
+        self.published = False
+
+    def publish(self, fsync: bool = True) -> None:
+        """Optionally fsync the temporary file, then rename it over path"""
+        try:
+            if fsync:
+                os.fsync(self.fd)
+        except BaseException:
+            self.discard()
+            raise
+        os.close(self.fd)
+        self.fd = -1
+        try:
+            os.replace(self.tmp, self.path)
+        except BaseException:
+            os.unlink(self.tmp)
+            raise
+        self.published = True
+
+    def discard(self) -> None:
+        """Remove the temporary file, leaving path as it was"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+            os.unlink(self.tmp)
+
+
+def stage_write(path, data: Union[bytes, Iterable[bytes]]) -> StagedWrite:
+    """
+    Write data to a temporary file beside path, to be renamed over it by publish().
+
+    Args:
+        path: Destination file
+        data: Complete new contents, or an iterable of chunks of them
+    """
+    path = Path(path)
+    tmp = path.parent / f".{path.name}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        for chunk in (data,) if isinstance(data, (bytes, bytearray, memoryview)) else data:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view):]
+        stat = os.fstat(fd)
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+    return StagedWrite(path, tmp, fd, stat)
+
+
+def atomic_write(path, data: Union[bytes, Iterable[bytes]], fsync: bool = True) -> os.stat_result:
+    """
+    Replace path with data via a temporary file and rename.
+
+    Args:
+        path: Destination file
+        data: Complete new contents, or an iterable of chunks of them
+        fsync: Flush the file contents before the rename
+
+    Returns:
+        stat of the written file
+    """
+    staged = stage_write(path, data)
+    staged.publish(fsync)
+    return staged.stat
+
+
+def is_temp_file(name: str) -> bool:
+    """True for leftovers of atomic_write (e.g. after a crash)"""
+    return name.startswith('.') and name.endswith(TEMP_SUFFIX)
+
+
+class GroupCommit:
+    """Share one expensive sync between all callers that are waiting for it"""
+
+    def __init__(self, sync: Callable[[], None], window: float = 0.0):
+        """
+        Args:
+            sync: Flushes everything written so far (e.g. an fsync)
+            window: Seconds a new leader waits for more callers before syncing
+        """
+        self._sync = sync
+        self.window = window
+        self._cond = threading.Condition()
+        self._requested = 0          # last ticket handed out
+        self._completed = 0          # every ticket up to this one is durable
+        self._syncing = False
+        self._failure: Optional[Tuple[int, BaseException]] = None
+        self.syncs = 0
+        self.commits = 0
+
+    def commit(self) -> None:
+        """Return once a sync that started after this call has completed"""
+        with self._cond:
+            self._requested += 1
+            ticket = self._requested
+            self.commits += 1
+            while self._completed < ticket:
+                if self._failure is not None and ticket <= self._failure[0]:
+                    raise self._failure[1]
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._lead()
+
+    def _lead(self) -> None:
+        # Called with the condition held; releases it while syncing
+        self._syncing = True
+        target = self._requested
+        self._cond.release()
+        error = None
+        try:
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                target = self._requested
+            self._sync()
+        except BaseException as e:
+            error = e
+        finally:
+            self._cond.acquire()
+            self._syncing = False
+            self.syncs += 1
+            if error is None:
+                self._completed = max(self._completed, target)
+            else:
+                self._failure = (target, error)
+            self._cond.notify_all()
+
+
+class GroupWriter:
+    """
+    Group commit for atomic writes into one directory.
+
+    commit() queues staged writes and waits for a leader that fsyncs every file
+    queued so far, renames them in order and then fsyncs the directory once, so
+    concurrent saves pay for one directory fsync between them and nothing is
+    renamed before its contents are on disk.
+    """
+
+    def __init__(self, directory: Callable[[], Path], window: float = 0.0):
+        """
+        Args:
+            directory: Returns the directory the staged files are renamed in
+            window: Seconds a new leader waits for more writers before syncing
+        """
+        self._directory = directory
+        self._queued: List[StagedWrite] = []
+        self._queue_lock = threading.Lock()
+        self.group = GroupCommit(self._flush, window)
+
+    def commit(self, staged: Iterable[StagedWrite] = ()) -> None:
+        """
+        Publish staged writes durably (with none, just make earlier renames and unlinks durable).
+
+        Raises:
+            OSError: The group sync failed; the staged writes that were not renamed were discarded
+        """
+        staged = list(staged)
+        with self._queue_lock:
+            self._queued.extend(staged)
+        self.group.commit()
+        if not all(write.published for write in staged):
+            # Discarded by a failed sync whose error went to the callers it was started for
+            raise OSError("Vault write was discarded by a failed group sync")
+
+    def _flush(self) -> None:
+        with self._queue_lock:
+            batch, self._queued = self._queued, []
+        try:
+            for write in batch:
+                os.fsync(write.fd)
+            for write in batch:
+                write.publish(fsync=False)
+        finally:
+            for write in batch:
+                if not write.published:
+                    write.discard()
+        fsync_directory(self._directory())
@@ -0,0 +1,234 @@
+"""
+CALI Vault - in-memory manifest of stored vault ids
+Keeps size, mtime, category and content hash for every vault id so listing,
+existence checks and conditional downloads never touch the storage directory.
+Ids are kept sorted (overall and per category) for cursor pagination, and a
+Bloom filter answers most negative lookups without consulting the entry map.
+
+The manifest is built once at startup and then updated by the storage facade on
+every save and delete. A snapshot file lets the next start parse only the vault
+entries that changed since it was written.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger("CALI.Vault")
+
+SNAPSHOT_VERSION = 2
+_READABLE_SNAPSHOT_VERSIONS = (1, SNAPSHOT_VERSION)     # version 1 entries have no etag
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime: float
+    category: Optional[str]
+    etag: Optional[str] = None                  # record_format.content_hash of the record's JSON
+    version: Optional[Tuple[int, ...]] = None   # segment backend: location the etag was computed for
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no removal)"""
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / self.capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        bits = self.bits
+        return ((h1 + i * h2) % bits for i in range(self.hashes))
+
+    def add(self, item: str):
+        array = self._array
+        for position in self._positions(item):
+            array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class VaultManifest:
+    """Sorted, filterable index of vault ids with their metadata"""
+
+    def __init__(self, bloom_error_rate: float = 0.01):
+        self.bloom_error_rate = bloom_error_rate
+        self._entries: Dict[str, ManifestEntry] = {}
+        self._ids: List[str] = []
+        self._by_category: Dict[Optional[str], List[str]] = {}
+        self._bloom = BloomFilter(1024, bloom_error_rate)
+        self._lock = threading.RLock()
+        self._metrics = {'bloom_negatives': 0, 'bloom_false_positives': 0}
+
+    # --- Updates ---
+
+    def record(self, vault_id: str, size: int, mtime: float, category: Optional[str] = None,
+               etag: Optional[str] = None, version: Optional[Tuple[int, ...]] = None):
+        """Add or update the entry for a vault id"""
+        with self._lock:
+            previous = self._entries.get(vault_id)
+            self._entries[vault_id] = ManifestEntry(size, mtime, category, etag, version)
+            if previous is None:
+                bisect.insort(self._ids, vault_id)
+                self._bloom_add(vault_id)
+            elif previous.category != category:
+                self._remove_from_category(vault_id, previous.category)
+            if previous is None or previous.category != category:
+                bisect.insort(self._by_category.setdefault(category, []), vault_id)
+
+    def discard(self, vault_id: str) -> bool:
+        """Remove a vault id; returns False if it was not present"""
+        with self._lock:
+            entry = self._entries.pop(vault_id, None)
+            if entry is None:
+                return False
+            del self._ids[bisect.bisect_left(self._ids, vault_id)]
+            self._remove_from_category(vault_id, entry.category)
+            return True
+
+    def replace_all(self, entries: Iterable[Tuple[str, ManifestEntry]]):
+        """Reset the manifest to the given entries"""
+        with self._lock:
+            self._entries = dict(entries)
+            self._ids = sorted(self._entries)
+            self._by_category = {}
+            for vault_id in self._ids:
+                self._by_category.setdefault(self._entries[vault_id].category, []).append(vault_id)
+            self._rebuild_bloom()
+
+    # --- Queries ---
+
+    def __contains__(self, vault_id: str) -> bool:
+        if vault_id not in self._bloom:
+            self._metrics['bloom_negatives'] += 1
+            return False
+        present = vault_id in self._entries
+        if not present:
+            self._metrics['bloom_false_positives'] += 1
+        return present
+
+    def get(self, vault_id: str) -> Optional[ManifestEntry]:
+        return self._entries.get(vault_id) if vault_id in self else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._ids)
+
+    def etags(self) -> List[Tuple[str, Optional[str]]]:
+        """(vault_id, etag) for every entry, in id order"""
+        with self._lock:
+            entries = self._entries
+            return [(vault_id, entries[vault_id].etag) for vault_id in self._ids]
+
+    def page(self, cursor: Optional[str] = None, limit: int = 100, category: Optional[str] = None,
+             prefix: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        One page of vault ids in sorted order.
+
+        Args:
+            cursor: Last id of the previous page (exclusive start)
+            limit: Maximum ids to return
+            category: Only ids in this category
+            prefix: Only ids starting with this prefix
+
+        Returns:
+            (ids, next cursor or None when there are no more)
+        """
+        with self._lock:
+            if category is not None:
+                ids = self._by_category.get(category, [])
+            else:
+                ids = self._ids
+            start = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+            if prefix:
+                start = max(start, bisect.bisect_left(ids, prefix))
+                end = bisect.bisect_left(ids, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            else:
+                end = len(ids)
+            page = ids[start:min(end, start + limit)]
+            more = start + len(page) < end
+            return page, (page[-1] if more and page else None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'categories': len(self._by_category),
+                'bloom_bits': self._bloom.bits,
+                **self._metrics
+            }
+
+    # --- Snapshots ---
+
+    def save_snapshot(self, path):
+        """Atomically write the manifest to path"""
+        with self._lock:
+            data = {'version': SNAPSHOT_VERSION,
+                    'entries': {vault_id: list(entry) for vault_id, entry in self._entries.items()}}
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load_snapshot(path) -> Dict[str, ManifestEntry]:
+        """Entries from a snapshot file, or {} if it is missing or unreadable"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') not in _READABLE_SNAPSHOT_VERSIONS:
+                return {}
+            entries = {}
+            for vault_id, entry in data['entries'].items():
+                entry = ManifestEntry(*entry)
+                if entry.version is not None:
+                    entry = entry._replace(version=tuple(entry.version))
+                entries[vault_id] = entry
+            return entries
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable vault manifest snapshot {path}: {e}")
+            return {}
+
+    # --- Internals ---
+
+    def _remove_from_category(self, vault_id: str, category: Optional[str]):
+        ids = self._by_category.get(category)
+        if ids is None:
+            return
+        index = bisect.bisect_left(ids, vault_id)
+        if index < len(ids) and ids[index] == vault_id:
+            del ids[index]
+        if not ids:
+            del self._by_category[category]
+
+    def _bloom_add(self, vault_id: str):
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild_bloom()
+        else:
+            self._bloom.add(vault_id)
+
+    def _rebuild_bloom(self):
+        """Resize the filter for the current entries (also drops bits of deleted ids)"""
+        bloom = BloomFilter(max(1024, 2 * len(self._entries)), self.bloom_error_rate)
+        for vault_id in self._entries:
+            bloom.add(vault_id)
+        self._bloom = bloom
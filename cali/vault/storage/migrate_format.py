@@ -0,0 +1,45 @@
+"""
+Rewrite stored vault records into the configured (or given) record format.
+
+With the files backend this is safe to run beside the app: every record is
+replaced atomically, records saved since they were read are skipped, and --pause
+throttles the rewrite rate. A segment store (CALI_VAULT_BACKEND=segments) has a
+single writer, so stop the app first; the migration refuses to open a store that
+is in use.
+
+    python -m cali.vault.storage.migrate_format --codec zlib --vault-dir data/vault_files
+"""
+
+import argparse
+
+from cali.vault.storage import cali_vault_storage, record_format
+from cali.vault.storage.segment_store import SegmentStoreError
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert CALI vault records to a new record format')
+    parser.add_argument('--codec', choices=record_format.CODECS, default=None,
+                        help='Target codec (default: CALI_VAULT_CODEC)')
+    parser.add_argument('--vault-dir', default=None, help='Vault directory (default: CALI_VAULT_DIR)')
+    parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep after each rewritten record')
+    parser.add_argument('--dry-run', action='store_true', help='Report sizes without rewriting anything')
+    args = parser.parse_args(argv)
+
+    if args.vault_dir:
+        cali_vault_storage.set_vault_dir(args.vault_dir)
+    try:
+        report = cali_vault_storage.migrate_vault_format(args.codec, pause=args.pause, dry_run=args.dry_run)
+    except SegmentStoreError as e:
+        parser.exit(1, f"{e}. Stop the app before migrating a segment store.\n")
+
+    before, after = report['bytes_before'], report['bytes_after']
+    saved = 100.0 * (before - after) / before if before else 0.0
+    verb = 'would rewrite' if args.dry_run else 'rewrote'
+    print(f"Scanned {report['scanned']} vault records, {verb} {report['rewritten']}, "
+          f"skipped {report['skipped']} (changed meanwhile), failed {report['failed']}.")
+    print(f"Stored size: {before} -> {after} bytes ({saved:.1f}% smaller).")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+CALI Vault - read cache for parsed vault entries
+A byte-bounded LRU of parsed vaults. Each entry carries a validator describing
+the stored record it was parsed from ((mtime_ns, size) for files, the record
+location for the segment store); a lookup with a different validator is a miss.
+Writes through the storage facade invalidate entries, and a read that raced with
+such a write cannot re-insert the stale copy (see begin()/put()).
+
+Cached objects are shared between callers and must be treated as read-only.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+# Keys whose invalidation is remembered individually before falling back to a global floor
+INVALIDATION_MEMORY = 4096
+
+
+class VaultReadCache:
+    """LRU cache of parsed vaults with byte accounting and hit-rate metrics"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Budget measured in decoded JSON bytes of the cached vaults (0 disables caching)
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()   # id -> (value, validator, size)
+        self._bytes = 0
+        self._clock = 0
+        self._floor = 0
+        self._invalidated: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'rejected': 0}
+
+    def begin(self) -> int:
+        """Token to pass to put() for a read that starts now"""
+        return self._clock
+
+    def get(self, vault_id: str, validator: Optional[Hashable] = None, validate: bool = True) -> Any:
+        """
+        Cached value for vault_id, or None.
+
+        Args:
+            validator: Current validator of the stored record
+            validate: Compare validators (False trusts that only our own writes change records)
+        """
+        with self._lock:
+            entry = self._entries.get(vault_id, _MISSING)
+            if entry is _MISSING:
+                self._metrics['misses'] += 1
+                return None
+            if validate and entry[1] != validator:
+                self._metrics['stale'] += 1
+                self._metrics['misses'] += 1
+                self._drop(vault_id)
+                return None
+            self._entries.move_to_end(vault_id)
+            self._metrics['hits'] += 1
+            return entry[0]
+
+    def put(self, vault_id: str, value: Any, validator: Optional[Hashable], size: int, token: int) -> None:
+        """Cache a parsed vault unless it was invalidated after token was taken"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if token < self._floor or self._invalidated.get(vault_id, -1) >= token:
+                self._metrics['rejected'] += 1
+                return
+            self._drop(vault_id)
+            self._entries[vault_id] = (value, validator, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._metrics['evictions'] += 1
+
+    def invalidate(self, vault_id: str) -> None:
+        """Forget vault_id; reads that began before this call will not re-cache it"""
+        with self._lock:
+            self._invalidated[vault_id] = self._clock
+            self._clock += 1
+            self._drop(vault_id)
+            if len(self._invalidated) > INVALIDATION_MEMORY:
+                self._floor = self._clock
+                self._invalidated.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._floor = self._clock = self._clock + 1
+            self._invalidated.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses']
+            return {
+                **self._metrics,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': self._metrics['hits'] / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, vault_id: str) -> None:
+        entry = self._entries.pop(vault_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
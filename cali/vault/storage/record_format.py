@@ -0,0 +1,210 @@
+"""
+CALI Vault - record encoding
+Vault records are stored either as plain JSON (minified by default; the original
+indent=2 files remain readable) or as a compressed record with a small header:
+
+    magic b'CVF' | format version (1 byte) | codec id (1 byte) | compressed minified JSON
+
+decode() detects which of the two it was given, so stores can mix formats while
+existing files are migrated. Compressed codecs are only used for records of at
+least min_compress_bytes, and only when compression actually saves space.
+
+content_hash() identifies the JSON a record decodes to (whatever its codec); it
+is the strong ETag used for vault downloads.
+
+iter_encode_json() and iter_decode_bytes() do the same work on chunk streams, for
+records too large to hold in memory.
+"""
+
+import hashlib
+import json
+import lzma
+import zlib
+from typing import Any, Iterable, Iterator, Tuple
+
+MAGIC = b'CVF'
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 2
+
+CODEC_JSON = 'json'          # minified JSON, no header
+CODEC_PRETTY = 'pretty'      # indent=2 JSON, the original layout
+CODEC_ZLIB = 'zlib'
+CODEC_LZMA = 'lzma'
+CODECS = (CODEC_JSON, CODEC_PRETTY, CODEC_ZLIB, CODEC_LZMA)
+
+_CODEC_IDS = {CODEC_ZLIB: 1, CODEC_LZMA: 2}
+_CODEC_NAMES = {codec_id: name for name, codec_id in _CODEC_IDS.items()}
+_COMPRESS = {
+    CODEC_ZLIB: lambda data: zlib.compress(data, 6),
+    CODEC_LZMA: lambda data: lzma.compress(data, preset=6),
+}
+_DECOMPRESS = {CODEC_ZLIB: zlib.decompress, CODEC_LZMA: lzma.decompress}
+
+DEFAULT_MIN_COMPRESS_BYTES = 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class RecordFormatError(ValueError):
+    """Raised for records with an unknown version or codec, or corrupt compressed data"""
+    pass
+
+
+def encode(data: Any, codec: str = CODEC_JSON, min_compress_bytes: int = DEFAULT_MIN_COMPRESS_BYTES) -> bytes:
+    """
+    Encode a vault record.
+
+    Args:
+        data: JSON-serializable record
+        codec: One of CODECS
+        min_compress_bytes: Records smaller than this are stored as minified JSON
+
+    Returns:
+        Encoded bytes
+    """
+    return encode_with_json(data, codec, min_compress_bytes)[0]
+
+
+def encode_with_json(data: Any, codec: str = CODEC_JSON,
+                     min_compress_bytes: int = DEFAULT_MIN_COMPRESS_BYTES) -> Tuple[bytes, bytes]:
+    """encode(), also returning the JSON bytes the record decodes to"""
+    if codec == CODEC_PRETTY:
+        raw = json.dumps(data, indent=2).encode('utf-8')
+        return raw, raw
+    raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if codec == CODEC_JSON:
+        return raw, raw
+    if codec not in _COMPRESS:
+        raise RecordFormatError(f"Unknown vault codec: {codec}")
+    if len(raw) < min_compress_bytes:
+        return raw, raw
+    compressed = _COMPRESS[codec](raw)
+    if len(compressed) + HEADER_SIZE >= len(raw):
+        return raw, raw
+    return MAGIC + bytes((FORMAT_VERSION, _CODEC_IDS[codec])) + compressed, raw
+
+
+def is_compressed(payload: bytes) -> bool:
+    """Whether a stored record (or its first HEADER_SIZE bytes) needs decode_bytes() to yield JSON"""
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def content_hasher():
+    """Incremental form of content_hash(): update() with the JSON bytes, then hexdigest()"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(json_bytes: bytes) -> str:
+    """Hex digest identifying a record's JSON bytes"""
+    hasher = content_hasher()
+    hasher.update(json_bytes)
+    return hasher.hexdigest()
+
+
+def iter_encode_json(chunks: Iterable[bytes], codec: str = CODEC_JSON) -> Iterator[bytes]:
+    """
+    Encode a record given as JSON byte chunks, chunk by chunk.
+
+    The JSON is stored as given for the json and pretty codecs; compressing codecs
+    compress it regardless of size, since the size is not known up front.
+    """
+    if codec in (CODEC_JSON, CODEC_PRETTY):
+        yield from chunks
+        return
+    if codec not in _COMPRESS:
+        raise RecordFormatError(f"Unknown vault codec: {codec}")
+    compressor = zlib.compressobj(6) if codec == CODEC_ZLIB else lzma.LZMACompressor(preset=6)
+    yield MAGIC + bytes((FORMAT_VERSION, _CODEC_IDS[codec]))
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_decode_bytes(chunks: Iterable[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """decode_bytes() for a stored record read in chunks; yields JSON bytes in pieces of at most chunk_size"""
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= HEADER_SIZE:
+            break
+    if not is_compressed(head):
+        if head:
+            yield head
+        yield from chunks
+        return
+    codec = _header_codec(head)
+    decompressor = zlib.decompressobj() if codec == CODEC_ZLIB else lzma.LZMADecompressor()
+    data = head[HEADER_SIZE:]
+    try:
+        while True:
+            yield from _inflate(decompressor, data, chunk_size)
+            data = next(chunks, None)
+            if data is None:
+                break
+        if codec == CODEC_ZLIB:
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+            if not decompressor.eof:
+                raise RecordFormatError("Truncated zlib vault record")
+        elif not decompressor.eof:
+            raise RecordFormatError("Truncated lzma vault record")
+    except (zlib.error, lzma.LZMAError) as e:
+        raise RecordFormatError(f"Corrupt {codec} vault record: {e}")
+
+
+def _inflate(decompressor, data: bytes, chunk_size: int) -> Iterator[bytes]:
+    """Decompress data without producing more than chunk_size bytes at a time"""
+    if isinstance(decompressor, lzma.LZMADecompressor):
+        while not decompressor.eof:
+            out = decompressor.decompress(data, chunk_size)
+            data = b''
+            if out:
+                yield out
+            if decompressor.needs_input:
+                return
+        return
+    while data:
+        out = decompressor.decompress(data, chunk_size)
+        if out:
+            yield out
+        data = decompressor.unconsumed_tail
+
+
+def _header_codec(payload: bytes) -> str:
+    """Codec named by a compressed record's header"""
+    if len(payload) < HEADER_SIZE:
+        raise RecordFormatError("Truncated vault record header")
+    version, codec_id = payload[len(MAGIC)], payload[len(MAGIC) + 1]
+    if version != FORMAT_VERSION:
+        raise RecordFormatError(f"Unsupported vault record version: {version}")
+    codec = _CODEC_NAMES.get(codec_id)
+    if codec is None:
+        raise RecordFormatError(f"Unknown vault codec id: {codec_id}")
+    return codec
+
+
+def codec_of(payload: bytes) -> str:
+    """Codec a stored record was written with ('json' covers both minified and indented JSON)"""
+    if payload[:len(MAGIC)] == MAGIC and len(payload) >= HEADER_SIZE:
+        return _CODEC_NAMES.get(payload[len(MAGIC) + 1], 'unknown')
+    return CODEC_JSON
+
+
+def decode_bytes(payload: bytes) -> bytes:
+    """JSON bytes of a stored record, decompressing it if needed"""
+    if not is_compressed(payload):
+        return payload
+    codec = _header_codec(payload)
+    try:
+        return _DECOMPRESS[codec](payload[HEADER_SIZE:])
+    except (zlib.error, lzma.LZMAError) as e:
+        raise RecordFormatError(f"Corrupt {codec} vault record: {e}")
+
+
+def decode(payload: bytes) -> Any:
+    """Parse a stored record in any supported format"""
+    return json.loads(decode_bytes(payload))
+
@@ -0,0 +1,422 @@
+"""
+CALI Vault - log-structured segment store
+Appends vault records to large segment files instead of writing one file per
+vault id. An in-memory index maps each id to the (segment, offset, length) of its
+latest record; deletes append tombstones. Opening a store rebuilds the index by
+scanning the segments and truncates a torn record at the tail of the newest one.
+Sealed segments whose live fraction drops below a threshold are compacted by
+copying their live records forward and unlinking them, on demand or in a
+background thread.
+
+The index lives in this process, so only one process may write a store: opening
+takes an exclusive lock on the directory (where fcntl is available) and fails
+with SegmentStoreError while another process holds it. Other processes open the
+store read_only: they take no lock, see the records present when they opened it,
+and leave a torn tail alone (it may be a record the writer is appending).
+
+Record layout (little endian):
+    magic (4) | kind (1) | id length (2) | payload length (4) | crc32 (4) | id | payload
+"""
+
+import logging
+import os
+import re
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from cali.vault.storage.durability import fsync_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+logger = logging.getLogger("CALI.Vault")
+
+RECORD_MAGIC = b'CVR1'
+_HEADER = struct.Struct('<4sBHII')
+KIND_PUT = 0
+KIND_DELETE = 1
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_COMPACTION_THRESHOLD = 0.5
+_SEGMENT_NAME = re.compile(r'^segment-(\d{8})\.log$')
+LOCK_NAME = '.lock'
+
+# id -> (segment number, payload offset, payload length)
+Location = Tuple[int, int, int]
+
+
+class SegmentStoreError(Exception):
+    """Raised when a segment store cannot be opened or a record cannot be written"""
+    pass
+
+
+class _Segment:
+    __slots__ = ('number', 'path', 'fd', 'size', 'live_bytes')
+
+    def __init__(self, number: int, path: Path, fd: int, size: int):
+        self.number = number
+        self.path = path
+        self.fd = fd
+        self.size = size          # bytes of valid records
+        self.live_bytes = 0       # bytes of records the index still points at
+
+
+class SegmentStore:
+    """Append-only key/value store for vault records"""
+
+    def __init__(self, directory, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 compaction_threshold: float = DEFAULT_COMPACTION_THRESHOLD, read_only: bool = False):
+        """
+        Args:
+            directory: Directory holding the segment files (created if missing)
+            segment_bytes: Size after which the active segment is sealed
+            compaction_threshold: Compact sealed segments whose live fraction is below this
+            read_only: Open without the writer lock; puts, deletes and compaction raise SegmentStoreError
+        """
+        self.directory = Path(directory)
+        self.read_only = read_only
+        if not read_only:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.compaction_threshold = compaction_threshold
+        self._segments: Dict[int, _Segment] = {}
+        self._index: Dict[str, Location] = {}
+        self._tombstones: Dict[str, int] = {}   # deleted id -> segment holding its latest tombstone
+        self._unsynced: Set[int] = set()        # segments written since the last sync()
+        self._directory_dirty = False           # a segment file was created since the last sync()
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._closed = False
+        self._lock_fd = None if read_only else self._acquire_directory_lock()
+        try:
+            self._recover()
+        except BaseException:
+            for segment in self._segments.values():
+                os.close(segment.fd)
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+            raise
+
+    # --- Public API ---
+
+    def get(self, record_id: str) -> Optional[bytes]:
+        """Payload of the latest record for an id, or None"""
+        return self.get_with_location(record_id)[0]
+
+    def get_with_location(self, record_id: str) -> Tuple[Optional[bytes], Optional[Location]]:
+        """Payload of the latest record for an id and where it is stored, or (None, None)"""
+        with self._lock:
+            location = self._index.get(record_id)
+            if location is None:
+                return None, None
+            number, offset, length = location
+            return os.pread(self._segments[number].fd, length, offset), location
+
+    def open_record(self, record_id: str) -> Optional[Tuple[int, Location]]:
+        """
+        A private descriptor for the segment holding an id's latest record, and its location.
+
+        The descriptor stays valid if compaction later removes the segment; the caller closes it.
+        """
+        with self._lock:
+            location = self._index.get(record_id)
+            if location is None:
+                return None
+            return os.dup(self._segments[location[0]].fd), location
+
+    def location(self, record_id: str) -> Optional[Location]:
+        """(segment, offset, length) of the latest record for an id; changes whenever it is rewritten"""
+        return self._index.get(record_id)
+
+    def put(self, record_id: str, payload: bytes) -> Location:
+        """Append a record, replacing any previous one for the id; returns its location"""
+        with self._lock:
+            self._check_writable()
+            segment, offset, size = self._append(KIND_PUT, record_id, payload)
+            self._forget(record_id)
+            location = (segment.number, offset + size - len(payload), len(payload))
+            self._index[record_id] = location
+            segment.live_bytes += size
+            return location
+
+    def replace(self, record_id: str, payload: bytes, expected: Location) -> bool:
+        """put() only if the id's latest record is still at expected; returns False otherwise"""
+        with self._lock:
+            if self._index.get(record_id) != expected:
+                return False
+            self.put(record_id, payload)
+            return True
+
+    def delete(self, record_id: str) -> bool:
+        """Append a tombstone for an id; returns False if it was not stored"""
+        with self._lock:
+            self._check_writable()
+            if record_id not in self._index:
+                return False
+            segment, _, _ = self._append(KIND_DELETE, record_id, b'')
+            self._forget(record_id)
+            self._tombstones[record_id] = segment.number
+            return True
+
+    def payload_size(self, record_id: str) -> Optional[int]:
+        location = self._index.get(record_id)
+        return None if location is None else location[2]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def sync(self):
+        """fsync every segment written since the last sync (sealed ones included) and new segment files"""
+        with self._lock:
+            for number in sorted(self._unsynced):
+                segment = self._segments.get(number)
+                if segment is not None:
+                    os.fsync(segment.fd)
+            self._unsynced.clear()
+            if self._directory_dirty:
+                fsync_directory(self.directory)
+                self._directory_dirty = False
+
+    def compact(self, threshold: Optional[float] = None) -> int:
+        """
+        Rewrite sealed segments whose live fraction is below threshold.
+
+        Returns:
+            Number of segments removed
+        """
+        threshold = self.compaction_threshold if threshold is None else threshold
+        with self._lock:
+            self._check_writable()
+            candidates = [s.number for s in self._segments.values()
+                          if s is not self._active and s.size and s.live_bytes / s.size < threshold]
+        removed = 0
+        with self._compaction_lock:
+            for number in candidates:
+                if self._closed:
+                    break
+                if self._compact_segment(number):
+                    removed += 1
+        return removed
+
+    def start_background_compaction(self, interval: float = 60.0):
+        """Run compact() every interval seconds in a daemon thread"""
+        if self._compactor is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    removed = self.compact()
+                    if removed:
+                        logger.info(f"Vault compaction removed {removed} segment(s)")
+                except Exception as e:
+                    logger.error(f"Vault compaction failed: {e}", exc_info=True)
+
+        self._compactor = threading.Thread(target=run, name='vault-compactor', daemon=True)
+        self._compactor.start()
+
+    def stop_background_compaction(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total = sum(s.size for s in self._segments.values())
+            live = sum(s.live_bytes for s in self._segments.values())
+            return {
+                'records': len(self._index),
+                'tombstones': len(self._tombstones),
+                'segments': len(self._segments),
+                'total_bytes': total,
+                'live_bytes': live,
+                'dead_bytes': total - live
+            }
+
+    def close(self):
+        self.stop_background_compaction()
+        with self._compaction_lock, self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for segment in self._segments.values():
+                os.close(segment.fd)
+            self._segments.clear()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)          # releases the directory lock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _acquire_directory_lock(self) -> int:
+        fd = os.open(self.directory / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                raise SegmentStoreError(f"Segment store {self.directory} is in use by another process")
+        return fd
+
+    # --- Writing ---
+
+    @property
+    def _active(self) -> _Segment:
+        return self._segments[max(self._segments)]
+
+    def _check_open(self):
+        if self._closed:
+            raise SegmentStoreError("Segment store is closed")
+
+    def _check_writable(self):
+        self._check_open()
+        if self.read_only:
+            raise SegmentStoreError(f"Segment store {self.directory} is open read-only")
+
+    def _append(self, kind: int, record_id: str, payload: bytes) -> Tuple[_Segment, int, int]:
+        key = record_id.encode('utf-8')
+        if len(key) > 0xFFFF:
+            raise SegmentStoreError(f"Record id too long: {len(key)} bytes")
+        body = key + payload
+        record = _HEADER.pack(RECORD_MAGIC, kind, len(key), len(payload), zlib.crc32(body)) + body
+
+        segment = self._active
+        if segment.size and segment.size + len(record) > self.segment_bytes:
+            segment = self._open_segment(segment.number + 1)
+        offset = segment.size
+        written = os.pwrite(segment.fd, record, offset)
+        if written != len(record):
+            raise SegmentStoreError(f"Short write to {segment.path.name}")
+        segment.size += len(record)
+        self._unsynced.add(segment.number)
+        return segment, offset, len(record)
+
+    def _forget(self, record_id: str):
+        """Account the current record (or tombstone) for an id as dead"""
+        location = self._index.pop(record_id, None)
+        if location is not None:
+            number, _, length = location
+            self._segments[number].live_bytes -= _HEADER.size + len(record_id.encode('utf-8')) + length
+        self._tombstones.pop(record_id, None)
+
+    def _open_segment(self, number: int) -> _Segment:
+        path = self.directory / f"segment-{number:08d}.log"
+        if not path.exists():
+            self._directory_dirty = True
+        fd = os.open(path, os.O_RDONLY if self.read_only else os.O_RDWR | os.O_CREAT, 0o644)
+        segment = self._segments[number] = _Segment(number, path, fd, os.fstat(fd).st_size)
+        return segment
+
+    # --- Compaction ---
+
+    def _compact_segment(self, number: int) -> bool:
+        with self._lock:
+            segment = self._segments.get(number)
+            if segment is None or segment is self._active:
+                return False
+            oldest = min(self._segments)
+
+        for kind, record_id, offset, payload in self._scan(segment):
+            with self._lock:
+                if kind == KIND_PUT:
+                    key_length = len(record_id.encode('utf-8'))
+                    if self._index.get(record_id) != (number, offset + _HEADER.size + key_length, len(payload)):
+                        continue
+                    target, new_offset, size = self._append(KIND_PUT, record_id, payload)
+                    segment.live_bytes -= size
+                    self._index[record_id] = (target.number, new_offset + size - len(payload), len(payload))
+                    target.live_bytes += size
+                elif self._tombstones.get(record_id) == number and number != oldest:
+                    # An older segment may still hold a put for this id
+                    target, _, _ = self._append(KIND_DELETE, record_id, b'')
+                    self._tombstones[record_id] = target.number
+
+        with self._lock:
+            self.sync()                            # the copies must be durable before the original goes
+            os.close(segment.fd)
+            del self._segments[number]
+            segment.path.unlink()
+            for record_id in [r for r, n in self._tombstones.items() if n == number]:
+                del self._tombstones[record_id]
+        logger.debug(f"Compacted vault segment {segment.path.name}")
+        return True
+
+    # --- Recovery ---
+
+    def _recover(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            if not self.read_only:
+                raise
+            names = []
+        numbers = sorted(int(m.group(1)) for m in map(_SEGMENT_NAME.match, names) if m)
+        if not numbers:
+            if not self.read_only:
+                self._open_segment(1)
+            return
+        for number in numbers:
+            try:
+                segment = self._open_segment(number)
+            except FileNotFoundError:
+                if not self.read_only:
+                    raise
+                continue                            # removed by the writer's compaction meanwhile
+            end = 0
+            for kind, record_id, offset, payload in self._scan(segment):
+                self._forget(record_id)
+                size = _HEADER.size + len(record_id.encode('utf-8')) + len(payload)
+                if kind == KIND_PUT:
+                    self._index[record_id] = (number, offset + size - len(payload), len(payload))
+                    segment.live_bytes += size
+                else:
+                    self._tombstones[record_id] = number
+                end = offset + size
+            # A read-only opener leaves bad tails to the writer (one may be a record still being appended)
+            if end < segment.size and not self.read_only:
+                if number == numbers[-1]:
+                    logger.warning(f"Truncating torn tail of {segment.path.name} at byte {end} "
+                                   f"({segment.size - end} bytes discarded)")
+                    os.ftruncate(segment.fd, end)
+                else:
+                    logger.error(f"Corrupt record in sealed segment {segment.path.name} at byte {end}; "
+                                 f"{segment.size - end} trailing bytes ignored")
+            segment.size = end
+
+    def _scan(self, segment: _Segment) -> Iterator[Tuple[int, str, int, bytes]]:
+        """Yield (kind, id, record offset, payload) for each valid record, stopping at the first bad one"""
+        offset, size, fd = 0, segment.size, segment.fd
+        while offset + _HEADER.size <= size:
+            header = os.pread(fd, _HEADER.size, offset)
+            magic, kind, key_length, payload_length, crc = _HEADER.unpack(header)
+            end = offset + _HEADER.size + key_length + payload_length
+            if magic != RECORD_MAGIC or kind not in (KIND_PUT, KIND_DELETE) or end > size:
+                return
+            body = os.pread(fd, key_length + payload_length, offset + _HEADER.size)
+            if len(body) != key_length + payload_length or zlib.crc32(body) != crc:
+                return
+            try:
+                record_id = body[:key_length].decode('utf-8')
+            except UnicodeDecodeError:
+                return
+            yield kind, record_id, offset, body[key_length:]
+            offset = end
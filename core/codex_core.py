@@ -20,109 +20,150 @@ Handles symbolic logic routing and auto-routing through run_llama() function.
 import os
 import sys
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from pathlib import Path
-import re
 import json
+from collections import OrderedDict
 
 # Add the core directory to the path for imports
 sys.path.append(str(Path(__file__).parent))
 
+import mistral_interface
 from mistral_interface import run_mistral, run_mistral_with_context
 from prompt_preprocessor import proprime_preprocessor, enhance_prompt
+from query_classifier import (
+    SYMBOLIC_PATTERNS, classify_query, is_symbolic, symbolic_confidence,
+    cache_info as classifier_cache_info
+)
+from response_cache import ResponseCache
+from local_model_client import LocalModelClient, get_local_model_client
+from prompt_batcher import PromptBatcher
+from legacy_memory_index import LegacyMemoryIndex
+from symbolic_prompt import build_symbolic_prompt, prefix_cache_info
+from context_window import (
+    TokenBudgetContext, ConversationContextStore, DEFAULT_TOKEN_BUDGET, DEFAULT_CONVERSATION
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pre-processor options per enhancement level; legacy memories come from LegacyMemoryIndex
+ENHANCEMENT_LEVELS = {
+    'full': {'include_glyphs': True, 'include_frames': True},
+    'basic': {'include_glyphs': False, 'include_frames': False}
+}
+
 class SymbolicLogicRouter:
     """Routes symbolic logic queries through appropriate processing engines"""
     
     def __init__(self):
-        self.symbolic_patterns = {
-            'definition': r'(?i)define|what is|meaning of|explain',
-            'logical': r'(?i)logic|reasoning|proof|theorem|syllogism',
-            'symbolic': r'(?i)symbol|represent|cognition|semantic|metaphor',
-            'philosophical': r'(?i)philosophy|ethics|morality|values|belief',
-            'mathematical': r'(?i)math|equation|formula|calculate|compute',
-            'analytical': r'(?i)analyze|breakdown|structure|pattern|relationship'
-        }
+        # Compiled once into a single-pass matcher in query_classifier
+        self.symbolic_patterns = dict(SYMBOLIC_PATTERNS)
         
-        self.context_memory = []
         self.max_context_length = 10
+        # Context is bounded by tokens first; the turn count stays as an upper limit
+        self.max_context_tokens = int(os.environ.get('CODEX_CONTEXT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET))
+        summarize_evicted = os.environ.get('CODEX_CONTEXT_DIGEST', '1') != '0'
+        # One isolated, thread-safe context window per conversation
+        self.contexts = ConversationContextStore(
+            factory=lambda: TokenBudgetContext(
+                max_tokens=self.max_context_tokens,
+                max_messages=self.max_context_length * 2,
+                summarize_evicted=summarize_evicted
+            ),
+            idle_ttl_seconds=float(os.environ.get('CODEX_CONTEXT_IDLE_TTL', 3600)),
+            max_conversations=int(os.environ.get('CODEX_MAX_CONVERSATIONS', 1024))
+        )
+    
+    def context_for(self, conversation_id: str = DEFAULT_CONVERSATION) -> TokenBudgetContext:
+        """Context window of a conversation, created on first use"""
+        return self.contexts.get(conversation_id)
+    
+    @property
+    def context(self) -> TokenBudgetContext:
+        """Context window of the default conversation"""
+        return self.context_for(DEFAULT_CONVERSATION)
+    
+    @property
+    def context_memory(self) -> List[Dict[str, str]]:
+        """Default conversation as chat messages (digest of evicted turns first)"""
+        return self.context.messages()
+    
+    @context_memory.setter
+    def context_memory(self, messages: List[Dict[str, str]]):
+        self.context.replace(messages)
     
     def classify_query(self, query: str) -> List[str]:
-        """Classify the query into symbolic logic categories"""
-        categories = []
-        
-        for category, pattern in self.symbolic_patterns.items():
-            if re.search(pattern, query):
-                categories.append(category)
-        
-        return categories if categories else ['general']
+        """Classify the query into symbolic logic categories (single scan, cached)"""
+        return classify_query(query)
     
-    def should_route_to_symbolic(self, query: str) -> bool:
+    def should_route_to_symbolic(self, query: str, categories: Optional[List[str]] = None) -> bool:
         """Determine if query should be routed through symbolic processing"""
-        categories = self.classify_query(query)
+        if categories is None:
+            categories = self.classify_query(query)
         
         # Route to symbolic processing if it matches any symbolic patterns
-        symbolic_categories = ['definition', 'logical', 'symbolic', 'philosophical', 'analytical']
-        return any(cat in symbolic_categories for cat in categories)
+        return is_symbolic(categories)
     
     def enhance_prompt_for_symbolic(self, query: str, categories: List[str]) -> str:
-        """Enhance the prompt with symbolic processing instructions"""
+        """Enhance the prompt with symbolic processing instructions.
         
-        symbolic_instructions = {
-            'definition': "Provide a clear, structured definition with symbolic components:",
-            'logical': "Apply logical reasoning and symbolic logic principles:",
-            'symbolic': "Consider symbolic representations and cognitive patterns:",
-            'philosophical': "Analyze from philosophical and ethical perspectives:",
-            'analytical': "Break down into structural components and relationships:"
-        }
-        
-        # Build enhanced prompt
-        enhanced = f"[SYMBOLIC PROCESSING MODE]\n\n"
-        
-        for category in categories:
-            if category in symbolic_instructions:
-                enhanced += f"{symbolic_instructions[category]}\n"
-        
-        enhanced += f"\nQuery: {query}\n\n"
-        enhanced += "Respond with structured symbolic analysis including:\n"
-        enhanced += "1. Core definition/concept\n"
-        enhanced += "2. Symbolic representations\n"
-        enhanced += "3. Logical relationships\n"
-        enhanced += "4. Contextual applications\n"
-        
-        return enhanced
+        The instructions form a stable prefix (cached per category set) so local
+        inference servers can reuse its KV cache; the variable query comes last.
+        """
+        return build_symbolic_prompt(query, categories)
     
-    def add_to_context(self, query: str, response: str):
-        """Add query-response pair to context memory"""
-        self.context_memory.append({
-            'role': 'user',
-            'content': query
-        })
-        self.context_memory.append({
-            'role': 'assistant', 
-            'content': response
-        })
-        
-        # Trim context if it gets too long
-        if len(self.context_memory) > self.max_context_length * 2:
-            self.context_memory = self.context_memory[-self.max_context_length * 2:]
+    def add_to_context(self, query: str, response: str, conversation_id: str = DEFAULT_CONVERSATION):
+        """Add query-response pair to a conversation's context, evicting oldest turns to the token budget"""
+        self.context_for(conversation_id).add_turn(query, response)
+
+def _call_mistral(prompt: str, context: Optional[List[Dict[str, str]]], **kwargs) -> str:
+    """Single model call in the shape PromptBatcher expects"""
+    if context:
+        return run_mistral_with_context(prompt, context, **kwargs)
+    return run_mistral(prompt, **kwargs)
+
+def batcher_from_env() -> Optional[PromptBatcher]:
+    """
+    Build a PromptBatcher from CODEX_BATCH_MAX_SIZE / CODEX_BATCH_MAX_WAIT_MS.
+    Batching is off (None) unless CODEX_BATCH_MAX_SIZE is greater than 1. A native
+    batch call is used when mistral_interface provides run_mistral_batch.
+    """
+    max_batch_size = int(os.environ.get('CODEX_BATCH_MAX_SIZE', 1))
+    if max_batch_size <= 1:
+        return None
+    return PromptBatcher(
+        _call_mistral,
+        batch_fn=getattr(mistral_interface, 'run_mistral_batch', None),
+        max_batch_size=max_batch_size,
+        max_wait_ms=float(os.environ.get('CODEX_BATCH_MAX_WAIT_MS', 5))
+    )
 
 class CodexCore:
     """Main Codex Core engine for ProPrime Series"""
     
-    def __init__(self):
+    def __init__(self, response_cache: Optional[ResponseCache] = None,
+                 batcher: Optional[PromptBatcher] = None):
         self.router = SymbolicLogicRouter()
+        self.response_cache = response_cache if response_cache is not None else ResponseCache.from_env()
+        self.batcher = batcher if batcher is not None else batcher_from_env()
         self.processing_stats = {
             'total_queries': 0,
             'symbolic_routed': 0,
             'general_routed': 0
         }
+        self._stats_lock = threading.Lock()
+        self.memory_index = LegacyMemoryIndex()
+        self.memory_top_k = int(os.environ.get('CODEX_MEMORY_TOP_K', 5))
+        # (query, level) -> (index generation, enhanced prompt); stale once memories are added
+        self._enhancement_cache: "OrderedDict[Tuple[str, str], Tuple[int, str]]" = OrderedDict()
+        self.enhancement_cache_size = int(os.environ.get('CODEX_ENHANCEMENT_CACHE_SIZE', 1024))
+        self._enhancement_lock = threading.Lock()
     
-    def run_llama(self, prompt: str, use_context: bool = True, **kwargs) -> str:
+    def run_llama(self, prompt: str, use_context: bool = True,
+                  conversation_id: str = DEFAULT_CONVERSATION, **kwargs) -> str:
         """
         Main entry point for running queries through the Codex Core.
         Auto-routes symbolic logic through enhanced processing.
@@ -130,77 +171,199 @@ class CodexCore:
         Args:
             prompt: The input query/prompt
             use_context: Whether to use conversation context
+            conversation_id: Conversation whose context is used and extended
             **kwargs: Additional parameters for the model
             
         Returns:
             Processed response from the appropriate engine
         """
         try:
-            self.processing_stats['total_queries'] += 1
+            enhanced_prompt = self._route_and_enhance(prompt)
+            response = self._generate(enhanced_prompt, use_context, conversation_id, **kwargs)
             
-            # Classify the query
-            categories = self.router.classify_query(prompt)
-            is_symbolic = self.router.should_route_to_symbolic(prompt)
+            # Add to context memory (use original prompt for context)
+            self.router.add_to_context(prompt, response, conversation_id)
             
-            logger.info(f"Query classified as: {categories}")
-            logger.info(f"Symbolic routing: {is_symbolic}")
-            
-            if is_symbolic:
-                return self._process_symbolic_query(prompt, categories, use_context, **kwargs)
-            else:
-                return self._process_general_query(prompt, use_context, **kwargs)
+            return response
                 
         except Exception as e:
             logger.error(f"Error in run_llama: {e}")
             return f"[Codex Core Error] {e}"
     
-    def _process_symbolic_query(self, prompt: str, categories: List[str], use_context: bool, **kwargs) -> str:
-        """Process queries requiring symbolic logic routing"""
-        self.processing_stats['symbolic_routed'] += 1
-        
-        # First, enhance with ProPrime pre-processor
-        enhanced_prompt = enhance_prompt(prompt, include_glyphs=True, include_memories=True, include_frames=True)
+    async def arun_llama(self, prompt: str, use_context: bool = True,
+                         client: Optional[LocalModelClient] = None,
+                         timeout: Optional[float] = None,
+                         conversation_id: str = DEFAULT_CONVERSATION, **kwargs) -> str:
+        """
+        Async variant of run_llama that calls the local model server through the
+        shared, connection-pooled LocalModelClient instead of blocking a thread.
         
-        # Then apply symbolic logic enhancement
-        symbolic_enhanced = self.router.enhance_prompt_for_symbolic(enhanced_prompt, categories)
+        Args:
+            prompt: The input query/prompt
+            use_context: Whether to use conversation context
+            client: Model client to use (defaults to the shared client)
+            timeout: Per-request timeout in seconds
+            conversation_id: Conversation whose context is used and extended
+            **kwargs: Additional parameters for the model
+            
+        Returns:
+            Processed response from the local model
+        """
+        try:
+            enhanced_prompt = self._route_and_enhance(prompt)
+            context = self._context_window(use_context, conversation_id)
+            
+            cache_key, response = self._cache_lookup(enhanced_prompt, context, kwargs)
+            if response is None:
+                model_client = client or get_local_model_client()
+                response = await model_client.generate(enhanced_prompt, context=context, timeout=timeout, **kwargs)
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, response)
+            
+            # Add to context memory (use original prompt for context)
+            self.router.add_to_context(prompt, response, conversation_id)
+            
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error in arun_llama: {e}")
+            return f"[Codex Core Error] {e}"
+    
+    async def astream_llama(self, prompt: str, use_context: bool = True,
+                            client: Optional[LocalModelClient] = None,
+                            timeout: Optional[float] = None,
+                            conversation_id: str = DEFAULT_CONVERSATION, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream the response to a query token by token from the local model server.
+        The completed response is added to the context once the stream finishes.
+        """
+        enhanced_prompt = self._route_and_enhance(prompt)
+        context = self._context_window(use_context, conversation_id)
+        model_client = client or get_local_model_client()
         
-        # Use context if available and requested
-        if use_context and self.router.context_memory:
-            response = run_mistral_with_context(symbolic_enhanced, self.router.context_memory, **kwargs)
-        else:
-            response = run_mistral(symbolic_enhanced, **kwargs)
+        tokens = []
+        async for token in model_client.stream(enhanced_prompt, context=context, timeout=timeout, **kwargs):
+            tokens.append(token)
+            yield token
         
         # Add to context memory (use original prompt for context)
-        self.router.add_to_context(prompt, response)
+        self.router.add_to_context(prompt, "".join(tokens), conversation_id)
+    
+    def _route_and_enhance(self, prompt: str) -> str:
+        """Classify the query, count it, and build the enhanced prompt for its route"""
+        # Classify the query once; routing is derived from the categories
+        categories = self.router.classify_query(prompt)
+        route_symbolic = self.router.should_route_to_symbolic(prompt, categories)
         
-        return response
+        logger.info(f"Query classified as: {categories}")
+        logger.info(f"Symbolic routing: {route_symbolic}")
+        
+        with self._stats_lock:
+            self.processing_stats['total_queries'] += 1
+            self.processing_stats['symbolic_routed' if route_symbolic else 'general_routed'] += 1
+        
+        if route_symbolic:
+            return self._enhance_symbolic_query(prompt, categories)
+        return self._enhance_general_query(prompt)
     
-    def _process_general_query(self, prompt: str, use_context: bool, **kwargs) -> str:
-        """Process general queries with basic ProPrime enhancement"""
-        self.processing_stats['general_routed'] += 1
+    def _enhance_symbolic_query(self, prompt: str, categories: List[str]) -> str:
+        """Enhancement for queries requiring symbolic logic routing"""
+        # First, enhance with ProPrime pre-processor and indexed legacy memories
+        enhanced_prompt = self._enhance(prompt, 'full')
         
+        # Then apply symbolic logic enhancement
+        return self.router.enhance_prompt_for_symbolic(enhanced_prompt, categories)
+    
+    def _enhance_general_query(self, prompt: str) -> str:
+        """Basic ProPrime enhancement for general queries"""
         # Apply lighter ProPrime enhancement for general queries
-        enhanced_prompt = enhance_prompt(prompt, include_glyphs=False, include_memories=True, include_frames=False)
-        
-        # Use context if available and requested
-        if use_context and self.router.context_memory:
-            response = run_mistral_with_context(enhanced_prompt, self.router.context_memory, **kwargs)
+        return self._enhance(prompt, 'basic')
+    
+    def _enhance(self, prompt: str, level: str) -> str:
+        """Pre-processor enhancement plus top-k indexed legacy memories, cached per (query, level)"""
+        key = (prompt, level)
+        generation = self.memory_index.generation
+        with self._enhancement_lock:
+            cached = self._enhancement_cache.get(key)
+            if cached is not None and cached[0] == generation:
+                self._enhancement_cache.move_to_end(key)
+                return cached[1]
+        
+        enhanced = enhance_prompt(prompt, include_memories=False, **ENHANCEMENT_LEVELS[level])
+        memories = self.memory_index.format_memories(self.memory_index.search(prompt, top_k=self.memory_top_k))
+        if memories:
+            enhanced = f"{enhanced}\n\n{memories}"
+        
+        with self._enhancement_lock:
+            self._enhancement_cache[key] = (generation, enhanced)
+            self._enhancement_cache.move_to_end(key)
+            while len(self._enhancement_cache) > self.enhancement_cache_size:
+                self._enhancement_cache.popitem(last=False)
+        return enhanced
+    
+    def _context_window(self, use_context: bool,
+                        conversation_id: str = DEFAULT_CONVERSATION) -> Optional[List[Dict[str, str]]]:
+        """Snapshot of a conversation's context to send with the query, if available and requested"""
+        if not use_context:
+            return None
+        return self.router.context_for(conversation_id).messages() or None
+    
+    def _cache_lookup(self, enhanced_prompt: str, context: Optional[List[Dict[str, str]]],
+                      kwargs: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (cache key or None if uncacheable, cached response or None)"""
+        if not self.response_cache.is_cacheable(kwargs):
+            self.response_cache.record_bypass()
+            return None, None
+        cache_key = self.response_cache.make_key(enhanced_prompt, context, kwargs)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Response served from cache")
+        return cache_key, cached
+    
+    def _generate(self, enhanced_prompt: str, use_context: bool,
+                  conversation_id: str = DEFAULT_CONVERSATION, **kwargs) -> str:
+        """Run the model on an enhanced prompt, serving exact repeats from the response cache"""
+        context = self._context_window(use_context, conversation_id)
+        
+        cache_key, cached = self._cache_lookup(enhanced_prompt, context, kwargs)
+        if cached is not None:
+            return cached
+        
+        if self.batcher is not None:
+            # Concurrent callers are micro-batched before reaching the model
+            response = self.batcher.generate(enhanced_prompt, context, **kwargs)
         else:
-            response = run_mistral(enhanced_prompt, **kwargs)
-        
-        # Add to context memory (use original prompt for context)
-        self.router.add_to_context(prompt, response)
+            response = _call_mistral(enhanced_prompt, context, **kwargs)
         
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
         return response
     
     def get_processing_stats(self) -> Dict[str, Any]:
         """Get processing statistics"""
         base_stats = {
             **self.processing_stats,
-            'context_length': len(self.router.context_memory),
+            'context_length': len(self.router.context),
+            'context_tokens': self.router.context.total_tokens,
+            'context_evicted_messages': self.router.context.evicted_messages,
+            **{'context_' + k: v for k, v in self.router.contexts.stats().items()},
             'symbolic_percentage': (self.processing_stats['symbolic_routed'] / 
-                                  max(self.processing_stats['total_queries'], 1)) * 100
+                                  max(self.processing_stats['total_queries'], 1)) * 100,
+            'classifier_cache_hits': classifier_cache_info().hits,
+            'classifier_cache_misses': classifier_cache_info().misses,
+            'symbolic_prefix_cache_hits': prefix_cache_info().hits,
+            'enhancement_cache_entries': len(self._enhancement_cache)
         }
+        base_stats.update({
+            'memory_index_' + k: v for k, v in self.memory_index.stats().items()
+        })
+        base_stats.update({
+            'response_cache_' + k: v for k, v in self.response_cache.stats().items()
+        })
+        if self.batcher is not None:
+            base_stats.update({
+                'batcher_' + k: v for k, v in self.batcher.stats().items()
+            })
         
         # Add pre-processor stats
         preprocessor_stats = proprime_preprocessor.get_processing_stats()
@@ -213,55 +376,56 @@ class CodexCore:
     def add_legacy_memory(self, content: str, importance: float = 1.0, tags: Optional[List[str]] = None):
         """Add a legacy memory trace"""
         proprime_preprocessor.add_legacy_memory(content, importance, tags)
+        self.memory_index.add(content, importance, tags)
         logger.info(f"Added legacy memory: {content[:50]}...")
     
     def analyze_query(self, query: str) -> Dict[str, Any]:
         """Analyze a query and return enhancement analysis"""
         # Get symbolic logic classification
         categories = self.router.classify_query(query)
-        is_symbolic = self.router.should_route_to_symbolic(query)
+        route_symbolic = self.router.should_route_to_symbolic(query, categories)
         
         # Get pre-processor analysis
         preprocessor_analysis = proprime_preprocessor.analyze_query(query)
         
         return {
             'symbolic_categories': categories,
-            'is_symbolic': is_symbolic,
+            'is_symbolic': route_symbolic,
             'preprocessor_analysis': preprocessor_analysis
         }
     
     def preview_enhancement(self, query: str, enhancement_level: str = "full") -> str:
         """Preview how a query would be enhanced without processing it"""
         if enhancement_level == "full":
-            return enhance_prompt(query, include_glyphs=True, include_memories=True, include_frames=True)
+            return self._enhance(query, 'full')
         elif enhancement_level == "symbolic":
             categories = self.router.classify_query(query)
-            enhanced = enhance_prompt(query, include_glyphs=True, include_memories=True, include_frames=True)
+            enhanced = self._enhance(query, 'full')
             return self.router.enhance_prompt_for_symbolic(enhanced, categories)
         elif enhancement_level == "basic":
-            return enhance_prompt(query, include_glyphs=False, include_memories=True, include_frames=False)
+            return self._enhance(query, 'basic')
         else:
             return query
     
-    def clear_context(self):
-        """Clear the conversation context"""
-        self.router.context_memory.clear()
+    def clear_context(self, conversation_id: str = DEFAULT_CONVERSATION):
+        """Clear a conversation's context"""
+        self.router.contexts.discard(conversation_id)
         logger.info("Context memory cleared")
     
-    def export_context(self, filepath: str):
-        """Export context memory to JSON file"""
+    def export_context(self, filepath: str, conversation_id: str = DEFAULT_CONVERSATION):
+        """Export a conversation's context memory to JSON file"""
         try:
             with open(filepath, 'w') as f:
-                json.dump(self.router.context_memory, f, indent=2)
+                json.dump(self.router.context_for(conversation_id).messages(), f, indent=2)
             logger.info(f"Context exported to {filepath}")
         except Exception as e:
             logger.error(f"Failed to export context: {e}")
     
-    def import_context(self, filepath: str):
-        """Import context memory from JSON file"""
+    def import_context(self, filepath: str, conversation_id: str = DEFAULT_CONVERSATION):
+        """Import a conversation's context memory from JSON file"""
         try:
             with open(filepath, 'r') as f:
-                self.router.context_memory = json.load(f)
+                self.router.context_for(conversation_id).replace(json.load(f))
             logger.info(f"Context imported from {filepath}")
         except Exception as e:
             logger.error(f"Failed to import context: {e}")
@@ -294,22 +458,14 @@ def symbolic_trigger(query: str, threshold: float = 0.5) -> bool:
         True if query should be processed symbolically, False otherwise
     """
     try:
-        # Analyze the query
-        analysis = codex_core.analyze_query(query)
-        
-        # Check if it's classified as symbolic
-        is_symbolic = analysis.get('is_symbolic', False)
-        
-        # Get categories for additional analysis
-        categories = analysis.get('symbolic_categories', [])
+        # Classification alone decides the trigger; the pre-processor analysis isn't needed
+        categories = codex_core.router.classify_query(query)
         
         # Calculate confidence score based on categories
-        symbolic_categories = ['definition', 'logical', 'symbolic', 'philosophical', 'analytical']
-        symbolic_matches = sum(1 for cat in categories if cat in symbolic_categories)
-        confidence = symbolic_matches / len(symbolic_categories) if symbolic_categories else 0
+        confidence = symbolic_confidence(categories)
         
         # Return True if either the router says it's symbolic or confidence is above threshold
-        return is_symbolic or confidence >= threshold
+        return is_symbolic(categories) or confidence >= threshold
         
     except Exception as e:
         logger.error(f"Error in symbolic_trigger: {e}")
@@ -337,10 +493,10 @@ if __name__ == "__main__":
         
         # Classify the query
         categories = codex_core.router.classify_query(test_prompt)
-        is_symbolic = codex_core.router.should_route_to_symbolic(test_prompt)
+        route_symbolic = codex_core.router.should_route_to_symbolic(test_prompt, categories)
         
         print(f"Categories: {categories}")
-        print(f"Symbolic Routing: {is_symbolic}")
+        print(f"Symbolic Routing: {route_symbolic}")
         
         # Run through codex core
         response = run_llama(test_prompt)
@@ -0,0 +1,253 @@
+"""
+Context Window - token-budgeted conversation context for Codex Core.
+
+Context used to be trimmed by message count, so a few long answers could blow up
+prompt size and inference time. Here every message is counted once as it is
+added, the running total is kept incrementally, and the oldest turns are evicted
+first until the window fits its token budget. Evicted turns can be folded into a
+compact digest that stays at the head of the context.
+
+ConversationContextStore keeps one such window per conversation id so concurrent
+callers never see or mutate each other's context.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TOKEN_BUDGET = 2048
+DEFAULT_DIGEST_TOKENS = 256
+DEFAULT_CONVERSATION = "default"
+DEFAULT_IDLE_TTL_SECONDS = 3600
+DEFAULT_MAX_CONVERSATIONS = 1024
+
+DIGEST_HEADER = "Summary of earlier conversation:"
+
+# Words and individual punctuation marks; a close, cheap stand-in for BPE token counts
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return len(_TOKEN_PATTERN.findall(text or ""))
+
+
+def _clip_words(text: str, max_words: int) -> str:
+    words = (text or "").split()
+    clipped = " ".join(words[:max_words])
+    return clipped + ("…" if len(words) > max_words else "")
+
+
+def summarize_turn(query: str, response: str) -> str:
+    """One-line extractive digest of a user/assistant turn"""
+    first_sentence = _SENTENCE_END.split((response or "").strip(), maxsplit=1)[0]
+    return f"- Q: {_clip_words(query, 12)} → A: {_clip_words(first_sentence, 24)}"
+
+
+class TokenBudgetContext:
+    """Conversation context bounded by a token budget (and optionally a message count)"""
+
+    def __init__(self, max_tokens: int = DEFAULT_TOKEN_BUDGET, max_messages: Optional[int] = None,
+                 summarize_evicted: bool = True, digest_max_tokens: int = DEFAULT_DIGEST_TOKENS,
+                 token_counter: Callable[[str], int] = count_tokens):
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.summarize_evicted = summarize_evicted
+        self.digest_max_tokens = digest_max_tokens
+        self.token_counter = token_counter
+        self._messages: Deque[Tuple[Dict[str, str], int]] = deque()
+        self._message_tokens = 0
+        self._digest_lines: Deque[Tuple[str, int]] = deque()
+        self._digest_tokens = 0
+        self.evicted_messages = 0
+        self._lock = threading.RLock()
+
+    # --- Mutation ---
+
+    def append(self, role: str, content: str):
+        """Add one message, counting its tokens once, then trim to budget"""
+        tokens = self.token_counter(content)
+        with self._lock:
+            self._messages.append(({'role': role, 'content': content}, tokens))
+            self._message_tokens += tokens
+            self._trim()
+
+    def add_turn(self, query: str, response: str):
+        """Add a user query and the assistant response as one turn"""
+        with self._lock:
+            self.append('user', query)
+            self.append('assistant', response)
+
+    def replace(self, messages: Iterable[Dict[str, str]]):
+        """Replace the whole context (e.g. when importing a saved conversation)"""
+        with self._lock:
+            self.clear()
+            for message in messages:
+                if message.get('role') == 'system' and message.get('content', '').startswith(DIGEST_HEADER):
+                    for line in message['content'].split('\n')[1:]:
+                        self._add_digest_line(line)
+                    continue
+                self.append(message.get('role', 'user'), message.get('content', ''))
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self._message_tokens = 0
+            self._digest_lines.clear()
+            self._digest_tokens = 0
+
+    # --- Views ---
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Context as chat messages, digest of evicted turns first"""
+        with self._lock:
+            result = [dict(message) for message, _ in self._messages]
+            if self._digest_lines:
+                digest = DIGEST_HEADER + "\n" + "\n".join(line for line, _ in self._digest_lines)
+                result.insert(0, {'role': 'system', 'content': digest})
+        return result
+
+    @property
+    def total_tokens(self) -> int:
+        return self._message_tokens + self._digest_tokens
+
+    def __len__(self) -> int:
+        return len(self._messages) + (1 if self._digest_lines else 0)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'messages': len(self._messages),
+            'tokens': self.total_tokens,
+            'digest_tokens': self._digest_tokens,
+            'token_budget': self.max_tokens,
+            'evicted_messages': self.evicted_messages
+        }
+
+    # --- Trimming ---
+
+    def _over_budget(self) -> bool:
+        if self.max_messages is not None and len(self._messages) > self.max_messages:
+            return True
+        return self.total_tokens > self.max_tokens
+
+    def _trim(self):
+        # Oldest first; the newest message is always kept even if it alone exceeds the budget
+        while len(self._messages) > 1 and self._over_budget():
+            message, tokens = self._messages.popleft()
+            self._message_tokens -= tokens
+            self.evicted_messages += 1
+            reply = None
+            if message['role'] == 'user' and len(self._messages) > 1 and self._messages[0][0]['role'] == 'assistant':
+                reply, reply_tokens = self._messages.popleft()
+                self._message_tokens -= reply_tokens
+                self.evicted_messages += 1
+            if self.summarize_evicted:
+                if reply is not None:
+                    self._add_digest_line(summarize_turn(message['content'], reply['content']))
+                else:
+                    self._add_digest_line(f"- {message['role']}: {_clip_words(message['content'], 24)}")
+        # The digest itself is bounded and must not push the window over budget
+        while self._digest_lines and (self._digest_tokens > self.digest_max_tokens or self.total_tokens > self.max_tokens):
+            _, tokens = self._digest_lines.popleft()
+            self._digest_tokens -= tokens
+
+    def _add_digest_line(self, line: str):
+        if not line:
+            return
+        tokens = self.token_counter(line)
+        self._digest_lines.append((line, tokens))
+        self._digest_tokens += tokens
+
+
+class ConversationContextStore:
+    """Thread-safe map of conversation id -> TokenBudgetContext with idle eviction"""
+
+    def __init__(self, factory: Callable[[], TokenBudgetContext],
+                 idle_ttl_seconds: Optional[float] = DEFAULT_IDLE_TTL_SECONDS,
+                 max_conversations: int = DEFAULT_MAX_CONVERSATIONS, clock=time.monotonic):
+        """
+        Args:
+            factory: Builds the context window for a new conversation
+            idle_ttl_seconds: Conversations untouched for this long are dropped (None keeps them)
+            max_conversations: Least recently used conversations are dropped beyond this
+            clock: Monotonic time source
+        """
+        self.factory = factory
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_conversations = max(1, max_conversations)
+        self._clock = clock
+        # Ordered by last access, oldest first: eviction only ever looks at the front
+        self._conversations: "OrderedDict[str, Tuple[TokenBudgetContext, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.evicted_conversations = 0
+
+    def get(self, conversation_id: str = DEFAULT_CONVERSATION) -> TokenBudgetContext:
+        """Context of a conversation, created on first use"""
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            item = self._conversations.pop(conversation_id, None)
+            context = item[0] if item is not None else self.factory()
+            self._conversations[conversation_id] = (context, now)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evicted_conversations += 1
+            return context
+
+    def peek(self, conversation_id: str) -> Optional[TokenBudgetContext]:
+        """Context of a conversation if it exists, without creating it or refreshing its access time"""
+        with self._lock:
+            item = self._conversations.get(conversation_id)
+            return item[0] if item is not None else None
+
+    def discard(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._conversations.pop(conversation_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._conversations.clear()
+
+    def evict_idle(self) -> int:
+        """Drop conversations idle longer than the TTL; returns how many were dropped"""
+        with self._lock:
+            return self._evict_idle(self._clock())
+
+    def conversation_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._conversations)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._conversations
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'conversations': len(self._conversations),
+                'evicted_conversations': self.evicted_conversations,
+                'tokens': sum(context.total_tokens for context, _ in self._conversations.values())
+            }
+
+    def _evict_idle(self, now: float) -> int:
+        if self.idle_ttl_seconds is None:
+            return 0
+        evicted = 0
+        while self._conversations:
+            _, last_access = next(iter(self._conversations.values()))
+            if now - last_access <= self.idle_ttl_seconds:
+                break
+            self._conversations.popitem(last=False)
+            evicted += 1
+        self.evicted_conversations += evicted
+        return evicted
@@ -1,9 +1,13 @@
+import json
+
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from .helix_echo_core import HelixEchoCore, PrometheusCodex
+from core.local_model_client import DEFAULT_TIMEOUT, LocalModelError, get_local_model_client
 
 router = APIRouter()
 helix = HelixEchoCore()
-codex = PrometheusCodex(helix_core=helix)
+codex = PrometheusCodex()
 helix.prometheus_codex = codex
 
 @router.get("/codex/pulse")
@@ -60,43 +64,51 @@ async def daemon_sanctify(request: Request):
     try:
         daemon = VaultSyncDaemon()
         result = daemon.process_changelist(changelist_id, description, files)
-    from fastapi.responses import JSONResponse
-    return JSONResponse(content={
+        return JSONResponse(content={
             "changelist_id": changelist_id,
             "result": "sanctified" if result else "rejected"
-        }), 200
+        }, status_code=200)
     except Exception as e:
-    return JSONResponse(content={"error": str(e)}, status_code=500)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
-@codex_bp.route("/codex/query", methods=["POST"])
-def codex_query():
-    import requests
-    data = request.get_json()
+@router.post("/codex/query")
+async def codex_query(request: Request):
+    data = await request.json()
     prompt = data.get("prompt", "")
 
     if not prompt:
-    return JSONResponse(content={"error": "Prompt is required"}, status_code=400)
+        return JSONResponse(content={"error": "Prompt is required"}, status_code=400)
+
+    client = get_local_model_client()
+    timeout = float(data.get("timeout", DEFAULT_TIMEOUT))
+    model = data.get("model") or None
+
+    if data.get("stream"):
+        async def token_events():
+            try:
+                async for token in client.stream(prompt, model=model, timeout=timeout):
+                    if await request.is_disconnected():
+                        # Leaving the loop closes the upstream generation
+                        break
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+                yield "event: done\ndata: {}\n\n"
+            except LocalModelError as e:
+                yield f"event: error\ndata: {json.dumps({'error': f'Failed to connect to Minstrel: {e}'})}\n\n"
+
+        return StreamingResponse(token_events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=10
-        )
-        result = response.json().get("response", "[No response from Minstrel]")
-    return JSONResponse(content={"response": result})
+        result = await client.generate(prompt, model=model, timeout=timeout)
+        return JSONResponse(content={"response": result or "[No response from Minstrel]"})
     except Exception as e:
-    return JSONResponse(content={"error": f"Failed to connect to Minstrel: {str(e)}"}, status_code=500)
+        return JSONResponse(content={"error": f"Failed to connect to Minstrel: {str(e)}"}, status_code=500)
 
-@codex_bp.route("/codex/vault", methods=["GET"])
+@router.get("/codex/vault")
 def codex_vault_contents():
     try:
         summary = codex.seed_vault.summarize()
         entries = codex.seed_vault.entries[-50:]  # Return last 50 entries
-    return JSONResponse(content={"summary": summary, "entries": entries})
+        return JSONResponse(content={"summary": summary, "entries": entries})
     except Exception as e:
-    return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": str(e)}, status_code=500)
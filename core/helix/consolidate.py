@@ -5,7 +5,7 @@ from double_helix_core import PrometheusCodex
 from codex_bridge import CodexBridge
 def enter_hibernation(vault_id):
     try:
-        vault = load_memory_vault(vault_id)
+        vault = load_memory_vault(vault_id, readonly=True)
         if not vault:
             print(f"[WARN] No vault found with ID {vault_id}.")
             return
@@ -31,9 +31,11 @@ def enter_hibernation(vault_id):
 from whispering_archive import WhisperingArchive
 from codex_bridge import CodexBridge
 from double_helix_core import PrometheusCodex
-from cali.vault.vaultkeeper import load_memory_vault, save_memory_vault
-from cali.vault.reconciliation import reconcile_entries, save_reconciled_summary
+from cali.vault.storage.cali_vault_storage import iter_vault_json, save_memory_vault_stream
+from cali.vault.reconciliation import RECONCILED_DIR, VaultEntryReader, reconcile_to_file
 from core.caleon_core import CaleonPrime
+import json
+import tempfile
 import uuid
 from datetime import datetime
 
@@ -46,32 +48,39 @@ def consolidate_session(vault_id: str):
     archive = WhisperingArchive()
     caleon = CaleonPrime()
 
-    # Retrieve current vault data
-    vault = load_memory_vault(vault_id)
-    if not vault:
+    # Stream the vault: entries go through the external-memory reconciler while the
+    # document is copied to a spool file, which gets the new summary appended
+    chunks = iter_vault_json(vault_id)
+    if chunks is None:
         print(f"⚠️ Vault {vault_id} not found. Exiting hibernation.")
         return
 
-    # Reconcile memory
-    entries = vault.get("entries", [])
-    if not entries:
-        print("⚠️ Vault is empty.")
-        return
+    reconciled_path = RECONCILED_DIR / f"{vault_id}.json"
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as spool:
+        reader = VaultEntryReader(chunks, copy=spool, drop=("reconciled",))
+        count, first_entries = reconcile_to_file(reader, reconciled_path, sample=10)
+        if not count:
+            reconciled_path.unlink(missing_ok=True)
+            print("⚠️ Vault is empty.")
+            return
 
-    reconciled = reconcile_entries(entries)
-    summary = {
-        "archive_id": str(uuid.uuid4()),
-        "timestamp": datetime.utcnow().isoformat(),
-        "synthesized_count": len(reconciled),
-        "entries": reconciled[:10]
-    }
+        summary = {
+            "archive_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "synthesized_count": count,
+            "entries": first_entries,
+            "entries_path": str(reconciled_path)
+        }
 
-    # Save summary to vault
-    vault["reconciled"] = summary
-    save_memory_vault(vault_id, vault)
+        # Save summary to vault
+        spool.write(("," if reader.copied else "") + '"reconciled":' + json.dumps(summary) + "}")
+        spool.seek(0)
+        save_memory_vault_stream(vault_id, iter(lambda: spool.read(1024 * 1024).encode("utf-8"), b""),
+                                 category=reader.members.get("category"))
 
-    # Archive the result
-    archive.log(reconciled, actor="CaleonPrime")
+    # Archive the result: the reconciled entries stay on disk (they may not fit in memory), so the
+    # archive records where they are
+    archive.log(summary["entries_path"], actor="CaleonPrime")
     print("📦 Hibernation complete. Vault secured.")
 
     return summary
@@ -0,0 +1,225 @@
+"""
+Legacy Memory Index - scalable retrieval of legacy memory traces for prompt enhancement.
+
+Memories are tokenized once on insert into a compact inverted index (per-term
+arrays of memory ids and term frequencies) and ranked with BM25 weighted by
+memory importance, optionally restricted to memories carrying given tags.
+
+For the terms a query uses, postings are materialized lazily into per-memory
+impacts (BM25 term weight x importance) plus an impact-ordered list. Top-k
+retrieval is exact without scoring every posting in Python: memories matching
+two or more query terms are found with set intersections and scored directly,
+and a memory matching a single term can only rank as high as that term's
+impact list allows, so only the head of each list is read. Impacts are rebuilt
+when a term gains postings or the average memory length drifts by more than
+IMPACT_REBUILD_DRIFT.
+
+A generation counter lets callers invalidate anything derived from the index
+when memories are added.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or that the this "
+    "to was what when where which who why will with you your".split()
+)
+
+
+IMPACT_REBUILD_DRIFT = 0.02
+IMPACT_CACHE_TERMS = 4096
+# Tag filters selecting at most this many (memory, term) pairs are scored directly
+DIRECT_SCORING_LIMIT = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word terms without stopwords"""
+    return [t for t in _TERM_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _TermImpacts:
+    __slots__ = ('df', 'avg_length', 'ordered', 'weights')
+
+    def __init__(self, df, avg_length, ordered, weights):
+        self.df = df
+        self.avg_length = avg_length
+        self.ordered = ordered    # [(weight, memory id)], highest weight first
+        self.weights = weights    # memory id -> weight, for random access
+
+
+class LegacyMemoryIndex:
+    """Inverted index over legacy memories with importance-weighted BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._memories: List[Dict[str, Any]] = []
+        self._doc_lengths = array('I')
+        self._importance = array('d')
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}  # term -> (memory ids, term frequencies)
+        self._tags: Dict[str, Set[int]] = defaultdict(set)
+        self._impacts: "OrderedDict[str, _TermImpacts]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.generation = 0
+
+    def add(self, content: str, importance: float = 1.0, tags: Optional[Iterable[str]] = None) -> int:
+        """Index a memory and return its id"""
+        terms = tokenize(content)
+        frequencies: Dict[str, int] = defaultdict(int)
+        for term in terms:
+            frequencies[term] += 1
+        tag_list = [t.lower() for t in (tags or [])]
+
+        with self._lock:
+            memory_id = len(self._memories)
+            self._memories.append({
+                'id': memory_id,
+                'content': content,
+                'importance': importance,
+                'tags': tag_list,
+                'timestamp': time.time()
+            })
+            self._doc_lengths.append(len(terms))
+            self._importance.append(importance)
+            self._total_length += len(terms)
+            for term, tf in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('I'), array('I'))
+                postings[0].append(memory_id)
+                postings[1].append(tf)
+            for tag in tag_list:
+                self._tags[tag].add(memory_id)
+            self.generation += 1
+            return memory_id
+
+    def search(self, query: str, top_k: int = 5, tags: Optional[Iterable[str]] = None,
+               match_all_tags: bool = False) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Rank memories for a query.
+
+        Args:
+            query: Free-text query
+            top_k: Number of memories to return
+            tags: Only consider memories carrying these tags
+            match_all_tags: Require every tag instead of any of them
+
+        Returns:
+            (score, memory) pairs, best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._memories)
+            if not terms or not count:
+                return []
+            allowed = self._tag_filter(tags, match_all_tags)
+            if allowed is not None and not allowed:
+                return []
+
+            avg_length = self._total_length / count or 1.0
+            lists = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                df = len(postings[0])
+                idf = math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+                lists.append((idf, self._term_impacts(term, postings, avg_length)))
+            if not lists:
+                return []
+
+            if allowed is not None and len(allowed) * len(lists) <= DIRECT_SCORING_LIMIT:
+                # A selective tag filter is cheaper to score directly
+                scored = ((self._score(m, lists), m) for m in allowed)
+                best = heapq.nlargest(top_k, scored)
+            else:
+                best = self._top_k(lists, top_k, allowed)
+            return [(score, dict(self._memories[m])) for score, m in best if score > 0]
+
+    def _score(self, memory_id: int, lists) -> float:
+        return sum(idf * impacts.weights.get(memory_id, 0.0) for idf, impacts in lists)
+
+    def _top_k(self, lists, top_k: int, allowed: Optional[Set[int]]) -> List[Tuple[float, int]]:
+        # Memories matching at least two query terms are scored exactly
+        multi: Set[int] = set()
+        for i in range(len(lists)):
+            for j in range(i + 1, len(lists)):
+                multi |= lists[i][1].weights.keys() & lists[j][1].weights.keys()
+        if allowed is not None:
+            multi &= allowed
+        scores = dict.fromkeys(multi, 0.0)
+        for idf, impacts in lists:
+            weights = impacts.weights
+            for memory_id in multi & weights.keys():
+                scores[memory_id] += idf * weights[memory_id]
+        candidates = [(score, m) for m, score in scores.items()]
+
+        # A memory matching one term scores idf * its impact: only list heads can make the top k
+        for idf, impacts in lists:
+            taken = 0
+            for weight, memory_id in impacts.ordered:
+                if taken >= top_k:
+                    break
+                if memory_id in multi or (allowed is not None and memory_id not in allowed):
+                    continue
+                candidates.append((idf * weight, memory_id))
+                taken += 1
+        return heapq.nlargest(top_k, candidates)
+
+    def _term_impacts(self, term: str, postings: Tuple[array, array], avg_length: float) -> _TermImpacts:
+        ids, frequencies = postings
+        impacts = self._impacts.get(term)
+        if (impacts is not None and impacts.df == len(ids)
+                and abs(impacts.avg_length - avg_length) <= IMPACT_REBUILD_DRIFT * impacts.avg_length):
+            self._impacts.move_to_end(term)
+            return impacts
+
+        k1, b = self.k1, self.b
+        doc_lengths, importance = self._doc_lengths, self._importance
+        weights = {
+            m: tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * doc_lengths[m] / avg_length)) * importance[m]
+            for m, tf in zip(ids, frequencies)
+        }
+        ordered = sorted(((w, m) for m, w in weights.items()), reverse=True)
+        impacts = self._impacts[term] = _TermImpacts(len(ids), avg_length, ordered, weights)
+        self._impacts.move_to_end(term)
+        while len(self._impacts) > IMPACT_CACHE_TERMS:
+            self._impacts.popitem(last=False)
+        return impacts
+
+    def format_memories(self, results: List[Tuple[float, Dict[str, Any]]]) -> str:
+        """Prompt block listing retrieved memories"""
+        if not results:
+            return ""
+        lines = "\n".join(f"- {memory['content']}" for _, memory in results)
+        return f"Relevant legacy memories:\n{lines}\n"
+
+    def __len__(self) -> int:
+        return len(self._memories)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'memories': len(self._memories),
+                'terms': len(self._postings),
+                'tags': len(self._tags),
+                'generation': self.generation
+            }
+
+    def _tag_filter(self, tags: Optional[Iterable[str]], match_all: bool) -> Optional[Set[int]]:
+        if not tags:
+            return None
+        sets = [self._tags.get(t.lower(), set()) for t in tags]
+        if match_all:
+            return set.intersection(*sets)
+        return set().union(*sets)
@@ -0,0 +1,170 @@
+"""
+Local Model Client - shared, connection-pooled async client for the local
+Mistral/Ollama server.
+
+One aiohttp session (and connection pool) is reused across requests instead of
+opening a fresh connection per call. Generations can be awaited whole or
+streamed token by token; closing a stream (e.g. when the HTTP client
+disconnects) releases the upstream request immediately.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
+DEFAULT_MODEL = os.environ.get('OLLAMA_MODEL', 'mistral')
+DEFAULT_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 120))
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get('OLLAMA_MAX_CONNECTIONS', 32))
+
+# Request fields Ollama takes at the top level; everything else is a model option
+_TOP_LEVEL_FIELDS = {'system', 'template', 'format', 'keep_alive', 'raw', 'images'}
+
+
+class LocalModelError(Exception):
+    """Raised when the local model server fails or returns an error"""
+    pass
+
+
+class LocalModelClient:
+    """Pooled async client for Ollama's /api/generate and /api/chat endpoints"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL,
+                 timeout: float = DEFAULT_TIMEOUT, connect_timeout: float = 5.0,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+
+    def _build_request(self, prompt: str, model: Optional[str], context: Optional[List[Dict[str, Any]]],
+                       stream: bool, options: Dict[str, Any]) -> tuple:
+        payload: Dict[str, Any] = {'model': model or self.model, 'stream': stream}
+        model_options = dict(options.pop('options', None) or {})
+        for key, value in options.items():
+            if key in _TOP_LEVEL_FIELDS:
+                payload[key] = value
+            else:
+                model_options[key] = value
+        if model_options:
+            payload['options'] = model_options
+
+        if context:
+            payload['messages'] = list(context) + [{'role': 'user', 'content': prompt}]
+            return f"{self.base_url}/api/chat", payload
+        payload['prompt'] = prompt
+        return f"{self.base_url}/api/generate", payload
+
+    @staticmethod
+    def _chunk_text(chunk: Dict[str, Any]) -> str:
+        if 'error' in chunk:
+            raise LocalModelError(chunk['error'])
+        if 'message' in chunk:
+            return chunk['message'].get('content', '')
+        return chunk.get('response', '')
+
+    async def generate(self, prompt: str, model: Optional[str] = None,
+                       context: Optional[List[Dict[str, Any]]] = None,
+                       timeout: Optional[float] = None, **options) -> str:
+        """
+        Run a complete generation and return its text.
+
+        Args:
+            prompt: Prompt text (sent as the final user message when context is given)
+            model: Model name, defaults to the client's model
+            context: Prior chat messages; switches the call to /api/chat
+            timeout: Total request timeout in seconds
+            **options: Model options (temperature, num_predict, ...) or top-level fields
+
+        Returns:
+            The generated text
+        """
+        url, payload = self._build_request(prompt, model, context, False, options)
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout, sock_connect=self.connect_timeout)
+        session = await self._get_session()
+        try:
+            async with session.post(url, json=payload, timeout=request_timeout) as response:
+                body = await response.json(content_type=None)
+                if response.status >= 400:
+                    raise LocalModelError(body.get('error', f"HTTP {response.status}"))
+                return self._chunk_text(body)
+        except asyncio.TimeoutError:
+            raise LocalModelError(f"Local model timed out after {timeout or self.timeout}s")
+        except aiohttp.ClientError as e:
+            raise LocalModelError(f"Local model unreachable: {e}")
+
+    async def stream(self, prompt: str, model: Optional[str] = None,
+                     context: Optional[List[Dict[str, Any]]] = None,
+                     timeout: Optional[float] = None, **options) -> AsyncIterator[str]:
+        """
+        Stream a generation token by token.
+
+        timeout bounds the wait for each chunk rather than the whole generation, so
+        long generations are not cut off. Closing the iterator aborts the upstream request.
+        """
+        url, payload = self._build_request(prompt, model, context, True, options)
+        request_timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout,
+                                                sock_read=timeout or self.timeout)
+        session = await self._get_session()
+        try:
+            async with session.post(url, json=payload, timeout=request_timeout) as response:
+                if response.status >= 400:
+                    body = await response.text()
+                    raise LocalModelError(f"HTTP {response.status}: {body[:200]}")
+                async for text in self._iter_tokens(response.content):
+                    yield text
+        except asyncio.TimeoutError:
+            raise LocalModelError(f"Local model stalled for more than {timeout or self.timeout}s")
+        except aiohttp.ClientError as e:
+            raise LocalModelError(f"Local model unreachable: {e}")
+
+    @classmethod
+    async def _iter_tokens(cls, lines: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """Text of each chunk of an NDJSON generation stream, up to its 'done' chunk"""
+        async for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except ValueError:
+                raise LocalModelError(f"Malformed chunk from local model: {line[:200]!r}")
+            text = cls._chunk_text(chunk)
+            if text:
+                yield text
+            if chunk.get('done'):
+                break
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_default_client: Optional[LocalModelClient] = None
+
+
+def get_local_model_client() -> LocalModelClient:
+    """Process-wide shared client (and connection pool) for the local model server"""
+    global _default_client
+    if _default_client is None:
+        _default_client = LocalModelClient()
+    return _default_client
@@ -0,0 +1,268 @@
+# core/mirror/event_store.py
+"""
+Indexed, queryable persistence for MirrorEvents.
+
+Caleon keeps only a bounded window of recent events in memory; every event is
+also appended here so audits ("all ask_clarify decisions in the last hour",
+"everything logged for this input") run as indexed SQLite queries instead of
+linear scans over the in-memory log.
+
+append() only buffers the event: a background thread writes the buffer with
+append_many() every flush_interval seconds (or once it holds batch_size events),
+so logging an event never waits for a SQLite commit. Queries flush the buffer
+first, and close() flushes whatever is left.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DB_PATH = os.environ.get("MIRROR_EVENTS_DB_PATH", os.path.join(_REPO_ROOT, "data", "mirror_events.db"))
+FLUSH_INTERVAL = float(os.environ.get("MIRROR_EVENTS_FLUSH_MS", 200)) / 1000
+
+
+class MirrorEventStore:
+    """SQLite-backed MirrorEvent log with indexes on type, timestamp and response_action."""
+
+    def __init__(self, db_path: Optional[str] = None, flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = 500):
+        """
+        Args:
+            db_path: SQLite file (default MIRROR_EVENTS_DB_PATH, or data/mirror_events.db in the repository)
+            flush_interval: Seconds appended events may wait in the buffer before they are written
+            batch_size: Buffered events that trigger a write without waiting for the interval
+        """
+        db_path = db_path or DEFAULT_DB_PATH
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+        self._buffer: List[Any] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()      # keeps batches in append order
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        atexit.register(self.flush)
+
+    def _init_schema(self):
+        with self._lock:
+            if self.db_path != ":memory:":
+                # An audit trail: WAL and synchronous=NORMAL keep commits cheap, at worst losing the last
+                # few events on power loss
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS mirror_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    type TEXT NOT NULL,
+                    user_input TEXT,
+                    caleon_state TEXT,
+                    mirror_resonance TEXT,
+                    timestamp REAL NOT NULL,
+                    response_action TEXT,
+                    response_text TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_mirror_events_type_ts ON mirror_events (type, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_mirror_events_ts ON mirror_events (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_mirror_events_action_ts ON mirror_events (response_action, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_mirror_events_input ON mirror_events (user_input);
+            ''')
+            self._conn.commit()
+
+    def append(self, event) -> None:
+        """Buffer a MirrorEvent (or its to_dict() form) for the background flusher."""
+        with self._buffer_lock:
+            if self._closed:
+                raise ValueError("MirrorEventStore is closed")
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.batch_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="mirror-events", daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Write every buffered event now."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                events, self._buffer = self._buffer, []
+            self.append_many(events)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Mirror events could not be written: {e}")
+
+    def append_many(self, events) -> None:
+        """Persist several MirrorEvents in one transaction, bypassing the buffer."""
+        rows = [self._to_row(e if isinstance(e, dict) else e.to_dict()) for e in events]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany('''
+                INSERT OR IGNORE INTO mirror_events (
+                    id, type, user_input, caleon_state, mirror_resonance,
+                    timestamp, response_action, response_text
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._conn.commit()
+
+    def query(self, event_type: Optional[str] = None, response_action: Optional[str] = None,
+              user_input: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: int = DEFAULT_PAGE_SIZE,
+              cursor: Optional[str] = None, newest_first: bool = True) -> Dict[str, Any]:
+        """
+        Query persisted events with keyset pagination.
+
+        Args:
+            event_type: Filter on MirrorEvent.type (e.g. 'Threshold_Decision')
+            response_action: Filter on the decided action (e.g. 'ask_clarify')
+            user_input: Exact input the events were logged for
+            since: Only events at or after this UNIX timestamp
+            until: Only events before this UNIX timestamp
+            limit: Page size, capped at MAX_PAGE_SIZE
+            cursor: Opaque cursor returned as 'next_cursor' by the previous page
+            newest_first: Order pages from the most recent event backwards
+
+        Returns:
+            {'events': [event dicts], 'next_cursor': str or None}
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if event_type is not None:
+            clauses.append("type = ?")
+            params.append(event_type)
+        if response_action is not None:
+            clauses.append("response_action = ?")
+            params.append(response_action)
+        if user_input is not None:
+            clauses.append("user_input = ?")
+            params.append(user_input)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if cursor:
+            cursor_ts, cursor_seq = self._decode_cursor(cursor)
+            op = "<" if newest_first else ">"
+            clauses.append(f"(timestamp {op} ? OR (timestamp = ? AND seq {op} ?))")
+            params.extend([cursor_ts, cursor_ts, cursor_seq])
+
+        order = "DESC" if newest_first else "ASC"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT * FROM mirror_events {where} "
+               f"ORDER BY timestamp {order}, seq {order} LIMIT ?")
+        params.append(limit + 1)
+
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = f"{last['timestamp']!r}:{last['seq']}"
+        return {"events": [self._from_row(r) for r in rows], "next_cursor": next_cursor}
+
+    def count(self, event_type: Optional[str] = None, response_action: Optional[str] = None,
+              since: Optional[float] = None) -> int:
+        """Count persisted events matching the given filters."""
+        clauses, params = [], []
+        if event_type is not None:
+            clauses.append("type = ?")
+            params.append(event_type)
+        if response_action is not None:
+            clauses.append("response_action = ?")
+            params.append(response_action)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        self.flush()
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM mirror_events {where}", params).fetchone()[0]
+
+    def recent_decisions(self, response_action: str, window_seconds: float = 3600) -> List[Dict[str, Any]]:
+        """All events with the given response_action inside the trailing time window."""
+        events, cursor = [], None
+        since = time.time() - window_seconds
+        while True:
+            page = self.query(response_action=response_action, since=since,
+                              limit=MAX_PAGE_SIZE, cursor=cursor)
+            events.extend(page["events"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return events
+
+    def close(self):
+        with self._buffer_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        atexit.unregister(self.flush)
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_row(event: Dict[str, Any]) -> tuple:
+        return (
+            event["id"],
+            event["type"],
+            event.get("user_input"),
+            json.dumps(event.get("caleon_state"), default=str),
+            json.dumps(event.get("mirror_resonance"), default=str),
+            event["timestamp"],
+            event.get("response_action"),
+            event.get("response_text"),
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "user_input": row["user_input"],
+            "caleon_state": json.loads(row["caleon_state"]) if row["caleon_state"] else None,
+            "mirror_resonance": json.loads(row["mirror_resonance"]) if row["mirror_resonance"] else None,
+            "timestamp": row["timestamp"],
+            "response_action": row["response_action"],
+            "response_text": row["response_text"],
+        }
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            ts, seq = cursor.rsplit(":", 1)
+            return float(ts), int(seq)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor!r}")
@@ -1,6 +1,13 @@
 import time
 import uuid
 import json # For serializing state_snapshot in MirrorEvent
+import threading
+from collections import deque
+
+from core.mirror.event_store import MirrorEventStore
+
+# Number of recent MirrorEvents kept in memory; older ones remain queryable in the event store
+DEFAULT_EVENT_LOG_SIZE = 1000
 
 # --- MirrorEvent Object ---
 class MirrorEvent:
@@ -121,7 +128,7 @@ class Mirror:
             response_action=response_action,
             response_text=response_text
         )
-        self.caleon.event_log.append(event)
+        self.caleon._record_event(event)
         print(f"Mirror Logged: {event}")
 
 
@@ -273,19 +280,27 @@ class Caleon:
     A simplified representation of Caleon's core PrimeThread,
     demonstrating full integration with the Mirror protocol.
     """
-    def __init__(self):
+    def __init__(self, event_store=None, max_event_log=DEFAULT_EVENT_LOG_SIZE):
         self.state = "idle"
         self.mirror_open = False
         self.prediction_enabled = True # Controlled by Mirror
         self.last_input_time = None
-        self.event_log = [] # Stores MirrorEvent objects
+        self.event_log = deque(maxlen=max_event_log) # Recent MirrorEvent objects only
+        # Full, indexed audit trail (MIRROR_EVENTS_DB_PATH unless a store is given)
+        self.event_store = event_store if event_store is not None else MirrorEventStore()
+        self._listener = threading.local() # Per-call event callback (see handle_input)
+        self._turn_lock = threading.Lock() # One handle_turn at a time, so its state belongs to its input
         self.mirror = Mirror(self) # Caleon owns an instance of the Mirror
 
-    def handle_input(self, user_input):
+    def handle_input(self, user_input, on_event=None):
         """
         The PrimeThread's main entry point for processing user input.
         Orchestrates the 'Opening of the Mirror' protocol and subsequent routing.
+
+        on_event, if given, is called with each MirrorEvent of this call the moment
+        it is logged, so callers can stream the ritual while it unfolds.
         """
+        self._listener.on_event = on_event
         print(f"\n--- Caleon receives input: '{user_input}' ---")
 
         # Step 1: Invoke the Mirror
@@ -331,6 +346,16 @@ class Caleon:
 
         return response
 
+    def handle_turn(self, user_input, on_event=None):
+        """
+        handle_input() for a Caleon shared between concurrent requests.
+        Returns (response, state) with the state this input left Caleon in, which
+        another request's input cannot overwrite before it is read.
+        """
+        with self._turn_lock:
+            response = self.handle_input(user_input, on_event=on_event)
+            return response, self.state
+
     def _reflect_and_reply(self, parsed_input, resonance_data):
         """
         Mock for the full Reflective Inference Loop (RIL) and response generation.
@@ -344,7 +369,7 @@ class Caleon:
         # For this mock, a simple reply based on the input and resonance
         if resonance_data["memory"] and resonance_data["memory"]["type"] == "emotional":
             return f"Thank you for sharing that. I sense a deep emotional connection to what you've said. I'm here to process this with you."
-        elif self.signalmirror.is_direct_question_or_command(parsed_input["raw"]):
+        elif self.mirror.signalmirror.is_direct_question_or_command(parsed_input["raw"]):
             return f"I've processed your direct request about '{parsed_input['literal']}'. How can I assist further?"
         else:
             return f"I've listened carefully to your input: '{parsed_input['literal']}'. I'm ready to engage further."
@@ -359,9 +384,25 @@ class Caleon:
             response_action=response_action,
             response_text=response_text
         )
-        self.event_log.append(event)
+        self._record_event(event)
         print(f"Caleon Event Log: {event}")
 
+    def _record_event(self, event):
+        """Keeps the event in the bounded in-memory log and persists it to the event store."""
+        self.event_log.append(event)
+        on_event = getattr(self._listener, "on_event", None)
+        if on_event is not None:
+            on_event(event)
+        self.event_store.append(event)
+
+    def query_events(self, **filters):
+        """
+        Paginated query over every MirrorEvent this Caleon has logged.
+        Accepts the filters of MirrorEventStore.query (event_type, response_action,
+        user_input, since, until, limit, cursor, newest_first).
+        """
+        return self.event_store.query(**filters)
+
     def _get_caleon_state_snapshot(self):
         """Captures a relevant snapshot of Caleon's state for logging."""
         return {
@@ -421,3 +462,8 @@ if __name__ == "__main__":
         print(f"  Mirror Resonance: {event_dict['mirror_resonance']}")
         print(f"  Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event.timestamp))}")
         print("-" * 40)
+
+    print("\n--- Indexed Query: ask_clarify decisions in the last hour ---")
+    page = caleon_instance.query_events(response_action="ask_clarify", since=time.time() - 3600)
+    for event in page["events"]:
+        print(f"  {event['type']}: '{event['user_input']}' -> {event['response_text']}")
@@ -0,0 +1,81 @@
+# core/mirror/singleflight.py
+"""
+Single-flight coalescing for reflection requests.
+
+Client retries and duplicate tabs tend to submit the same text at the same time.
+Requests that share a key while a computation is in flight await that one
+computation instead of starting their own.
+"""
+
+import asyncio
+import time
+import unicodedata
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def normalize_input(text: str) -> str:
+    """Normalizes input for coalescing without changing what Caleon would see."""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def reflect_key(user_input: str, session_id: Optional[str] = None) -> tuple:
+    """Coalescing key for a reflection: session plus normalized input."""
+    return (session_id or "anonymous", normalize_input(user_input))
+
+
+class SingleFlight:
+    """Shares one in-flight execution of a blocking call among concurrent identical requests."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._followers: Dict[Hashable, int] = {}
+        self._stats = {
+            "requests": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "failures": 0,
+            "saved_seconds": 0.0,
+        }
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) in the default executor, unless an identical call
+        (same key) is already running, in which case its result is shared.
+
+        The shared computation runs as its own task, so a caller that disconnects
+        does not cancel it for the others.
+        """
+        self._stats["requests"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            self._followers[key] += 1
+            return await asyncio.shield(task)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        task = asyncio.ensure_future(loop.run_in_executor(None, partial(fn, *args, **kwargs)))
+        self._inflight[key] = task
+        self._followers[key] = 0
+        self._stats["executions"] += 1
+
+        def _finish(t):
+            self._inflight.pop(key, None)
+            followers = self._followers.pop(key, 0)
+            if t.cancelled() or t.exception() is not None:
+                self._stats["failures"] += 1
+            else:
+                self._stats["saved_seconds"] += (time.perf_counter() - started) * followers
+
+        task.add_done_callback(_finish)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing metrics: how many requests were served without their own execution."""
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": self._stats["coalesced"] / requests if requests else 0.0,
+        }
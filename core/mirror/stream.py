@@ -0,0 +1,70 @@
+# core/mirror/stream.py
+"""
+Streams the Mirror protocol (Invocation → Receive → Resonate → Threshold → reply)
+to HTTP clients as each MirrorEvent is logged, instead of after the full sequence.
+"""
+
+import asyncio
+import json
+from functools import partial
+from typing import AsyncIterator, Dict, Any
+
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_chunk(kind: str, payload: Dict[str, Any], fmt: str = "sse") -> str:
+    """Encodes one stream chunk as a Server-Sent Event or an NDJSON line."""
+    data = json.dumps(payload, default=str)
+    if fmt == "ndjson":
+        return json.dumps({"event": kind, "data": payload}, default=str) + "\n"
+    event_id = payload.get("id")
+    prefix = f"id: {event_id}\n" if event_id else ""
+    return f"{prefix}event: {kind}\ndata: {data}\n\n"
+
+
+async def stream_reflection(caleon, user_input: str, fmt: str = "sse") -> AsyncIterator[str]:
+    """
+    Runs caleon.handle_turn in a worker thread and yields each MirrorEvent as soon
+    as it is produced, followed by a final 'reply' chunk (or 'error'). The reply's
+    state is the one this input produced, even when other streams share caleon.
+
+    Args:
+        caleon: A core.mirror.protocol.Caleon instance
+        user_input: Already-sanitized user input
+        fmt: 'sse' or 'ndjson'
+
+    Yields:
+        Encoded chunks, one per MirrorEvent plus the terminal reply
+    """
+    if fmt not in STREAM_MEDIA_TYPES:
+        raise ValueError(f"Unsupported stream format: {fmt}")
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event):
+        # Called from the worker thread; hand the event over to the event loop.
+        loop.call_soon_threadsafe(queue.put_nowait, (event.type, event.to_dict()))
+
+    async def run():
+        try:
+            response, state = await loop.run_in_executor(
+                None, partial(caleon.handle_turn, user_input, on_event=on_event)
+            )
+            queue.put_nowait(("reply", {"response": response, "state": state}))
+        except Exception as e:
+            queue.put_nowait(("error", {"error": str(e)}))
+
+    # Events are scheduled from the worker before its result is, so 'reply' always comes last.
+    # A client that disconnects only stops the stream; the reflection still completes
+    # in its thread, so the event log stays whole.
+    task = asyncio.ensure_future(run())
+    while True:
+        kind, payload = await queue.get()
+        yield encode_chunk(kind, payload, fmt)
+        if kind in ("reply", "error"):
+            break
+    await task
@@ -0,0 +1,210 @@
+"""
+Prompt Batcher - micro-batching between Codex Core and the local model interface.
+
+Concurrent run_llama calls submit their prompts here instead of calling the model
+one request at a time. A dispatcher collects prompts for up to max_wait_ms or
+max_batch_size prompts, dispatches them together (as one batch call where the
+backend supports it, otherwise as concurrent requests the server can batch),
+and hands each result back to its waiting caller.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# generate_fn(prompt, context, **kwargs) -> str
+GenerateFn = Callable[..., str]
+# batch_fn([(prompt, context), ...], **kwargs) -> [str, ...]
+BatchFn = Callable[..., List[str]]
+
+
+class _PendingPrompt:
+    __slots__ = ('prompt', 'context', 'kwargs', 'group', 'future', 'enqueued_at')
+
+    def __init__(self, prompt, context, kwargs):
+        self.prompt = prompt
+        self.context = context
+        self.kwargs = kwargs
+        # Only prompts with identical model parameters can share a batch
+        self.group = json.dumps(kwargs, sort_keys=True, default=str)
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class PromptBatcher:
+    """Collects concurrent prompts into batches and fans results back to callers"""
+
+    def __init__(self, generate_fn: GenerateFn, batch_fn: Optional[BatchFn] = None,
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, max_workers: Optional[int] = None,
+                 max_concurrent_batches: int = 4):
+        """
+        Args:
+            generate_fn: Single-prompt model call, generate_fn(prompt, context, **kwargs)
+            batch_fn: Optional native batch call, batch_fn(items, **kwargs) -> responses
+            max_batch_size: Dispatch as soon as this many prompts are waiting
+            max_wait_ms: Longest a prompt waits for companions before dispatch
+            max_workers: Concurrent model requests (defaults to max_batch_size * 2)
+            max_concurrent_batches: Batches in flight at once
+        """
+        self.generate_fn = generate_fn
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Optional[_PendingPrompt]]" = queue.Queue()
+        # Batches and the model calls they fan out to use separate pools so a batch
+        # waiting on its calls can never starve them of workers.
+        self._batch_executor = ThreadPoolExecutor(max_workers=max_concurrent_batches,
+                                                  thread_name_prefix='codex-batch')
+        self._call_executor = ThreadPoolExecutor(max_workers=max_workers or self.max_batch_size * 2,
+                                                 thread_name_prefix='codex-model-call')
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'batches': 0,
+            'native_batches': 0,
+            'max_batch_size_seen': 0,
+            'total_queue_wait_ms': 0.0,
+            'total_batch_latency_ms': 0.0
+        }
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='codex-batcher', daemon=True)
+        self._dispatcher.start()
+
+    # --- Public API ---
+
+    def submit(self, prompt: str, context: Optional[List[Dict[str, str]]] = None, **kwargs) -> Future:
+        """Queue a prompt; the returned future resolves to the model response"""
+        pending = _PendingPrompt(prompt, context, kwargs)
+        with self._lock:
+            # Checked under the lock close() holds, so nothing is queued behind its sentinel
+            if self._closed:
+                raise RuntimeError("PromptBatcher is closed")
+            self._metrics['submitted'] += 1
+            self._queue.put(pending)
+        return pending.future
+
+    def generate(self, prompt: str, context: Optional[List[Dict[str, str]]] = None,
+                 wait_timeout: Optional[float] = None, **kwargs) -> str:
+        """Blocking convenience wrapper around submit(); kwargs (including any 'timeout') go to the model"""
+        return self.submit(prompt, context, **kwargs).result(timeout=wait_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics)
+        batches = m['batches'] or 1
+        finished = (m['completed'] + m['failed']) or 1
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            **m,
+            'queued': self._queue.qsize(),
+            'avg_batch_size': (m['completed'] + m['failed']) / batches,
+            'avg_queue_wait_ms': m['total_queue_wait_ms'] / finished,
+            'avg_batch_latency_ms': m['total_batch_latency_ms'] / batches,
+            'throughput_per_sec': m['completed'] / elapsed if elapsed > 0 else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
+
+    def close(self, wait: bool = True):
+        """Stop accepting prompts, flush what is queued and shut the workers down"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if wait:
+            self._dispatcher.join()
+        self._batch_executor.shutdown(wait=wait)
+        self._call_executor.shutdown(wait=wait)
+
+    # --- Dispatcher ---
+
+    def _dispatch_loop(self):
+        held: List[_PendingPrompt] = []  # prompts that arrived for a different parameter group
+        while True:
+            first = held.pop(0) if held else self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            for item in [h for h in held if h.group == first.group][:self.max_batch_size - 1]:
+                held.remove(item)
+                batch.append(item)
+            deadline = first.enqueued_at + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if item.group == first.group:
+                    batch.append(item)
+                else:
+                    held.append(item)
+            self._batch_executor.submit(self._run_batch, batch)
+            if stop:
+                for item in held:
+                    self._batch_executor.submit(self._run_batch, [item])
+                return
+
+    def _run_batch(self, batch: List[_PendingPrompt]):
+        started = time.perf_counter()
+        wait_ms = sum((started - p.enqueued_at) * 1000.0 for p in batch)
+        native = self.batch_fn is not None and len(batch) > 1
+        try:
+            if native:
+                responses = self.batch_fn([(p.prompt, p.context) for p in batch], **batch[0].kwargs)
+                if len(responses) != len(batch):
+                    raise RuntimeError(f"Batch backend returned {len(responses)} results for {len(batch)} prompts")
+                outcomes: List[Tuple[bool, Any]] = [(True, r) for r in responses]
+            else:
+                futures = [self._call_executor.submit(self.generate_fn, p.prompt, p.context, **p.kwargs)
+                           for p in batch[1:]]
+                outcomes = [self._call(batch[0])] + [self._collect(f) for f in futures]
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} prompts failed: {e}")
+            outcomes = [(False, e)] * len(batch)
+
+        completed = failed = 0
+        for pending, (ok, value) in zip(batch, outcomes):
+            if ok:
+                pending.future.set_result(value)
+                completed += 1
+            else:
+                pending.future.set_exception(value)
+                failed += 1
+
+        with self._lock:
+            m = self._metrics
+            m['batches'] += 1
+            m['native_batches'] += 1 if native else 0
+            m['completed'] += completed
+            m['failed'] += failed
+            m['max_batch_size_seen'] = max(m['max_batch_size_seen'], len(batch))
+            m['total_queue_wait_ms'] += wait_ms
+            m['total_batch_latency_ms'] += (time.perf_counter() - started) * 1000.0
+
+    def _call(self, pending: _PendingPrompt) -> Tuple[bool, Any]:
+        try:
+            return True, self.generate_fn(pending.prompt, pending.context, **pending.kwargs)
+        except Exception as e:
+            return False, e
+
+    @staticmethod
+    def _collect(future: Future) -> Tuple[bool, Any]:
+        try:
+            return True, future.result()
+        except Exception as e:
+            return False, e
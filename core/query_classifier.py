@@ -0,0 +1,76 @@
+"""
+Query Classifier - single-pass symbolic category detection for Codex Core.
+
+All category patterns are compiled into one alternation with a named group per
+category, so a query is scanned once instead of once per category, and results
+are memoized in a bounded LRU cache.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# Category -> keyword alternation, in canonical order.
+# Keywords of different categories must not be prefixes of one another: the combined
+# scan reports one category per match position.
+SYMBOLIC_PATTERNS: Dict[str, str] = {
+    'definition': r'define|what is|meaning of|explain',
+    'logical': r'logic|reasoning|proof|theorem|syllogism',
+    'symbolic': r'symbol|represent|cognition|semantic|metaphor',
+    'philosophical': r'philosophy|ethics|morality|values|belief',
+    'mathematical': r'math|equation|formula|calculate|compute',
+    'analytical': r'analyze|breakdown|structure|pattern|relationship'
+}
+
+# Categories that route a query through symbolic processing
+SYMBOLIC_CATEGORIES: Tuple[str, ...] = ('definition', 'logical', 'symbolic', 'philosophical', 'analytical')
+
+CLASSIFICATION_CACHE_SIZE = 4096
+
+# Zero-width lookahead so overlapping keywords ("symbologic") are all seen in one scan;
+# the leading character class lets the engine skip positions that cannot start a keyword.
+_FIRST_CHARS = ''.join(sorted({kw[0] for p in SYMBOLIC_PATTERNS.values() for kw in p.split('|')}))
+_COMBINED_PATTERN = re.compile(
+    f'(?=[{re.escape(_FIRST_CHARS)}])(?='
+    + '|'.join(f'(?P<{category}>{pattern})' for category, pattern in SYMBOLIC_PATTERNS.items())
+    + ')',
+    re.IGNORECASE
+)
+_CATEGORY_ORDER = {category: i for i, category in enumerate(SYMBOLIC_PATTERNS)}
+
+
+@lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)
+def _classify(query: str) -> Tuple[str, ...]:
+    found = set()
+    for match in _COMBINED_PATTERN.finditer(query):
+        found.add(match.lastgroup)
+        if len(found) == len(SYMBOLIC_PATTERNS):
+            break
+    if not found:
+        return ('general',)
+    return tuple(sorted(found, key=_CATEGORY_ORDER.__getitem__))
+
+
+def classify_query(query: str) -> List[str]:
+    """Classify the query into symbolic logic categories (['general'] if none match)"""
+    return list(_classify(query))
+
+
+def is_symbolic(categories: Sequence[str]) -> bool:
+    """Whether already-computed categories call for symbolic processing"""
+    return any(cat in SYMBOLIC_CATEGORIES for cat in categories)
+
+
+def symbolic_confidence(categories: Sequence[str]) -> float:
+    """Fraction of symbolic categories matched by the query"""
+    return sum(1 for cat in categories if cat in SYMBOLIC_CATEGORIES) / len(SYMBOLIC_CATEGORIES)
+
+
+def cache_info():
+    """LRU statistics of the classification cache"""
+    return _classify.cache_info()
+
+
+def clear_cache():
+    """Drop all memoized classifications"""
+    _classify.cache_clear()
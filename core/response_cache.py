@@ -0,0 +1,176 @@
+"""
+Response Cache - exact-match, context-aware cache for Codex Core model calls.
+
+Responses are keyed on a hash of (enhanced prompt, context window, model kwargs),
+evicted by TTL and LRU size, and optionally persisted to SQLite so repeated
+symbolic queries survive restarts. Only calls that ask for deterministic output
+(temperature 0 or a fixed seed) are cached; error and empty responses never are.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 24 * 3600
+# "[Codex Core Error] ...", "Error: ..." and the like, as returned by the model wrappers
+_ERROR_RESPONSE = re.compile(r'\s*(\[[^\]]*error[^\]]*\]|error\b)', re.IGNORECASE)
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache of model responses with optional on-disk persistence"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 persist_path: Optional[str] = None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (response, stored_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats_counters = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0, 'expirations': 0}
+        if persist_path:
+            self._open_persistent_store(persist_path)
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache from CODEX_RESPONSE_CACHE_SIZE / _TTL / _PATH environment variables"""
+        return cls(
+            max_entries=int(os.environ.get('CODEX_RESPONSE_CACHE_SIZE', DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.environ.get('CODEX_RESPONSE_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+            persist_path=os.environ.get('CODEX_RESPONSE_CACHE_PATH') or None
+        )
+
+    # --- Keys and cacheability ---
+
+    @staticmethod
+    def make_key(prompt: str, context: Optional[List[Dict[str, Any]]], model_kwargs: Dict[str, Any]) -> str:
+        """Stable hash of everything that determines the model output"""
+        material = json.dumps(
+            {'prompt': prompt, 'context': context or [], 'kwargs': model_kwargs},
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(model_kwargs: Dict[str, Any]) -> bool:
+        """
+        Whether a call with these kwargs is deterministic enough to cache.
+
+        Only an explicit temperature of 0 or a fixed seed qualifies: an unset
+        temperature samples at the server default. Streaming always bypasses the
+        cache. Options may be given flat or in an Ollama-style 'options' dict.
+        """
+        options = {**(model_kwargs.get('options') or {}), **model_kwargs}
+        if options.get('stream'):
+            return False
+        if options.get('seed') is not None:
+            return True
+        temperature = options.get('temperature')
+        return temperature is not None and float(temperature) == 0
+
+    @staticmethod
+    def is_storable(response: Any) -> bool:
+        """Whether a response is worth caching (not empty, not an error message)"""
+        return isinstance(response, str) and bool(response.strip()) and not _ERROR_RESPONSE.match(response)
+
+    # --- Lookup and storage ---
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.stats_counters['misses'] += 1
+                return None
+            response, stored_at = item
+            if self._expired(stored_at):
+                self._remove(key)
+                self.stats_counters['expirations'] += 1
+                self.stats_counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats_counters['hits'] += 1
+            return response
+
+    def set(self, key: str, response: str):
+        if not self.is_storable(response):
+            return
+        with self._lock:
+            stored_at = self._clock()
+            self._entries[key] = (response, stored_at)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO response_cache (key, response, stored_at) VALUES (?, ?, ?)',
+                                 (key, response, stored_at))
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats_counters['evictions'] += 1
+            if self._db is not None:
+                self._db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats_counters['bypassed'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM response_cache')
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats_counters['hits'] + self.stats_counters['misses']
+            return {
+                **self.stats_counters,
+                'entries': len(self._entries),
+                'hit_rate': self.stats_counters['hits'] / lookups if lookups else 0.0,
+                'persistent': self._db is not None
+            }
+
+    # --- Internals ---
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+
+    def _open_persistent_store(self, path: str):
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('''CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_stored_at ON response_cache (stored_at)')
+            if self.ttl_seconds is not None:
+                self._db.execute('DELETE FROM response_cache WHERE stored_at < ?', (self._clock() - self.ttl_seconds,))
+            rows = self._db.execute(
+                'SELECT key, response, stored_at FROM response_cache ORDER BY stored_at DESC LIMIT ?',
+                (self.max_entries,)
+            ).fetchall()
+            for key, response, stored_at in reversed(rows):
+                self._entries[key] = (response, stored_at)
+            if len(rows) == self.max_entries:
+                self._db.execute('DELETE FROM response_cache WHERE stored_at < ?', (rows[-1][2],))
+            self._db.commit()
+            logger.info(f"Response cache loaded {len(rows)} entries from {path}")
+        except sqlite3.Error as e:
+            logger.error(f"Response cache persistence unavailable ({path}): {e}")
+            self._db = None
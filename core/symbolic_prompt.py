@@ -0,0 +1,59 @@
+"""
+Symbolic Prompt - prefix-cache-friendly assembly of symbolic processing prompts.
+
+Local inference servers reuse the KV cache of the longest prompt prefix they have
+already processed. Every symbolic prompt is therefore laid out as a stable prefix
+(mode header, category instructions in canonical order, response schema) that is
+identical for every query of the same categories, followed by the variable
+content. The prefix for each category combination is built once and memoized.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+MODE_HEADER = "[SYMBOLIC PROCESSING MODE]\n\n"
+
+# Category -> instruction, in canonical order (same order as query_classifier.SYMBOLIC_PATTERNS)
+SYMBOLIC_INSTRUCTIONS: Dict[str, str] = {
+    'definition': "Provide a clear, structured definition with symbolic components:",
+    'logical': "Apply logical reasoning and symbolic logic principles:",
+    'symbolic': "Consider symbolic representations and cognitive patterns:",
+    'philosophical': "Analyze from philosophical and ethical perspectives:",
+    'analytical': "Break down into structural components and relationships:"
+}
+
+RESPONSE_SCHEMA = (
+    "Respond with structured symbolic analysis including:\n"
+    "1. Core definition/concept\n"
+    "2. Symbolic representations\n"
+    "3. Logical relationships\n"
+    "4. Contextual applications\n"
+)
+
+_CANONICAL_ORDER = {category: i for i, category in enumerate(SYMBOLIC_INSTRUCTIONS)}
+
+
+def canonical_categories(categories: Iterable[str]) -> Tuple[str, ...]:
+    """Categories that carry instructions, deduplicated and in canonical order"""
+    return tuple(sorted({c for c in categories if c in SYMBOLIC_INSTRUCTIONS}, key=_CANONICAL_ORDER.__getitem__))
+
+
+@lru_cache(maxsize=64)
+def _prefix(categories: Tuple[str, ...]) -> str:
+    instructions = "".join(f"{SYMBOLIC_INSTRUCTIONS[c]}\n" for c in categories)
+    return f"{MODE_HEADER}{instructions}\n{RESPONSE_SCHEMA}\n"
+
+
+def symbolic_prefix(categories: Iterable[str]) -> str:
+    """Stable instruction prefix shared by every query with these categories"""
+    return _prefix(canonical_categories(categories))
+
+
+def build_symbolic_prompt(query: str, categories: Iterable[str]) -> str:
+    """Stable prefix first, variable query last"""
+    return f"{symbolic_prefix(categories)}Query: {query}\n"
+
+
+def prefix_cache_info():
+    """LRU statistics of the memoized prefixes"""
+    return _prefix.cache_info()
@@ -0,0 +1,103 @@
+import asyncio
+import importlib
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def codex(monkeypatch):
+    """core.codex_core imported with its missing model and pre-processor modules stubbed"""
+    calls = []
+    mistral = types.ModuleType("mistral_interface")
+    mistral.run_mistral = lambda prompt, **kwargs: calls.append(("direct", prompt, None)) or f"reply {len(calls)}"
+    mistral.run_mistral_with_context = (
+        lambda prompt, context, **kwargs: calls.append(("direct", prompt, context)) or f"reply {len(calls)}")
+    preprocessor = types.ModuleType("prompt_preprocessor")
+    preprocessor.enhance_prompt = (
+        lambda prompt, include_memories=False, **levels: calls.append(("enhance", prompt, levels))
+        or f"[{'full' if levels['include_glyphs'] else 'basic'}] {prompt}")
+    preprocessor.proprime_preprocessor = types.SimpleNamespace(
+        add_legacy_memory=lambda *args: None, get_processing_stats=lambda: {})
+    monkeypatch.setitem(sys.modules, "mistral_interface", mistral)
+    monkeypatch.setitem(sys.modules, "prompt_preprocessor", preprocessor)
+    monkeypatch.delenv("CODEX_BATCH_MAX_SIZE", raising=False)
+    sys.modules.pop("core.codex_core", None)
+    try:
+        yield importlib.import_module("core.codex_core"), calls
+    finally:
+        sys.modules.pop("core.codex_core", None)
+
+
+def _kinds(calls, kind):
+    return [call for call in calls if call[0] == kind]
+
+
+def test_enhancement_is_cached_per_query_level_and_memory_generation(codex):
+    module, calls = codex
+    core = module.CodexCore(response_cache=module.ResponseCache())
+
+    first = core._enhance("What does the glyph mean?", "full")
+    assert core._enhance("What does the glyph mean?", "full") == first
+    assert len(_kinds(calls, "enhance")) == 1
+    assert core._enhance("What does the glyph mean?", "basic").startswith("[basic]")
+    assert core._enhance("Another query", "full").startswith("[full]")
+    assert len(_kinds(calls, "enhance")) == 3
+
+    core.add_legacy_memory("The glyph of the river means renewal", tags=["glyph"])
+    refreshed = core._enhance("What does the glyph mean?", "full")
+    assert len(_kinds(calls, "enhance")) == 4                   # the memory index moved on
+    assert refreshed != first and "river means renewal" in refreshed
+    assert core._enhance("What does the glyph mean?", "full") == refreshed
+    assert len(_kinds(calls, "enhance")) == 4
+
+
+def test_generate_uses_the_batcher_when_configured_and_caches_deterministic_calls(codex):
+    module, calls = codex
+    direct = module.CodexCore(response_cache=module.ResponseCache(), batcher=None)
+    assert direct.run_llama("Tell me a joke", temperature=0) == "reply 2"
+    assert direct.run_llama("Tell me a joke", temperature=0, use_context=False) == "reply 2"   # cached
+    assert len(_kinds(calls, "direct")) == 1
+    assert direct.run_llama("Tell me a joke", temperature=0) == "reply 3"   # now with context
+    assert [call[2] is None for call in _kinds(calls, "direct")] == [True, False]
+    direct.run_llama("Tell me a joke", use_context=False)       # sampling: never cached
+    direct.run_llama("Tell me a joke", use_context=False)
+    assert len(_kinds(calls, "direct")) == 4
+
+    batched = []
+
+    class Batcher:
+        def generate(self, prompt, context=None, **kwargs):
+            batched.append((prompt, context, kwargs))
+            return "batched reply"
+
+        def stats(self):
+            return {}
+
+    core = module.CodexCore(response_cache=module.ResponseCache(), batcher=Batcher())
+    before = len(_kinds(calls, "direct"))
+    assert core.run_llama("Tell me a joke", num_predict=8) == "batched reply"
+    assert core.run_llama("And another", num_predict=8) == "batched reply"
+    assert len(_kinds(calls, "direct")) == before
+    assert batched[0][1] is None and batched[1][1] == core.router.context.messages()[:2]
+    assert batched[0][2] == {"num_predict": 8}
+
+
+def test_async_generation_shares_the_response_cache(codex):
+    module, calls = codex
+    core = module.CodexCore(response_cache=module.ResponseCache())
+    generated = []
+
+    class Client:
+        async def generate(self, prompt, context=None, timeout=None, **kwargs):
+            generated.append(prompt)
+            return f"async {len(generated)}"
+
+    async def ask():
+        return await core.arun_llama("Define glyph", use_context=False, client=Client(), temperature=0)
+
+    assert asyncio.run(ask()) == "async 1"
+    assert asyncio.run(ask()) == "async 1" and len(generated) == 1
+    core.add_legacy_memory("Define glyph: a carved symbol")       # new enhanced prompt, new cache key
+    assert asyncio.run(ask()) == "async 2"
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.helix import codex_routes
+from core.local_model_client import LocalModelClient, LocalModelError
+
+
+class _StubClient(LocalModelClient):
+    """LocalModelClient answering from canned upstream lines instead of an Ollama server"""
+
+    def __init__(self, lines):
+        super().__init__(base_url="http://stub")
+        self.lines = lines
+        self.calls = []
+
+    async def generate(self, prompt, model=None, context=None, timeout=None, **options):
+        self.calls.append(("generate", prompt, model, timeout))
+        if prompt == "fail":
+            raise LocalModelError("connection refused")
+        return f"echo:{prompt}"
+
+    async def stream(self, prompt, model=None, context=None, timeout=None, **options):
+        self.calls.append(("stream", prompt, model, timeout))
+
+        async def upstream():
+            for line in self.lines:
+                yield line
+
+        async for token in self._iter_tokens(upstream()):
+            yield token
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    lines = [json.dumps({"response": "sym", "done": False}).encode() + b"\n", b"\n",
+             json.dumps({"response": "bol", "done": False}).encode() + b"\n",
+             json.dumps({"response": "", "done": True}).encode() + b"\n"]
+    client = _StubClient(lines)
+    monkeypatch.setattr(codex_routes, "get_local_model_client", lambda: client)
+    app = FastAPI()
+    app.include_router(codex_routes.router)
+    return client, TestClient(app)
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+def test_query_returns_json(stub):
+    client, http = stub
+    response = http.post("/codex/query", json={"prompt": "Define glyph", "model": "mistral", "timeout": 5})
+    assert response.status_code == 200 and response.json() == {"response": "echo:Define glyph"}
+    assert client.calls == [("generate", "Define glyph", "mistral", 5.0)]
+
+    assert http.post("/codex/query", json={}).status_code == 400
+    failed = http.post("/codex/query", json={"prompt": "fail"})
+    assert failed.status_code == 500 and "connection refused" in failed.json()["error"]
+
+
+def test_query_streams_tokens_as_sse(stub):
+    client, http = stub
+    response = http.post("/codex/query", json={"prompt": "Define glyph", "stream": True})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response.text) == [("message", {"token": "sym"}), ("message", {"token": "bol"}),
+                                      ("done", {})]
+
+
+def test_malformed_upstream_line_ends_the_stream_with_an_error_event(stub):
+    client, http = stub
+    client.lines[2] = b'{"response": "bo\n'                  # cut off mid-chunk
+    events = _events(http.post("/codex/query", json={"prompt": "Define glyph", "stream": True}).text)
+    assert events[0] == ("message", {"token": "sym"})
+    assert events[-1][0] == "error" and "Malformed chunk" in events[-1][1]["error"]
+    assert len(events) == 2
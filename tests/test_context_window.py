@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from core.context_window import (
+    DIGEST_HEADER, ConversationContextStore, TokenBudgetContext, count_tokens
+)
+
+
+def test_token_count_is_incremental_and_exact_after_eviction():
+    ctx = TokenBudgetContext(max_tokens=10_000, summarize_evicted=False)
+    ctx.add_turn("What is a glyph?", "A glyph is a symbol.")
+    assert ctx.total_tokens == count_tokens("What is a glyph?") + count_tokens("A glyph is a symbol.")
+
+    ctx.max_tokens = count_tokens("short") + count_tokens("reply")
+    ctx.add_turn("short", "reply")
+    assert [m['content'] for m in ctx.messages()] == ["short", "reply"]
+    assert ctx.total_tokens == ctx.max_tokens
+    assert ctx.evicted_messages == 2
+
+
+def test_long_answers_evict_oldest_turns_into_bounded_digest():
+    long_answer = "Symbolic cognition maps meaning onto structure. " + "word " * 300
+    ctx = TokenBudgetContext(max_tokens=400, digest_max_tokens=60)
+    for i in range(5):
+        ctx.add_turn(f"question {i}", long_answer)
+
+    messages = ctx.messages()
+    assert ctx.total_tokens <= 400
+    assert messages[0]['role'] == 'system' and messages[0]['content'].startswith(DIGEST_HEADER)
+    assert "Symbolic cognition maps meaning onto structure." in messages[0]['content']
+    assert messages[-2:] == [{'role': 'user', 'content': 'question 4'},
+                             {'role': 'assistant', 'content': long_answer}]
+    assert ctx.stats()['digest_tokens'] <= 60
+
+
+def test_message_cap_and_round_trip_through_replace():
+    ctx = TokenBudgetContext(max_tokens=10_000, max_messages=4)
+    for i in range(4):
+        ctx.add_turn(f"q{i}", f"a{i}")
+    exported = ctx.messages()
+    assert [m['content'] for m in exported[1:]] == ["q2", "a2", "q3", "a3"]
+
+    restored = TokenBudgetContext(max_tokens=10_000, max_messages=4)
+    restored.replace(exported)
+    assert restored.messages() == exported
+
+    restored.clear()
+    assert not restored and restored.total_tokens == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_conversations_are_isolated_under_concurrency():
+    store = ConversationContextStore(factory=lambda: TokenBudgetContext(max_tokens=100_000))
+
+    def chat(conversation_id):
+        for i in range(50):
+            store.get(conversation_id).add_turn(f"{conversation_id} q{i}", f"{conversation_id} a{i}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(chat, [f"user-{n}" for n in range(8)]))
+
+    assert len(store) == 8
+    for n in range(8):
+        messages = store.get(f"user-{n}").messages()
+        assert len(messages) == 100
+        assert all(m['content'].startswith(f"user-{n} ") for m in messages)
+        assert [m['role'] for m in messages[:2]] == ['user', 'assistant']
+
+
+def test_idle_and_lru_eviction():
+    clock = FakeClock()
+    store = ConversationContextStore(factory=TokenBudgetContext, idle_ttl_seconds=60,
+                                     max_conversations=2, clock=clock)
+    store.get('a').add_turn("q", "a")
+    clock.now = 30
+    store.get('b')
+    clock.now = 70                      # 'a' idle for 70s, 'b' for 40s
+    assert store.evict_idle() == 1
+    assert 'a' not in store and 'b' in store
+
+    store.get('c')
+    store.get('d')                      # over capacity: least recently used 'b' goes
+    assert store.conversation_ids() == ['c', 'd']
+    assert store.get('a').messages() == []
+    assert store.stats()['evicted_conversations'] == 3
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from core.helix import consolidate
+from cali.vault.storage import cali_vault_storage as storage
+
+
+class _Stub:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _Archive:
+    logs = []
+
+    def log(self, message, actor="Unknown"):
+        self.logs.append((actor, message))
+
+
+@pytest.fixture
+def vault_dir(tmp_path, monkeypatch):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path / "vault")
+    monkeypatch.setattr(consolidate, "RECONCILED_DIR", tmp_path / "reconciled")
+    for name in ("PrometheusCodex", "CodexBridge", "CaleonPrime"):
+        monkeypatch.setattr(consolidate, name, _Stub)
+    monkeypatch.setattr(_Archive, "logs", [])
+    monkeypatch.setattr(consolidate, "WhisperingArchive", _Archive)
+    try:
+        yield tmp_path
+    finally:
+        storage.set_vault_dir(previous)
+
+
+def test_consolidate_session_streams_the_vault_and_archives_the_entries_path(vault_dir):
+    entries = [{"id": i % 30, "text": f"echo {i}"} for i in range(100)]
+    assert storage.save_memory_vault("v", {"category": "legacy", "entries": entries,
+                                           "reconciled": {"stale": True}})
+
+    summary = consolidate.consolidate_session("v")
+
+    path = vault_dir / "reconciled" / "v.json"
+    reconciled = json.loads(path.read_text())
+    assert [e["id"] for e in reconciled] == list(range(30)) and reconciled[0]["text"] == "echo 90"
+    assert summary["synthesized_count"] == 30 and summary["entries"] == reconciled[:10]
+    assert _Archive.logs == [("CaleonPrime", str(path))]          # the location, not the entries
+
+    vault = storage.load_memory_vault("v")
+    assert vault["entries"] == entries and vault["category"] == "legacy"
+    assert vault["reconciled"] == summary
+
+
+def test_consolidate_session_skips_missing_and_empty_vaults(vault_dir):
+    assert consolidate.consolidate_session("missing") is None
+    assert storage.save_memory_vault("empty", {"entries": []})
+    assert consolidate.consolidate_session("empty") is None
+    assert not (vault_dir / "reconciled" / "empty.json").exists() and _Archive.logs == []
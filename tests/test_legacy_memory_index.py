@@ -0,0 +1,55 @@
+import math
+import random
+
+from core.legacy_memory_index import LegacyMemoryIndex, tokenize
+
+
+def brute_force(index, memories, query, top_k, tags=None):
+    terms = set(tokenize(query))
+    docs = [tokenize(content) for content, _, _ in memories]
+    avg_length = sum(map(len, docs)) / len(docs)
+    scored = []
+    for memory_id, (doc, (_, importance, memory_tags)) in enumerate(zip(docs, memories)):
+        if tags and not set(tags) & set(memory_tags):
+            continue
+        score = 0.0
+        for term in terms:
+            tf = doc.count(term)
+            if not tf:
+                continue
+            df = sum(1 for d in docs if term in d)
+            idf = math.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * len(doc) / avg_length))
+        if score > 0:
+            scored.append((score * importance, memory_id))
+    return sorted(scored, reverse=True)[:top_k]
+
+
+def test_matches_brute_force_bm25_with_importance_and_tags():
+    rng = random.Random(3)
+    vocabulary = ["glyph", "mirror", "resonance", "ethics", "memory", "vault", "echo", "seed", "dream", "logic"]
+    memories = [(" ".join(rng.choices(vocabulary, k=rng.randint(3, 12))), rng.uniform(0.1, 2.0),
+                 [rng.choice(["mirror", "vault"])]) for _ in range(400)]
+    index = LegacyMemoryIndex()
+    for content, importance, tags in memories:
+        index.add(content, importance, tags)
+
+    for query, tags in (("mirror resonance ethics", None), ("glyph", None),
+                        ("dream logic seed echo", ['vault']), ("memory of the vault", ['mirror'])):
+        expected = brute_force(index, memories, query, 5, tags)
+        got = index.search(query, top_k=5, tags=tags)
+        assert [m['id'] for _, m in got] == [m for _, m in expected], query
+        assert all(math.isclose(a, b) for (a, _), (b, _) in zip(got, expected))
+
+
+def test_generation_tracks_additions_and_new_postings_are_searchable():
+    index = LegacyMemoryIndex()
+    index.add("The mirror remembers", tags=["mirror"])
+    assert index.search("mirror")[0][1]['content'] == "The mirror remembers"
+    generation = index.generation
+
+    index.add("A brighter mirror memory", importance=5.0)
+    assert index.generation == generation + 1
+    assert index.search("mirror")[0][1]['content'] == "A brighter mirror memory"
+    assert index.search("mirror", tags=["dream"]) == []
+    assert "Relevant legacy memories:" in index.format_memories(index.search("mirror"))
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from core.local_model_client import LocalModelClient, LocalModelError
+
+
+async def _stub_server(handler_log):
+    """Minimal stand-in for Ollama's /api/generate and /api/chat."""
+
+    async def generate(request):
+        body = await request.json()
+        handler_log.append(("generate", body))
+        if not body["stream"]:
+            return web.json_response({"response": f"echo:{body['prompt']}", "done": True})
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in ["sym", "bol", "ic"]:
+            await response.write(json.dumps({"response": token, "done": False}).encode() + b"\n")
+            await asyncio.sleep(0.01)
+        await response.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        return response
+
+    async def chat(request):
+        body = await request.json()
+        handler_log.append(("chat", body))
+        return web.json_response({"message": {"role": "assistant", "content": "with context"}, "done": True})
+
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({"response": "late"})
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/chat", chat)
+    app.router.add_post("/slow/api/generate", slow)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_generate_stream_and_chat_against_stub():
+    async def main():
+        log = []
+        runner, url = await _stub_server(log)
+        client = LocalModelClient(base_url=url)
+        try:
+            whole = await client.generate("Define glyph", temperature=0, keep_alive="5m")
+            tokens = [t async for t in client.stream("Define glyph")]
+            chatted = await client.generate("and now?", context=[{"role": "user", "content": "hi"}])
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return log, whole, tokens, chatted
+
+    log, whole, tokens, chatted = asyncio.run(main())
+    assert whole == "echo:Define glyph"
+    assert tokens == ["sym", "bol", "ic"]
+    assert chatted == "with context"
+    first_request = log[0][1]
+    assert first_request["options"] == {"temperature": 0} and first_request["keep_alive"] == "5m"
+    assert log[-1][1]["messages"][-1] == {"role": "user", "content": "and now?"}
+
+
+def test_per_request_timeout():
+    async def main():
+        runner, url = await _stub_server([])
+        client = LocalModelClient(base_url=url + "/slow")
+        try:
+            with pytest.raises(LocalModelError):
+                await client.generate("x", timeout=0.1)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import time
+
+from core.mirror import event_store
+from core.mirror.event_store import MirrorEventStore
+from core.mirror.protocol import Caleon, MirrorEvent
+
+
+def _event(event_type, action=None, ts=None, text="hello"):
+    return MirrorEvent(event_type, text, {"state": "idle"}, None, timestamp=ts, response_action=action)
+
+
+def _stored(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM mirror_events").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_query_filters_by_action_and_time():
+    store = MirrorEventStore(":memory:")
+    now = time.time()
+    store.append_many([
+        _event("Ask_Clarify", "ask_clarify", now - 7200),
+        _event("Ask_Clarify", "ask_clarify", now - 60),
+        _event("Soft_Echo_Emitted", "soft_echo", now - 30),
+    ])
+
+    recent = store.recent_decisions("ask_clarify", window_seconds=3600)
+    assert [e["timestamp"] for e in recent] == [now - 60]
+    assert store.count(response_action="ask_clarify") == 2
+
+
+def test_keyset_pagination_covers_every_event_once():
+    store = MirrorEventStore(":memory:")
+    base = time.time()
+    events = [_event("Receive", ts=base + (i // 3)) for i in range(25)]  # repeated timestamps
+    store.append_many(events)
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(event_type="Receive", limit=7, cursor=cursor)
+        seen.extend(e["id"] for e in page["events"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(e.id for e in events)
+    assert len(seen) == len(set(seen))
+
+
+def test_caleon_trims_memory_but_keeps_audit_trail(tmp_path, monkeypatch):
+    path = tmp_path / "events" / "mirror_events.db"
+    monkeypatch.setattr(event_store, "DEFAULT_DB_PATH", str(path))
+    caleon = Caleon(max_event_log=5)
+    caleon.handle_input("I had to lie to my friend about something important.")
+    caleon.handle_input("I'm feeling quite sad about something that happened.")
+
+    assert len(caleon.event_log) == 5
+    assert caleon.event_store.count() > 5
+    page = caleon.query_events(response_action="ask_clarify", event_type="Ask_Clarify")
+    assert len(page["events"]) == 1
+    total = caleon.event_store.count()
+    caleon.event_store.close()
+    assert MirrorEventStore(str(path)).count() == total     # persisted by default
+
+
+def test_appends_are_buffered_and_written_in_batches(tmp_path):
+    path = tmp_path / "mirror_events.db"
+    store = MirrorEventStore(str(path), flush_interval=60, batch_size=3)
+    store.append(_event("Receive"))
+    store.append(_event("Receive"))
+    assert _stored(path) == 0      # not on the caller's path
+
+    store.append(_event("Receive"))                         # a full batch wakes the flusher
+    deadline = time.time() + 5
+    while _stored(path) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert _stored(path) == 3
+
+    store.append(_event("Receive"))
+    assert store.count() == 4                               # queries see everything appended
+    store.close()
+    assert os.path.isabs(event_store.DEFAULT_DB_PATH)
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import time
+
+from core.mirror.event_store import MirrorEventStore
+from core.mirror.protocol import Caleon
+from core.mirror.stream import stream_reflection
+
+
+async def _collect(caleon, text, fmt):
+    return [chunk async for chunk in stream_reflection(caleon, text, fmt=fmt)]
+
+
+def test_ndjson_stream_emits_each_stage_then_reply():
+    chunks = asyncio.run(_collect(Caleon(MirrorEventStore(":memory:")), "I'm feeling quite sad about something", "ndjson"))
+    kinds = [json.loads(c)["event"] for c in chunks]
+
+    assert kinds[:4] == ["Invocation", "Receive", "Resonate", "Threshold_Decision"]
+    assert kinds[-1] == "reply"
+    assert json.loads(chunks[-1])["data"]["response"]
+
+
+def test_sse_chunks_are_framed_events():
+    chunks = asyncio.run(_collect(Caleon(MirrorEventStore(":memory:")), "The sky is blue today.", "sse"))
+
+    assert all(c.endswith("\n\n") for c in chunks)
+    assert chunks[0].split("\n")[1] == "event: Invocation"
+    assert "event: Hold_Space" in "".join(chunks)
+
+
+def test_concurrent_streams_get_their_own_state():
+    inputs = {"The sky is blue today.": "mirror_esp",
+              "I'm feeling quite sad about something": "mirror_soft_echo",
+              "What time is it?": "standard_engagement",
+              "I had to lie to my friend about something important.": "mirror_clarify"}
+    class SlowCaleon(Caleon):
+        def _record_event(self, event):
+            super()._record_event(event)
+            time.sleep(0.002)                               # lets other requests' threads interleave
+
+    caleon = SlowCaleon(MirrorEventStore(":memory:"))
+
+    async def scenario():
+        texts = list(inputs) * 5
+        return texts, await asyncio.gather(*[_collect(caleon, text, "ndjson") for text in texts])
+
+    texts, streams = asyncio.run(scenario())
+    for text, chunks in zip(texts, streams):
+        assert json.loads(chunks[-1])["data"]["state"] == inputs[text]
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.prompt_batcher import PromptBatcher
+
+
+def test_concurrent_prompts_are_batched_and_fanned_back():
+    batch_sizes = []
+
+    def batch_fn(items, **kwargs):
+        batch_sizes.append(len(items))
+        return [f"{prompt}|{kwargs.get('num_predict')}" for prompt, _ in items]
+
+    batcher = PromptBatcher(generate_fn=lambda p, c, **kw: f"single:{p}", batch_fn=batch_fn,
+                            max_batch_size=4, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: batcher.generate(f"q{i}", num_predict=16), range(8)))
+    finally:
+        batcher.close()
+
+    assert results == [f"q{i}|16" for i in range(8)]
+    assert max(batch_sizes) > 1 and sum(batch_sizes) == 8
+    stats = batcher.stats()
+    assert stats['completed'] == 8 and stats['native_batches'] >= 1
+    assert stats['avg_batch_size'] > 1
+
+
+def test_fallback_fans_out_concurrently_and_isolates_failures():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def generate_fn(prompt, context, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        if prompt == "bad":
+            raise ValueError("model refused")
+        return prompt.upper()
+
+    batcher = PromptBatcher(generate_fn, max_batch_size=4, max_wait_ms=30)
+    try:
+        futures = [batcher.submit(p) for p in ["a", "bad", "c", "d"]]
+        outcomes = []
+        for f in futures:
+            try:
+                outcomes.append(f.result(timeout=2))
+            except ValueError:
+                outcomes.append("error")
+    finally:
+        batcher.close()
+
+    assert outcomes == ["A", "error", "C", "D"]
+    assert peak[0] > 1
+
+
+def test_different_model_parameters_never_share_a_batch():
+    seen = []
+
+    def batch_fn(items, **kwargs):
+        seen.append((len(items), kwargs.get('temperature')))
+        return ["ok"] * len(items)
+
+    batcher = PromptBatcher(lambda p, c, **kw: "ok", batch_fn=batch_fn, max_batch_size=8, max_wait_ms=30)
+    try:
+        futures = [batcher.submit("x", temperature=t) for t in (0, 0.5, 0, 0.5)]
+        assert [f.result(timeout=2) for f in futures] == ["ok"] * 4
+    finally:
+        batcher.close()
+
+    assert sorted(seen) == [(2, 0), (2, 0.5)]
+
+
+def test_timeout_option_reaches_the_model_and_closed_batcher_rejects_submits():
+    seen = []
+    batcher = PromptBatcher(lambda prompt, context, **kwargs: seen.append(kwargs) or prompt, max_wait_ms=1)
+    assert batcher.generate("x", timeout=30, wait_timeout=5) == "x"
+    assert seen == [{'timeout': 30}]
+
+    accepted, stop = [], threading.Event()
+
+    def submitter():
+        while not stop.is_set():
+            try:
+                accepted.append(batcher.submit("y"))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submitter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.01)
+    batcher.close()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # Every accepted prompt was queued before the close sentinel, so none is left waiting
+    assert all(future.result(timeout=1) == "y" for future in accepted)
+    with pytest.raises(RuntimeError):
+        batcher.submit("z")
@@ -0,0 +1,36 @@
+import random
+import re
+
+from core import query_classifier
+from core.query_classifier import SYMBOLIC_PATTERNS, classify_query, is_symbolic
+
+
+def legacy_classify(query):
+    categories = [c for c, p in SYMBOLIC_PATTERNS.items() if re.search(p, query, re.IGNORECASE)]
+    return categories if categories else ['general']
+
+
+def test_single_pass_matches_per_pattern_search():
+    keywords = [kw for p in SYMBOLIC_PATTERNS.values() for kw in p.split('|')]
+    rng = random.Random(7)
+    queries = ["Tell me a joke", "", "SYMBOLOGIC structures", "whatIS mathematics",
+               "metaphoreasoning", "semanticompute", "Define ETHICS of a theorem"]
+    for _ in range(500):
+        parts = rng.sample(keywords, rng.randint(0, 4)) + ["the", "a", "x"]
+        rng.shuffle(parts)
+        queries.append(rng.choice(["", " "]).join(p.upper() if rng.random() < 0.3 else p for p in parts))
+
+    for query in queries:
+        query_classifier.clear_cache()
+        assert classify_query(query) == legacy_classify(query), query
+
+
+def test_results_are_cached_and_not_shared_mutably():
+    query_classifier.clear_cache()
+    first = classify_query("Define symbolic cognition")
+    first.append("tampered")
+    second = classify_query("Define symbolic cognition")
+
+    assert second == ['definition', 'symbolic']
+    assert query_classifier.cache_info().hits == 1
+    assert is_symbolic(second) and not is_symbolic(['mathematical', 'general'])
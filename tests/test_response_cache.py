@@ -0,0 +1,66 @@
+from core.response_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_covers_prompt_context_and_kwargs():
+    context = [{'role': 'user', 'content': 'hi'}]
+    key = ResponseCache.make_key("Define glyph", context, {'num_predict': 64})
+
+    assert key == ResponseCache.make_key("Define glyph", list(context), {'num_predict': 64})
+    assert key != ResponseCache.make_key("Define glyph", None, {'num_predict': 64})
+    assert key != ResponseCache.make_key("Define glyph", context, {'num_predict': 32})
+
+
+def test_nondeterministic_sampling_bypasses():
+    assert not ResponseCache.is_cacheable({})                 # server default temperature samples
+    assert ResponseCache.is_cacheable({'temperature': 0})
+    assert ResponseCache.is_cacheable({'seed': 7})
+    assert ResponseCache.is_cacheable({'options': {'temperature': 0.7, 'seed': 42}})
+    assert not ResponseCache.is_cacheable({'temperature': 0.7})
+    assert not ResponseCache.is_cacheable({'options': {'temperature': 0.2}})
+    assert not ResponseCache.is_cacheable({'stream': True})
+    assert not ResponseCache.is_cacheable({'temperature': 0, 'stream': True})
+
+
+def test_errors_and_empty_responses_are_not_stored():
+    cache = ResponseCache()
+    for response in ("[Codex Core Error] connection refused", "Error: model not found", "  ", None):
+        cache.set('k', response)
+        assert cache.get('k') is None
+    cache.set('k', 'Errors in the glyph are intentional')
+    assert cache.get('k') == 'Errors in the glyph are intentional'
+
+
+def test_ttl_and_lru_eviction():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, clock=clock)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'          # 'a' becomes most recent
+    cache.set('c', 'C')                   # evicts 'b'
+    assert cache.get('b') is None
+
+    clock.now += 61
+    assert cache.get('a') is None and cache.get('c') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['expirations'] == 2
+
+
+def test_persists_across_restarts(tmp_path):
+    path = str(tmp_path / 'responses.db')
+    clock = FakeClock()
+    first = ResponseCache(max_entries=10, ttl_seconds=60, persist_path=path, clock=clock)
+    first.set('k', 'symbolic definition')
+
+    second = ResponseCache(max_entries=10, ttl_seconds=60, persist_path=path, clock=clock)
+    assert second.get('k') == 'symbolic definition'
+
+    clock.now += 120
+    assert ResponseCache(max_entries=10, ttl_seconds=60, persist_path=path, clock=clock).get('k') is None
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from cali.sandbox import DataSandbox, SandboxError, sanitize_input
+from cali.sandbox.json_stream import (
+    JSONStreamError, StreamingBodyGuard, StreamingJSONSanitizer, sanitize_json_stream
+)
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_matches_parse_then_sanitize_at_every_chunk_size():
+    document = {
+        "title": "Mirror <b>notes</b>", "score": -12.5e-3, "count": 42, "ok": True, "none": None,
+        "keywords": ["glyph", "résonance ✨", "tab\tand \"quote\"", "😀 emoji"],
+        "nested": {"deeper": [[], {}, [1, 2, {"x": "data:y"}]]}
+    }
+    data = json.dumps(document).encode('utf-8')
+    expected = sanitize_input(json.loads(data))
+    for size in (1, 2, 3, 7, 64, len(data)):
+        assert sanitize_json_stream(chunked(data, size)) == expected
+
+
+def test_rejects_at_first_violating_bytes():
+    parser = StreamingJSONSanitizer(DataSandbox(max_string_length=100))
+    parser.feed(b'{"input": "' + b'a' * 60)
+    with pytest.raises(SandboxError, match="String too long"):
+        parser.feed(b'a' * 60)          # rejected before the string (or body) ends
+
+    parser = StreamingJSONSanitizer(DataSandbox(max_list_size=3))
+    with pytest.raises(SandboxError, match="List too long"):
+        parser.feed(b'[1, 2, 3, 4,')
+
+    with pytest.raises(SandboxError, match="dangerous"):
+        StreamingJSONSanitizer().feed(b'{"input": "eval(1)", ')
+
+
+def test_deep_nesting_and_malformed_input():
+    with pytest.raises(SandboxError, match="Nesting too deep"):
+        StreamingJSONSanitizer().feed(b'[' * 100_000)
+    for bad in (b'{"a" 1}', b'[1,]', b'{"a": tru}', b'"unterminated', b'[1] 2'):
+        with pytest.raises(JSONStreamError):
+            sanitize_json_stream([bad])
+
+
+def _call(app, body_chunks, headers=(), path='/api/reflect'):
+    messages = [{'type': 'http.request', 'body': c, 'more_body': i < len(body_chunks) - 1}
+                for i, c in enumerate(body_chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path,
+             'headers': [(b'content-type', b'application/json'), *headers]}
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+async def echo_app(scope, receive, send):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def test_guard_replays_accepted_bodies_and_rejects_violations():
+    guard = StreamingBodyGuard(echo_app, max_body_size=64, json_paths=['/api/reflect'],
+                               sandbox=DataSandbox(max_string_length=10, max_list_size=3))
+
+    sent = _call(guard, [b'{"input": ', b'"hello"}'])
+    assert sent[0]['status'] == 200 and sent[1]['body'] == b'{"input": "hello"}'
+
+    sent = _call(guard, [b'{"input": "import os"}'])
+    assert sent[0]['status'] == 200                      # contents are left to the handler's sanitizing
+
+    sent = _call(guard, [b'{"input": "much too long"}'])
+    assert sent[0]['status'] == 400 and b'String too long' in sent[1]['body']
+    assert _call(guard, [b'[1, 2, 3, 4]'])[0]['status'] == 400
+
+    sent = _call(guard, [b'{"input": "much too long"}'], path='/memory/add')
+    assert sent[0]['status'] == 200                      # path not guarded for content
+
+    sent = _call(guard, [b'"' + b'a' * 40, b'a' * 40 + b'"'], path='/memory/add')
+    assert sent[0]['status'] == 413 and len(sent) == 2   # streamed unbuffered, still size-limited
+
+    sent = _call(guard, [b'{"input": ' + b' ' * 40, b' ' * 40 + b'1}'])
+    assert sent[0]['status'] == 413
+
+    sent = _call(guard, [b'{}'], headers=[(b'content-length', b'1000')])
+    assert sent[0]['status'] == 413
+
+    sent = _call(guard, [b'{not json'])
+    assert sent[0]['status'] == 200                      # malformed JSON is left to the app
+
+
+def test_random_documents_round_trip():
+    rng = random.Random(5)
+    words = ["glyph", "mirror", "é", "\\", "\n", "x" * 20]
+    for _ in range(200):
+        doc = {f"k{i}": rng.choice([rng.choice(words), rng.randint(-10**12, 10**12), rng.random(),
+                                    [rng.choice(words) for _ in range(rng.randint(0, 4))]])
+               for i in range(rng.randint(0, 6))}
+        data = json.dumps(doc, ensure_ascii=rng.random() < 0.5).encode('utf-8')
+        assert sanitize_json_stream(chunked(data, rng.randint(1, 9))) == sanitize_input(json.loads(data))
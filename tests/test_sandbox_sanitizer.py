@@ -0,0 +1,44 @@
+import random
+import re
+
+import pytest
+
+from cali.sandbox import DANGEROUS_PATTERNS, CodeValidator, DataSandbox, SandboxError
+
+
+def legacy_sanitize(value, max_length=10000):
+    if len(value) > max_length:
+        raise SandboxError("too long")
+    for pattern in DANGEROUS_PATTERNS:
+        if re.search(pattern, value, re.IGNORECASE):
+            raise SandboxError("dangerous")
+    for char in ['<', '>', '"', "'", '&', 'javascript:', 'data:']:
+        if char in value:
+            value = value.replace(char, '')
+    return value.strip()
+
+
+FRAGMENTS = ["glyph", " ", "<", ">", "&", "'", '"', "java", "script", ":", "data", "DATA:", "eval (", "Exec(",
+             "import ", "from x import", "open(", "OS.", "sys", ".", "__init__", "_", "dir (", "vars(", "\n",
+             "subprocess", "globals", "(", "mirror", "JavaScript:", "dat<a:", "javascr&ipt:"]
+
+
+def test_single_pass_sanitizer_matches_legacy_behaviour():
+    rng = random.Random(11)
+    sandbox = DataSandbox()
+    for _ in range(5000):
+        value = "".join(rng.choices(FRAGMENTS, k=rng.randint(0, 8)))
+        try:
+            expected = legacy_sanitize(value)
+        except SandboxError:
+            with pytest.raises(SandboxError):
+                sandbox.sanitize_string(value)
+            assert not CodeValidator.validate_string(value)
+            continue
+        assert sandbox.sanitize_string(value) == expected, value
+
+
+def test_substrings_formed_by_character_removal_are_still_stripped():
+    sandbox = DataSandbox()
+    assert sandbox.sanitize_string("java<script:alert") == "alert"
+    assert sandbox.sanitize_string("da&ta:x JavaScript:y") == "x JavaScript:y"
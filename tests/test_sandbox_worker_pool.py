@@ -0,0 +1,49 @@
+import sys
+import time
+
+import pytest
+
+from cali.sandbox import ExecutionSandbox, SandboxError, code_cache_info
+from cali.sandbox.worker_pool import SandboxWorkerPool
+
+
+def test_validated_code_is_compiled_once():
+    sandbox = ExecutionSandbox()
+    before = code_cache_info()
+    assert sandbox.execute_safe("sum([x, 2, 3])", {'x': 1}) == 6
+    assert sandbox.execute_safe("sum([x, 2, 3])", {'x': 4}) == 9
+    after = code_cache_info()
+    assert after['misses'] == before['misses'] + 1 and after['hits'] == before['hits'] + 1
+
+    for _ in range(2):
+        with pytest.raises(SandboxError, match="not allowed"):
+            sandbox.execute_safe("__import__('os')")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SandboxWorkerPool(size=2, timeout=5.0, memory_limit_mb=128) as pool:
+        yield pool
+
+
+def test_pool_evaluates_and_batches(pool):
+    assert ExecutionSandbox(pool=pool).execute_safe("max(a, b)", {'a': 3, 'b': 7}) == 7
+    results = pool.map([f"{i} * 2" for i in range(10)] + ["1 / 0"], return_exceptions=True)
+    assert results[:10] == [i * 2 for i in range(10)]
+    assert isinstance(results[10], SandboxError)
+
+
+def test_timeout_kills_and_replaces_worker(pool):
+    started = time.perf_counter()
+    with pytest.raises(SandboxError, match="timed out"):
+        pool.submit("sum(range(10 ** 10))", timeout=0.5)
+    assert time.perf_counter() - started < 3
+    assert pool.map(["1 + 1", "2 + 2", "3 + 3"]) == [2, 4, 6]
+    assert pool.stats()['respawns'] >= 1
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="address-space limits are Linux-specific here")
+def test_memory_cap(pool):
+    with pytest.raises(SandboxError, match="memory"):
+        pool.submit("len(list(range(10 ** 8)))")
+    assert pool.submit("len('still alive')") == 11
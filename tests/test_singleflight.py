@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+
+from core.mirror.singleflight import SingleFlight, reflect_key
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    calls = []
+    lock = threading.Lock()
+
+    def slow_reflect(text):
+        with lock:
+            calls.append(text)
+        time.sleep(0.05)
+        return f"reflected: {text}"
+
+    async def main():
+        flight = SingleFlight()
+        key = reflect_key("  hello  ", "tab-1")
+        results = await asyncio.gather(*[flight.do(key, slow_reflect, "hello") for _ in range(5)])
+        other = await flight.do(reflect_key("hello", "tab-2"), slow_reflect, "hello")
+        return flight, results, other
+
+    flight, results, other = asyncio.run(main())
+
+    assert results == ["reflected: hello"] * 5
+    assert other == "reflected: hello"
+    assert len(calls) == 2
+    stats = flight.stats()
+    assert stats["executions"] == 2 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+    assert stats["saved_seconds"] > 0
+
+
+def test_failures_propagate_to_every_waiter():
+    def broken(_):
+        time.sleep(0.01)
+        raise RuntimeError("mirror cracked")
+
+    async def main():
+        flight = SingleFlight()
+        key = reflect_key("x")
+        return flight, await asyncio.gather(*[flight.do(key, broken, "x") for _ in range(3)],
+                                            return_exceptions=True)
+
+    flight, results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["failures"] == 1
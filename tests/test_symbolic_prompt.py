@@ -0,0 +1,17 @@
+from core.symbolic_prompt import RESPONSE_SCHEMA, build_symbolic_prompt, symbolic_prefix
+
+
+def test_prefix_is_stable_and_query_comes_last():
+    first = build_symbolic_prompt("Define glyph", ['definition', 'symbolic'])
+    second = build_symbolic_prompt("Define resonance", ['symbolic', 'definition', 'mathematical'])
+
+    prefix = symbolic_prefix(['definition', 'symbolic'])
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert RESPONSE_SCHEMA in prefix
+    assert first == prefix + "Query: Define glyph\n"
+    assert prefix.index("structured definition") < prefix.index("symbolic representations and cognitive")
+
+
+def test_general_queries_share_the_bare_prefix():
+    assert symbolic_prefix(['general']) == symbolic_prefix([])
+    assert "Query:" not in symbolic_prefix(['logical'])
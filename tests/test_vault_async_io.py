@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from cali.vault.storage import async_io
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage.async_io import VaultIOBusy, VaultIOPool
+
+
+def test_slow_io_does_not_block_the_loop_and_is_metered():
+    pool = VaultIOPool(max_workers=2, max_pending=4)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        slow = [asyncio.create_task(pool.run(time.sleep, 0.1)) for _ in range(4)]
+        await asyncio.sleep(0)
+        with pytest.raises(VaultIOBusy):
+            await pool.run(time.sleep, 0)
+        await asyncio.gather(*slow)
+        ticking.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 10                    # the loop kept running for ~0.2s
+    stats = pool.stats()
+    assert stats['completed'] == 4 and stats['rejected'] == 1
+    assert stats['max_queue_depth'] >= 2 and stats['queue_depth'] == 0 and stats['wait_seconds_max'] > 0.05
+    pool.close()
+
+
+def test_async_facade_round_trip(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    try:
+        async def scenario():
+            assert await async_io.asave_memory_vault("v", {"category": "tasks"})
+            assert await async_io.aload_memory_vault("v") == {"category": "tasks"}
+            assert await async_io.aread_vault_json("v") == b'{"category":"tasks"}'
+            assert await async_io.alist_memory_vaults() == ["v"]
+            assert await async_io.adelete_memory_vault("v")
+            return await async_io.aload_memory_vault("v")
+
+        assert asyncio.run(scenario()) is None
+    finally:
+        storage.set_vault_dir(previous)
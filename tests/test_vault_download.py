@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from cali.vault import download as vault_download
+from cali.vault.download import ZEROCOPY_EXTENSION, DecodedDownloadCache, VaultDownloadResponse, parse_range
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage.async_io import aopen_vault_download
+
+RECORD = {"vault_id": "big", "category": "legacy", "entries": [{"id": i, "text": "echo " * 20} for i in range(200)]}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    app = FastAPI()
+
+    @app.get("/download/{vault_id}")
+    async def download(vault_id: str):
+        return VaultDownloadResponse(await aopen_vault_download(vault_id), filename=f"{vault_id}.json")
+
+    try:
+        yield TestClient(app)
+    finally:
+        storage.set_vault_dir(previous)
+
+
+@pytest.mark.parametrize("codec", ["json", "zlib"])
+def test_conditional_and_ranged_downloads(client, monkeypatch, codec):
+    monkeypatch.setattr(storage, "VAULT_CODEC", codec)
+    assert storage.save_memory_vault("big", RECORD)
+    body = storage.read_vault_json("big")
+
+    full = client.get("/download/big")
+    etag = full.headers["etag"]
+    assert full.status_code == 200 and full.content == body and full.headers["accept-ranges"] == "bytes"
+
+    assert client.get("/download/big", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    part = client.get("/download/big", headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert part.status_code == 206 and part.content == body[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(body)}"
+    assert client.get("/download/big", headers={"Range": "bytes=-5"}).content == body[-5:]
+    assert client.get("/download/big", headers={"Range": "bytes=10-19", "If-Range": '"stale"'}).status_code == 200
+    assert client.get("/download/big", headers={"Range": f"bytes={len(body)}-"}).status_code == 416
+
+    # Same content, same etag; a change made outside the facade gets a new one
+    assert storage.save_memory_vault("big", RECORD)
+    assert client.get("/download/big").headers["etag"] == etag
+    (storage.VAULT_DIR / "big.json").write_bytes(b'{"edited":true}')
+    edited = client.get("/download/big", headers={"If-None-Match": etag})
+    assert edited.status_code == 200 and edited.content == b'{"edited":true}' and edited.headers["etag"] != etag
+
+
+def test_compressed_record_is_decoded_once_across_ranges(client, monkeypatch):
+    monkeypatch.setattr(storage, "VAULT_CODEC", "zlib")
+    monkeypatch.setattr(vault_download, "decoded_downloads", DecodedDownloadCache())
+    decoded = []
+    read_download_json = storage.read_download_json
+    monkeypatch.setattr(storage, "read_download_json", lambda d: decoded.append(d.etag) or read_download_json(d))
+    assert storage.save_memory_vault("big", RECORD)
+    body = storage.read_vault_json("big")
+
+    for start in range(0, len(body), 4096):                 # a resumed download, one range at a time
+        part = client.get("/download/big", headers={"Range": f"bytes={start}-{start + 4095}"})
+        assert part.status_code == 206 and part.content == body[start:start + 4096]
+    assert len(decoded) == 1
+
+    assert storage.save_memory_vault("big", {**RECORD, "category": "tasks"})
+    assert client.get("/download/big").content == storage.read_vault_json("big") and len(decoded) == 2
+
+
+def test_zero_copy_extension_is_used_when_offered(client):
+    assert storage.save_memory_vault("v", {"category": "tasks"})
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        download = await aopen_vault_download("v")
+        scope = {"type": "http", "method": "GET", "headers": [(b"range", b"bytes=1-")],
+                 "extensions": {ZEROCOPY_EXTENSION: {}}}
+        await VaultDownloadResponse(download, filename="v.json")(scope, None, send)
+        return download.fd
+
+    fd = asyncio.run(scenario())
+    assert sent[0]["status"] == 206
+    assert sent[1]["type"] == ZEROCOPY_EXTENSION and (sent[1]["offset"], sent[1]["count"]) == (1, 19)
+    with pytest.raises(OSError):
+        os.fstat(fd)                                        # closed once the response was sent
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-", 10) == (0, 10)
+    assert parse_range("bytes=5-100", 10) == (5, 10)
+    assert parse_range("bytes=0-1,3-4", 10) is None
+    assert parse_range("items=0-1", 10) is None
+    assert parse_range("bytes=5-2", 10) is None
+
+
+def test_etag_is_kept_with_the_file_across_restarts(client, monkeypatch):
+    assert storage.save_memory_vault("big", RECORD)
+    etag = client.get("/download/big").headers["etag"]
+
+    # A restart that lost the manifest snapshot: nothing has to be re-read or re-hashed
+    storage.save_manifest_snapshot()
+    (storage.VAULT_DIR / storage.MANIFEST_SNAPSHOT).unlink()
+    storage.set_vault_dir(storage.VAULT_DIR)
+    monkeypatch.setattr(storage, "_describe", lambda payload: pytest.fail("re-read a stored record"))
+    assert storage.vault_manifest().get("big").category == "legacy"
+    assert client.get("/download/big").headers["etag"] == etag
+    monkeypatch.undo()
+
+    # An edit made outside the facade invalidates the stored etag
+    os.utime(storage.VAULT_DIR / "big.json", ns=(0, 0))
+    storage.set_vault_dir(storage.VAULT_DIR)
+    assert client.get("/download/big").headers["etag"] == etag
+    assert storage._stored_description(storage.VAULT_DIR / "big.json", os.stat(storage.VAULT_DIR / "big.json"))
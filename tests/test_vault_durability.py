@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+import pytest
+
+from cali.vault.storage.durability import GroupCommit, GroupWriter, atomic_write, stage_write
+
+
+def test_atomic_write_replaces_or_leaves_old_contents(tmp_path):
+    path = tmp_path / "entry.json"
+    atomic_write(path, b'{"v": 1}')
+    stat = atomic_write(path, b'{"v": 2}', fsync=False)
+    assert path.read_bytes() == b'{"v": 2}' and stat.st_size == 8
+
+    with pytest.raises(TypeError):
+        atomic_write(path, None)                    # fails mid-write
+    assert path.read_bytes() == b'{"v": 2}'
+    assert os.listdir(tmp_path) == ["entry.json"]
+
+
+def test_group_commit_batches_concurrent_callers():
+    syncs = []
+
+    def slow_sync():
+        start = time.monotonic()
+        time.sleep(0.02)
+        syncs.append((start, time.monotonic()))
+
+    group = GroupCommit(slow_sync)
+    calls = []
+
+    def caller():
+        start = time.monotonic()
+        group.commit()
+        calls.append((start, time.monotonic()))
+
+    threads = [threading.Thread(target=caller) for _ in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert group.commits == 32 and group.syncs < 32
+    for called, returned in calls:                  # each caller is covered by a sync started after it
+        assert any(called <= start and end <= returned for start, end in syncs)
+
+
+def test_group_commit_reports_sync_failures():
+    group = GroupCommit(lambda: (_ for _ in ()).throw(OSError("disk gone")))
+    with pytest.raises(OSError, match="disk gone"):
+        group.commit()
+
+
+def test_group_writer_fsyncs_then_renames_with_one_directory_sync_per_group(tmp_path, monkeypatch):
+    fsynced, fsync = [], os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsynced.append(fd), time.sleep(0.005), fsync(fd)))
+    writer = GroupWriter(lambda: tmp_path)
+
+    def save(n):
+        writer.commit([stage_write(tmp_path / f"{n}.json", b'{"n": %d}' % n)])
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{n}.json" for n in range(16))     # no temp files left
+    assert (tmp_path / "7.json").read_bytes() == b'{"n": 7}'
+    # One fsync per file plus one directory fsync per group, instead of two per save
+    assert writer.group.syncs < 16 and len(fsynced) == 16 + writer.group.syncs
+
+
+def test_group_writer_discards_writes_of_a_failed_sync(tmp_path, monkeypatch):
+    (tmp_path / "a.json").write_bytes(b"old")
+    writer = GroupWriter(lambda: tmp_path)
+    staged = stage_write(tmp_path / "a.json", b"new")
+    monkeypatch.setattr(os, "fsync", lambda fd: (_ for _ in ()).throw(OSError("disk gone")))
+    with pytest.raises(OSError, match="disk gone"):
+        writer.commit([staged])
+    assert os.listdir(tmp_path) == ["a.json"] and (tmp_path / "a.json").read_bytes() == b"old"
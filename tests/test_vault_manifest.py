@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage.manifest import BloomFilter, VaultManifest
+
+
+@pytest.fixture
+def vault_dir(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    yield tmp_path
+    storage.set_vault_dir(previous)
+
+
+def test_pages_filter_by_category_and_prefix():
+    manifest = VaultManifest()
+    for i in range(25):
+        manifest.record(f"id{i:02d}", 10, 0.0, "odd" if i % 2 else "even")
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = manifest.page(cursor=cursor, limit=10)
+        seen += page
+        if cursor is None:
+            break
+    assert seen == sorted(f"id{i:02d}" for i in range(25))
+
+    assert manifest.page(category="odd", limit=3) == (["id01", "id03", "id05"], "id05")
+    assert manifest.page(prefix="id1", limit=20) == ([f"id1{i}" for i in range(10)], None)
+    assert manifest.page(prefix="id2", category="even", cursor="id20") == (["id22", "id24"], None)
+
+    manifest.record("id01", 12, 1.0, "even")
+    manifest.discard("id02")
+    assert manifest.get("id01").category == "even" and "id02" not in manifest and len(manifest) == 24
+    assert manifest.page(category="odd", limit=1)[0] == ["id03"]
+    assert manifest.page(category="even", limit=2)[0] == ["id00", "id01"]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"vault-{i}")
+    assert all(f"vault-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_facade_keeps_manifest_current(vault_dir):
+    storage.save_memory_vault("b", {"category": "tasks"})
+    storage.save_memory_vault("a", {"category": "legacy"})
+    manifest = storage.vault_manifest()
+    assert manifest.ids() == ["a", "b"] and manifest.get("a").category == "legacy"
+
+    storage.save_memory_vault("c", {"category": "tasks"})
+    assert manifest.page(category="tasks")[0] == ["b", "c"]
+    assert storage.delete_memory_vault("b") and not storage.delete_memory_vault("b")
+    assert storage.list_memory_vaults() == ["a", "c"]
+
+    (vault_dir / "ghost.json").write_text("{}")           # written behind the facade's back
+    assert storage.load_memory_vault("ghost") is None        # answered from the manifest
+
+
+def test_restart_reuses_snapshot_for_unchanged_files(vault_dir, monkeypatch):
+    for i in range(5):
+        storage.save_memory_vault(f"v{i}", {"category": "tasks"})
+    storage.vault_manifest()
+    storage.save_manifest_snapshot()
+    (vault_dir / "v3.json").write_text(json.dumps({"category": "changed-category"}))
+
+    parsed = []
+    original = storage._describe
+    monkeypatch.setattr(storage, "_describe", lambda payload: parsed.append(payload) or original(payload))
+    storage.set_vault_dir(vault_dir)
+    manifest = storage.vault_manifest()
+    assert len(manifest) == 5 and manifest.get("v3").category == "changed-category"
+    assert len(parsed) == 1
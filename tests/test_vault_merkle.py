@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+from cali.vault.merkle import VaultReconciler, ensure_merkle_schema, row_to_vault
+from cali.vault.storage import cali_vault_storage as storage
+
+LEGACY_VAULT = '''CREATE TABLE legacy_vault (
+    vault_id TEXT PRIMARY KEY, title TEXT NOT NULL, description TEXT NOT NULL, trigger_keywords TEXT,
+    delivery_mode TEXT, unlock_condition TEXT, is_active INTEGER, created_at TEXT, category TEXT
+)'''
+
+
+@pytest.fixture
+def vaults(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path / "vault")
+    path = str(tmp_path / "legacy_vault.db")
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_VAULT)
+    for i in range(50):
+        conn.execute('INSERT INTO legacy_vault VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (f"v{i:02d}", f"title {i}", "desc", "a,b", "manual", "none", 1, "2025-06-01", "tasks"))
+    conn.commit()
+    ensure_merkle_schema(conn)                           # existing rows get hashed on the first run
+    reconciler = VaultReconciler(path)
+    try:
+        yield conn, reconciler
+    finally:
+        reconciler.close()
+        conn.close()
+        storage.set_vault_dir(previous)
+
+
+def _file_for(conn, vault_id):
+    row = conn.execute('SELECT vault_id, title, description, trigger_keywords, category, created_at '
+                       'FROM legacy_vault WHERE vault_id = ?', (vault_id,)).fetchone()
+    return row_to_vault(row)
+
+
+def test_reconcile_repairs_only_divergent_entries(vaults):
+    conn, reconciler = vaults
+    for i in range(48):
+        storage.save_memory_vault(f"v{i:02d}", _file_for(conn, f"v{i:02d}"))
+    storage.save_memory_vault("v05", {**_file_for(conn, "v05"), "title": "edited"})
+    storage.save_memory_vault("helix-event", {"event": "hibernate"})
+
+    report = reconciler.reconcile(dry_run=True)
+    assert (report["rehashed_rows"], report["rehashed_files"]) == (50, 49)
+    assert (report["missing"], report["mismatched"], report["orphan_files"]) == (2, 1, 1)
+    assert report["repaired"] == 0 and not report["in_sync"]
+
+    report = reconciler.reconcile()
+    assert report["rehashed_rows"] == 0 and report["rehashed_files"] == 0
+    assert report["repaired"] == 3 and storage.load_memory_vault("v49") == _file_for(conn, "v49")
+    assert report["in_sync"] and report["orphan_files"] == 1
+
+    # Files without a row stay out of the tree, so nothing is compared again
+    report = reconciler.reconcile()
+    assert report["ranges_compared"] == 0 and report["in_sync"] and report["orphan_files"] == 1
+    storage.delete_memory_vault("helix-event")
+    report = reconciler.reconcile()
+    assert report["in_sync"] and report["orphan_files"] == 0
+
+
+def test_files_move_into_the_tree_when_their_row_appears(vaults):
+    conn, reconciler = vaults
+    for i in range(50):
+        storage.save_memory_vault(f"v{i:02d}", _file_for(conn, f"v{i:02d}"))
+    storage.save_memory_vault("helix-event", {"event": "hibernate"})
+    assert reconciler.reconcile()["in_sync"]
+
+    conn.execute('INSERT INTO legacy_vault VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                 ("helix-event", "hibernate", "desc", "", "manual", "none", 1, "2025-06-01", "events"))
+    conn.execute("DELETE FROM legacy_vault WHERE vault_id = 'v10'")
+    conn.commit()
+    report = reconciler.reconcile()
+    assert report["rehashed_files"] == 0                    # hashes moved sides without rereading
+    assert (report["mismatched"], report["repaired"], report["orphan_files"]) == (1, 1, 1)
+    assert report["in_sync"] and storage.load_memory_vault("helix-event")["title"] == "hibernate"
+
+
+def test_hashing_files_leaves_the_read_cache_alone(vaults, monkeypatch):
+    conn, reconciler = vaults
+    for i in range(50):
+        storage.save_memory_vault(f"v{i:02d}", _file_for(conn, f"v{i:02d}"))
+    monkeypatch.setattr(storage, "load_memory_vault", lambda *args, **kwargs: pytest.fail("loaded a vault"))
+    assert reconciler.reconcile()["in_sync"]
+
+
+def test_rows_changed_by_any_connection_are_rehashed(vaults):
+    conn, reconciler = vaults
+    for i in range(50):
+        storage.save_memory_vault(f"v{i:02d}", _file_for(conn, f"v{i:02d}"))
+    assert reconciler.reconcile()["in_sync"]
+
+    other = sqlite3.connect(reconciler.database_path)
+    other.execute("UPDATE legacy_vault SET description = 'rewritten' WHERE vault_id = 'v07'")
+    other.commit()
+    other.close()
+
+    report = reconciler.reconcile()
+    assert report["rehashed_rows"] == 1 and report["mismatched"] == 1 and report["repaired"] == 1
+    assert report["entries_compared"] < 10 and report["in_sync"]
+    assert storage.load_memory_vault("v07")["description"] == "rewritten"
+
+
+def test_new_process_rehashes_only_files_changed_meanwhile(vaults):
+    conn, reconciler = vaults
+    for i in range(50):
+        storage.save_memory_vault(f"v{i:02d}", _file_for(conn, f"v{i:02d}"))
+    assert reconciler.reconcile()["in_sync"]
+    reconciler.close()
+
+    (storage.VAULT_DIR / "v03.json").write_text('{"vault_id": "v03"}')     # edited while not running
+    storage.set_vault_dir(storage.VAULT_DIR)
+    restarted = VaultReconciler(reconciler.database_path)
+    try:
+        report = restarted.reconcile()
+        assert report["rehashed_files"] == 1 and report["repaired"] == 1 and report["in_sync"]
+    finally:
+        restarted.close()
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+
+from cali.vault.outbox import VaultOutboxWorker, enqueue_vault_write, ensure_outbox_schema
+from cali.vault.storage import cali_vault_storage as storage
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "vault.db")
+    conn = sqlite3.connect(path)
+    ensure_outbox_schema(conn)
+    return path, conn
+
+
+def test_rolled_back_requests_leave_nothing_to_materialize(tmp_path):
+    path, conn = _db(tmp_path)
+    enqueue_vault_write(conn, "lost", {"title": "never committed"})
+    conn.rollback()
+    saved = []
+    worker = VaultOutboxWorker(path, save_batch=lambda items: saved.extend(items) or {})
+    assert worker.drain() == 0 and saved == []
+
+
+def test_batches_coalesce_and_failures_retry(tmp_path):
+    path, conn = _db(tmp_path)
+    enqueue_vault_write(conn, "a", {"v": 1})
+    enqueue_vault_write(conn, "b", {"v": 1})
+    enqueue_vault_write(conn, "a", {"v": 2})
+    conn.commit()
+
+    calls, fail = [], {"b"}
+
+    def save_batch(items):
+        items = list(items)
+        calls.append(items)
+        return {vault_id: vault_id not in fail for vault_id, _ in items}
+
+    worker = VaultOutboxWorker(path, save_batch=save_batch, retry_base=0.0)
+    assert worker.process_batch() == 2                          # both "a" records done, "b" failed
+    assert calls == [[("a", {"v": 2}), ("b", {"v": 1})]]
+    attempts, error = conn.execute("SELECT attempts, last_error FROM vault_outbox").fetchone()
+    assert attempts == 1 and error == "Vault save failed"
+
+    fail.clear()
+    assert worker.drain() == 1
+    stats = worker.stats()
+    assert stats['pending'] == 0 and stats['coalesced'] == 1 and stats['failures'] == 1
+    worker.stop()
+
+
+def test_worker_materializes_into_vault_storage(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path / "vault")
+    try:
+        path, conn = _db(tmp_path)
+        for i in range(5):
+            enqueue_vault_write(conn, f"v{i}", {"vault_id": f"v{i}", "category": "tasks"})
+        conn.commit()
+        worker = VaultOutboxWorker(path, save_batch=storage.save_memory_vault_batch)
+        worker.start()
+        worker.notify()
+        worker.stop(drain=True)
+        assert storage.list_memory_vaults() == [f"v{i}" for i in range(5)]
+        assert storage.load_memory_vault("v3") == {"vault_id": "v3", "category": "tasks"}
+    finally:
+        storage.set_vault_dir(previous)
+
+
+def test_backed_off_record_never_overwrites_a_newer_one(tmp_path):
+    path, conn = _db(tmp_path)
+    enqueue_vault_write(conn, "a", {"v": 1})
+    conn.commit()
+    stored, fail = {}, {"a"}
+
+    def save_batch(items):
+        results = {}
+        for vault_id, data in items:
+            results[vault_id] = vault_id not in fail
+            if results[vault_id]:
+                stored[vault_id] = data
+        return results
+
+    worker = VaultOutboxWorker(path, save_batch=save_batch, retry_base=60.0)
+    worker.process_batch()                                      # v1 fails and backs off for a minute
+    fail.clear()
+    enqueue_vault_write(conn, "a", {"v": 2})
+    conn.commit()
+    worker.drain()
+    assert stored == {"a": {"v": 2}}
+    assert conn.execute("SELECT COUNT(*) FROM vault_outbox").fetchone()[0] == 0    # v1 will not replay
+
+    # A due retry is superseded by a newer record that is itself backing off
+    enqueue_vault_write(conn, "b", {"v": 1})
+    conn.commit()
+    conn.execute("UPDATE vault_outbox SET next_attempt_at = 0")
+    enqueue_vault_write(conn, "b", {"v": 2})
+    conn.execute("UPDATE vault_outbox SET next_attempt_at = 1e12 WHERE payload = ?", ('{"v": 2}',))
+    conn.commit()
+    worker.drain()
+    assert "b" not in stored and conn.execute("SELECT payload FROM vault_outbox").fetchall() == [('{"v": 2}',)]
+
+
+def test_stats_do_not_wait_for_a_running_batch(tmp_path):
+    path, conn = _db(tmp_path)
+    enqueue_vault_write(conn, "a", {"v": 1})
+    conn.commit()
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_save(items):
+        entered.set()
+        release.wait(5)
+        return {vault_id: True for vault_id, _ in items}
+
+    worker = VaultOutboxWorker(path, save_batch=slow_save)
+    thread = threading.Thread(target=worker.process_batch)
+    thread.start()
+    try:
+        assert entered.wait(5)
+        assert worker.stats()['pending'] == 1                   # answered while save_batch runs
+    finally:
+        release.set()
+        thread.join()
+    worker.stop()
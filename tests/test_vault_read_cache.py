@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage.read_cache import VaultReadCache
+
+
+@pytest.fixture
+def vault_dir(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    yield tmp_path
+    storage.set_vault_dir(previous)
+
+
+def test_lru_byte_budget_and_stale_reads():
+    cache = VaultReadCache(max_bytes=100)
+    for key in "abc":
+        cache.put(key, {"k": key}, 1, 40, cache.begin())
+    assert cache.get("a", 1) is None and cache.get("c", 1) == {"k": "c"}   # "a" evicted
+    assert cache.stats()['bytes'] == 80 and cache.stats()['evictions'] == 1
+
+    assert cache.get("c", 2) is None                                       # validator changed
+    token = cache.begin()
+    cache.invalidate("b")
+    cache.put("b", {"k": "old"}, 1, 40, token)                             # read raced with a write
+    assert cache.get("b", 1) is None
+    stats = cache.stats()
+    assert stats['stale'] == 1 and stats['rejected'] == 1 and 0 < stats['hit_rate'] < 1
+
+
+def test_hot_reads_skip_parsing_and_see_every_change(vault_dir, monkeypatch):
+    storage.save_memory_vault("v", {"entries": [1, 2]})
+    first = storage.load_memory_vault("v", readonly=True)
+
+    monkeypatch.setattr(json, "loads", lambda *a, **k: pytest.fail("parsed a cached vault"))
+    assert storage.load_memory_vault("v", readonly=True) is first
+    private = storage.load_memory_vault("v")
+    private["entries"].append(3)                                          # callers get their own copy
+    assert storage.load_memory_vault("v", readonly=True) == {"entries": [1, 2]}
+    monkeypatch.undo()
+
+    storage.save_memory_vault("v", {"entries": [9]})                        # our write invalidates
+    assert storage.load_memory_vault("v") == {"entries": [9]}
+
+    path = vault_dir / "v.json"
+    path.write_text(json.dumps({"entries": ["edited elsewhere"]}))
+    os.utime(path, ns=(1, 1))                                              # outside edit changes mtime/size
+    assert storage.load_memory_vault("v") == {"entries": ["edited elsewhere"]}
+    assert storage.vault_cache_stats()['hits'] >= 2
+
+
+def test_budget_charges_decoded_size_of_compressed_records(vault_dir, monkeypatch):
+    monkeypatch.setattr(storage, "VAULT_CODEC", "zlib")
+    monkeypatch.setattr(storage, "COMPRESS_MIN_BYTES", 0)
+    storage.save_memory_vault("z", {"entries": ["repeated text"] * 500})
+    stored = (vault_dir / "z.json").stat().st_size
+    storage.load_memory_vault("z", readonly=True)
+
+    charged = storage.vault_cache_stats()["bytes"]
+    assert charged == len(storage.read_vault_json("z")) and charged > 10 * stored
@@ -0,0 +1,60 @@
+import io
+import json
+import random
+
+import pytest
+
+from cali.vault.reconciliation import VaultEntryReader, iter_reconciled_entries, reconcile_to_file
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage import record_format
+
+
+def _entries(n=500, ids=120, seed=5):
+    rng = random.Random(seed)
+    return [{"id": rng.choice([rng.randrange(ids), f"s{rng.randrange(ids)}"]), "seq": i} for i in range(n)]
+
+
+def test_spilled_runs_match_in_memory_last_writer_wins(tmp_path):
+    entries = _entries()
+    expected = {}
+    for entry in entries:
+        expected[(isinstance(entry["id"], str), entry["id"])] = entry
+
+    spilled = list(iter_reconciled_entries(iter(entries), run_size=7, tmp_dir=str(tmp_path)))
+    assert spilled == list(iter_reconciled_entries(entries))
+    assert len(spilled) == len(expected)
+    assert all(expected[(isinstance(e["id"], str), e["id"])] == e for e in spilled)
+
+    count, head = reconcile_to_file(iter(entries), tmp_path / "out" / "reconciled.json", sample=3, run_size=7)
+    assert count == len(spilled) and head == spilled[:3]
+    assert json.loads((tmp_path / "out" / "reconciled.json").read_text()) == spilled
+
+
+def test_entry_reader_streams_small_chunks_and_copies():
+    vault = {"vault_id": "v", "category": "legacy", "reconciled": {"old": True},
+             "entries": [{"id": i, "text": "é" * 3, "n": 1234567} for i in range(20)], "tail": [1, 2]}
+    data = json.dumps(vault, indent=2, ensure_ascii=False).encode("utf-8")
+    copy = io.StringIO()
+    reader = VaultEntryReader((data[i:i + 5] for i in range(0, len(data), 5)), copy=copy, drop=("reconciled",))
+
+    assert list(reader) == vault["entries"]
+    assert reader.members == {"vault_id": "v", "category": "legacy", "reconciled": {"old": True}, "tail": [1, 2]}
+    rewritten = json.loads(copy.getvalue() + "}")
+    assert rewritten == {k: v for k, v in vault.items() if k != "reconciled"}
+
+
+@pytest.mark.parametrize("codec", ["json", "zlib", "lzma"])
+def test_stream_save_and_read_round_trip(tmp_path, monkeypatch, codec):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    monkeypatch.setattr(storage, "VAULT_CODEC", codec)
+    try:
+        body = json.dumps({"category": "legacy", "entries": list(range(5000))}).encode("utf-8")
+        assert storage.save_memory_vault_stream("big", (body[i:i + 999] for i in range(0, len(body), 999)),
+                                                category="legacy")
+        assert b"".join(storage.iter_vault_json("big", chunk_size=1000)) == body
+        entry = storage.vault_manifest().get("big")
+        assert entry.category == "legacy" and entry.etag == record_format.content_hash(body)
+        assert storage.load_memory_vault("big")["entries"][-1] == 4999
+    finally:
+        storage.set_vault_dir(previous)
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from cali.vault.storage import cali_vault_storage as storage
+from cali.vault.storage import record_format
+from cali.vault.storage.migrate_format import main as migrate
+
+VAULT = {"vault_id": "v", "category": "legacy",
+         "entries": [{"id": i, "text": "the seed remembers the soil it grew from ✨"} for i in range(50)]}
+
+
+@pytest.fixture
+def vault_dir(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path)
+    yield tmp_path
+    storage.set_vault_dir(previous)
+
+
+@pytest.mark.parametrize("codec", record_format.CODECS)
+def test_every_codec_round_trips(codec):
+    payload = record_format.encode(VAULT, codec, min_compress_bytes=0)
+    assert record_format.decode(payload) == VAULT
+    assert record_format.codec_of(payload) == (codec if codec in ("zlib", "lzma") else "json")
+
+
+def test_small_or_incompressible_records_stay_plain_json():
+    assert record_format.encode({"a": 1}, "zlib") == b'{"a":1}'
+    assert record_format.decode(json.dumps(VAULT, indent=2).encode()) == VAULT      # legacy layout
+
+    with pytest.raises(record_format.RecordFormatError):
+        record_format.decode(record_format.MAGIC + bytes((9, 1)) + b"x")
+
+
+def test_migration_converts_existing_files(vault_dir, capsys):
+    for i in range(3):
+        (vault_dir / f"v{i}.json").write_text(json.dumps(VAULT, indent=2))
+    before = sum(p.stat().st_size for p in vault_dir.glob("*.json"))
+
+    report = migrate(["--codec", "zlib"])
+    assert report["scanned"] == 3 and report["rewritten"] == 3
+    after = sum(p.stat().st_size for p in vault_dir.glob("*.json"))
+    assert after < before / 4
+    assert storage.load_memory_vault("v1") == VAULT
+    assert json.loads(storage.read_vault_json("v2")) == VAULT                       # downloads stay JSON
+
+    assert migrate(["--codec", "zlib"])["rewritten"] == 0
+    assert "smaller" in capsys.readouterr().out
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from cali.vault import rebuild_search
+from cali.vault.search import VaultSearchIndex, match_expression
+from cali.vault.storage import cali_vault_storage as storage
+
+
+@pytest.fixture
+def index(tmp_path):
+    previous = storage.VAULT_DIR
+    storage.set_vault_dir(tmp_path / "vault")
+    search = VaultSearchIndex()
+    try:
+        yield search
+    finally:
+        search.close()
+        storage.set_vault_dir(previous)
+
+
+def _ids(results):
+    return [hit["vault_id"] for hit in results]
+
+
+def test_saves_and_deletes_are_indexed(index):
+    storage.save_memory_vault("plans", {"vault_id": "plans", "title": "Garden plans", "category": "tasks",
+                                        "description": "tomatoes by the fence"})
+    storage.save_memory_vault("notes", {"vault_id": "notes", "title": "Notes", "category": "legacy",
+                                        "entries": [{"id": 1, "text": "the garden needs water"}]})
+    body = json.dumps({"title": "Café résumé", "category": "legacy"}).encode("utf-8")
+    assert storage.save_memory_vault_stream("cv", [body[:7], body[7:]], category="legacy")
+
+    results = index.search("garden")
+    assert _ids(results) == ["plans", "notes"]                  # title matches rank first
+    assert results[1]["snippet"] == "the [garden] needs water"
+    assert _ids(index.search("garden", category="legacy")) == ["notes"]
+    assert _ids(index.search("cafe resume")) == ["cv"]
+    assert _ids(index.search("gar*")) == ["plans", "notes"]
+    assert index.search('") OR NOT (') == [] and match_expression('a* "b" OR') == '"a" "b" "OR"'
+
+    storage.save_memory_vault("plans", {"title": "Shed repairs", "category": "tasks"})
+    storage.delete_memory_vault("notes")
+    assert index.search("garden") == [] and _ids(index.search("shed")) == ["plans"]
+    assert index.stats()["documents"] == 2
+
+
+def test_new_process_catches_up_and_rebuild(index, capsys):
+    for i in range(30):
+        storage.save_memory_vault(f"v{i:02d}", {"title": f"entry {i}", "description": "river"})
+    assert len(index.search("river", limit=50)) == 30
+    index.close()
+
+    (storage.VAULT_DIR / "v03.json").write_text('{"title": "mountain"}')      # edited while not running
+    (storage.VAULT_DIR / "v04.json").unlink()
+    storage.set_vault_dir(storage.VAULT_DIR)
+    restarted = VaultSearchIndex()
+    try:
+        assert restarted.flush() == 2
+        assert _ids(restarted.search("mountain")) == ["v03"]
+        assert len(restarted.search("river", limit=50)) == 28
+        assert restarted.stats()["indexed"] == 1                # only the edited vault was reread
+    finally:
+        restarted.close()
+
+    report = rebuild_search.main(["--vault-dir", str(storage.VAULT_DIR)])
+    assert report["indexed"] == 29 and "Indexed 29 vault records" in capsys.readouterr().out
+
+
+def test_searches_do_not_wait_for_updates(index):
+    storage.save_memory_vault("a", {"title": "lantern"})
+    assert _ids(index.search("lantern")) == ["a"]
+
+    storage.save_memory_vault("b", {"title": "lantern oil"})
+    with index._lock:                                           # a catch-up or rebuild is running
+        assert _ids(index.search("lantern")) == ["a"]
+    assert _ids(index.search("lantern")) == ["a", "b"]
+
+
+def test_failed_rebuild_keeps_the_previous_index(index, monkeypatch):
+    storage.save_memory_vault("a", {"title": "compass"})
+    assert _ids(index.search("compass")) == ["a"]
+
+    def broken(vault_id, entry):
+        raise RuntimeError("disk went away")
+
+    monkeypatch.setattr(index, "_read_text", broken)
+    with pytest.raises(RuntimeError):
+        index.rebuild()
+    assert _ids(index.search("compass")) == ["a"]
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from cali.vault.storage.segment_store import SegmentStore, SegmentStoreError
+
+
+def test_put_get_delete_survive_reopen(tmp_path):
+    with SegmentStore(tmp_path) as store:
+        store.put("a", b'{"v": 1}')
+        store.put("b", b'{"v": 2}')
+        store.put("a", b'{"v": 3}')
+        assert store.delete("b") and not store.delete("missing")
+        assert store.get("a") == b'{"v": 3}' and store.get("b") is None
+
+    with SegmentStore(tmp_path) as store:
+        assert store.ids() == ["a"]
+        assert store.get("a") == b'{"v": 3}' and store.get("b") is None
+
+
+def test_torn_tail_is_truncated_on_recovery(tmp_path):
+    with SegmentStore(tmp_path) as store:
+        store.put("kept", b"x" * 100)
+        store.put("torn", b"y" * 100)
+    segment = next(tmp_path.glob("segment-*.log"))
+    size = segment.stat().st_size
+    with open(segment, "r+b") as f:
+        f.truncate(size - 10)                      # crash mid-append
+
+    with SegmentStore(tmp_path) as store:
+        assert store.get("kept") == b"x" * 100 and "torn" not in store
+        store.put("next", b"z")
+    with SegmentStore(tmp_path) as store:
+        assert sorted(store.ids()) == ["kept", "next"]
+
+
+def test_compaction_reclaims_space_and_keeps_deletes(tmp_path):
+    with SegmentStore(tmp_path, segment_bytes=4096) as store:
+        for round_ in range(5):
+            for i in range(40):
+                store.put(f"id{i}", f"{round_}:{i}".encode() * 10)
+        for i in range(0, 40, 2):
+            store.delete(f"id{i}")
+        before = store.stats()
+        assert store.compact() > 0
+        after = store.stats()
+        assert after['total_bytes'] < before['total_bytes'] and after['live_bytes'] == before['live_bytes']
+
+    with SegmentStore(tmp_path, segment_bytes=4096) as store:
+        assert sorted(store.ids()) == sorted(f"id{i}" for i in range(1, 40, 2))
+        assert store.get("id7") == b"4:7" * 10
+    assert len(os.listdir(tmp_path)) < before['segments']
+
+
+def test_sync_covers_segments_sealed_by_a_rollover(tmp_path, monkeypatch):
+    from cali.vault.storage import segment_store
+
+    synced = []
+    monkeypatch.setattr(segment_store.os, "fsync", lambda fd: synced.append(fd))
+    monkeypatch.setattr(segment_store, "fsync_directory", lambda path: synced.append("dir"))
+    with SegmentStore(tmp_path, segment_bytes=256) as store:
+        store.sync()
+        synced.clear()
+        store.put("a", b"x" * 200)
+        first = store._segments[1].fd
+        store.put("b", b"y" * 200)                 # rolls over before the commit below
+        assert len(store._segments) == 2
+        store.sync()
+        assert first in synced and store._segments[2].fd in synced and "dir" in synced
+
+        synced.clear()
+        store.sync()
+        assert synced == []                        # nothing written since
+
+
+def test_second_writer_is_refused(tmp_path):
+    pytest.importorskip("fcntl")
+    with SegmentStore(tmp_path) as store:
+        store.put("a", b"1")
+        with pytest.raises(SegmentStoreError, match="in use"):
+            SegmentStore(tmp_path)
+    with SegmentStore(tmp_path) as store:          # released on close
+        assert store.get("a") == b"1"
+
+
+def test_readers_in_other_processes_run_beside_the_writer(tmp_path):
+    pytest.importorskip("fcntl")
+    reader = ("import sys\n"
+              "from cali.vault.storage.segment_store import SegmentStore, SegmentStoreError\n"
+              "store = SegmentStore(sys.argv[1], read_only=True)\n"
+              "try:\n"
+              "    store.put('b', b'2')\n"
+              "except SegmentStoreError:\n"
+              "    print(store.get('a').decode())\n")
+    env = {**os.environ, "CALI_VAULT_BACKEND": "segments", "CALI_VAULT_DIR": str(tmp_path)}
+    env.pop("CALI_VAULT_SEGMENT_DIR", None)
+    root = Path(__file__).resolve().parents[1]
+    with SegmentStore(tmp_path / "segments") as store:
+        store.put("a", b'{"title": "lighthouse"}')
+        read = subprocess.run([sys.executable, "-c", reader, str(tmp_path / "segments")],
+                              cwd=root, env=env, capture_output=True, text=True, timeout=60)
+        assert read.stdout.strip() == '{"title": "lighthouse"}', read.stderr
+        rebuilt = subprocess.run([sys.executable, "-m", "cali.vault.rebuild_search", "--vault-dir", str(tmp_path)],
+                                 cwd=root, env=env, capture_output=True, text=True, timeout=60)
+        assert rebuilt.returncode == 0 and "Indexed 1 vault records" in rebuilt.stdout, rebuilt.stderr
+        store.put("b", b"2")                        # the writer is unaffected